@@ -0,0 +1,105 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from data_collection import bulk_fetch
+from data_collection.fetch_data import fetch_data
+from data_collection.mock_jira import MockJiraConfig, start_mock_jira
+from utilities.constants import JSONL_FILE_EXTENSION, LABELED_FILENAME, RAW_POSTFIX, UNLABELED_FILENAME
+from utilities.constants import get_repository_filename
+from utilities.file_utils import load_jsonl
+from utilities import http_utils
+
+BENCHMARK_REPOSITORY_PREFIX = "BENCH"
+
+
+def count_fetched_issues(repository_identifier):
+    """Return the number of distinct issue ids saved in the raw data of a repository"""
+
+    issue_ids = set()
+    for labeling in LABELED_FILENAME, UNLABELED_FILENAME:
+        filename = get_repository_filename(repository_identifier, labeling, RAW_POSTFIX, JSONL_FILE_EXTENSION)
+        if os.path.isfile(filename):
+            issue_ids.update(record.get("id") for record in load_jsonl(filename))
+
+    return len(issue_ids)
+
+
+def run_benchmark(config=None, repository_count=1, workers=1, requests_per_second=0):
+    """Fetch data from mock JIRA repositories in a temporary folder and return the measured throughput
+
+    Arguments:
+
+    config -- the behaviour of every mock JIRA server, default MockJiraConfig() if None
+
+    repository_count -- the number of mock repositories, more than one are fetched with bulk_fetch (default 1)
+
+    workers -- the number of slices fetched concurrently from each repository (default 1)
+
+    requests_per_second -- the client side request rate limit per host, 0 for no limit (default 0)
+    """
+
+    config = config if config is not None else MockJiraConfig()
+    servers = [start_mock_jira(config) for _ in range(repository_count)]
+    repositories = [
+        ["%s%d" % (BENCHMARK_REPOSITORY_PREFIX, i), "localhost:%d" % server.server_port, workers, requests_per_second]
+        for i, server in enumerate(servers)]
+
+    working_directory = os.getcwd()
+    benchmark_directory = tempfile.mkdtemp()
+    os.chdir(benchmark_directory)
+    http_utils.reset_request_statistics()
+
+    try:
+        start_time = time.time()
+        if repository_count == 1:
+            bulk_fetch.set_repository_host_limits(repositories)
+            fetch_data(repositories[0][0], repositories[0][1], workers=workers)
+        else:
+            bulk_fetch.fetch_repositories(repositories)
+        elapsed = time.time() - start_time
+        fetched_issues = sum(count_fetched_issues(repository[0]) for repository in repositories)
+    finally:
+        os.chdir(working_directory)
+        shutil.rmtree(benchmark_directory)
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+
+    client_statistics = http_utils.get_request_statistics().values()
+    server_statistics = [server.get_statistics() for server in servers]
+    served_issues = sum(len(server.issues) for server in servers)
+
+    return {
+        "repositories": repository_count,
+        "workers": workers,
+        "issues": fetched_issues,
+        "complete": fetched_issues == served_issues,
+        "seconds": round(elapsed, 3),
+        "issues_per_second": round(fetched_issues / elapsed, 1) if elapsed > 0 else 0,
+        "requests": sum(statistics["requests"] for statistics in client_statistics),
+        "failed_requests": sum(statistics["failures"] for statistics in client_statistics),
+        "retries": sum(statistics["retries"] for statistics in client_statistics),
+        "throttled_requests": sum(statistics["throttled"] for statistics in server_statistics),
+        "injected_errors": sum(statistics["errors"] for statistics in server_statistics),
+        "bytes_transferred": sum(statistics["bytes_sent"] for statistics in server_statistics),
+        "bytes_received": sum(statistics["bytes"] for statistics in client_statistics)
+    }
+
+
+if __name__ == "__main__":
+
+    config = MockJiraConfig()
+    config.issue_count = int(sys.argv[1]) if len(sys.argv) > 1 else config.issue_count
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    repository_count = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+
+    result = run_benchmark(config, repository_count, workers)
+    print(json.dumps(result, indent=4))
+    if len(sys.argv) > 4:
+        with open(sys.argv[4], "w") as file:
+            json.dump(result, file, indent=4)
+        print("Benchmark result saved at", sys.argv[4])
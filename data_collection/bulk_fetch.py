@@ -1,29 +1,105 @@
+from concurrent.futures import ThreadPoolExecutor, wait
 import os
+import sys
+import time
 
-from data_collection.fetch_data import fetch_data
+from data_collection.fetch_data import fetch_data, sync_data
+from data_collection.fetch_metrics import get_fetch_metrics, print_fetch_metrics, save_fetch_metrics
+from data_collection.test_repos import get_jira_base_url
 from utilities.file_utils import load_json
+from utilities import http_utils
 
-from utilities.constants import DATA_FOLDER, DATA_COLLECTION_FOLDER
+from utilities.constants import DATA_FOLDER, DATA_COLLECTION_FOLDER, FETCH_METRICS_FILENAME, get_repository_search_url
 
 REPOSITORY_LIST_FILENAME = DATA_COLLECTION_FOLDER + "/known_repos.json"
+DEFAULT_WORKERS = 1
+REPOSITORY_WORKERS = 8
+PROGRESS_INTERVAL_SECONDS = 15
+SYNC_ARGUMENT = "sync"
 
-def fetch_repositories(repositories):
-    """Fetching data from a list of JIRA repositories"""
+
+def fetch_repository(repository):
+    """Fetch a single JIRA repository, or sync it if it was already fetched, given as an identifier and URL pair optionally followed
+    by the number of slices to fetch concurrently and the maximum number of requests per second"""
+
+    workers = repository[2] if len(repository) > 2 else DEFAULT_WORKERS
+    try:
+        if os.path.exists("%s/%s" % (DATA_FOLDER, repository[0])):
+            sync_data(repository[0], repository[1], workers=workers)
+        else:
+            fetch_data(repository[0], repository[1], workers=workers)
+    except Exception as e:
+        print("Skipping %s because the following exception was thrown:" % repository[1])
+        print(e)
+
+
+def set_repository_host_limits(repositories):
+    """Limit the concurrent requests to the host of every repository by the number of slices fetched concurrently
+    and the request rate by the fourth value of the repository entry, HOST_REQUESTS_PER_SECOND if not given.
+    Repositories on the same host share its limits, the number of concurrent requests is the sum of the numbers
+    of slices fetched from them and the request rate is the lowest rate set for any of them, 0 for no limit."""
+
+    host_limits = {}
+    for repository in repositories:
+        host = http_utils.get_host(get_repository_search_url(get_jira_base_url(repository[1])))
+        workers = repository[2] if len(repository) > 2 else DEFAULT_WORKERS
+        requests_per_second = repository[3] if len(repository) > 3 else http_utils.HOST_REQUESTS_PER_SECOND
+        if host in host_limits:
+            host_requests_per_second, host_workers = host_limits[host]
+            if not requests_per_second or (host_requests_per_second and host_requests_per_second < requests_per_second):
+                requests_per_second = host_requests_per_second
+            workers = workers + host_workers
+        host_limits[host] = (requests_per_second, workers)
+
+    for host, (requests_per_second, workers) in host_limits.items():
+        http_utils.set_host_limits(host, requests_per_second, workers)
+
+
+def fetch_repositories(repositories, sync=False, repository_workers=REPOSITORY_WORKERS):
+    """Fetching data from a list of JIRA repositories, each given as an identifier and URL pair
+    optionally followed by the number of slices to fetch concurrently from that repository
+    and the maximum number of requests per second to its host.
+    Repositories are fetched concurrently, each host within its own rate and concurrency limits.
+    The progress, throughput and request latencies are printed and saved at FETCH_METRICS_FILENAME
+    every PROGRESS_INTERVAL_SECONDS.
+    Repositories which were already fetched are skipped unless sync is True, in which case
+    only the issues updated since they were last fetched or synced are fetched.
+
+    Arguments:
+
+    repositories -- a list of repository entries
+
+    sync -- sync already fetched repositories instead of skipping them (default False)
+
+    repository_workers -- the number of repositories fetched concurrently (default REPOSITORY_WORKERS)
+    """
 
     if repositories is None:
         print("No JIRA repositories were found at", REPOSITORY_LIST_FILENAME)
         return
-        
-    for repository in repositories:
-        if not os.path.exists("%s/%s" % (DATA_FOLDER, repository[0])):
-            try:
-                fetch_data(repository[0], repository[1])
-            except Exception as e:
-                print("Skipping %s because the following exception was thrown:" % repository[1])
-                print(e)
-                continue
+
+    repositories = [repository for repository in repositories
+        if sync or not os.path.exists("%s/%s" % (DATA_FOLDER, repository[0]))]
+    set_repository_host_limits(repositories)
+
+    start_time = time.time()
+    repository_identifiers = [repository[0] for repository in repositories]
+    finished_repository_identifiers = set()
+    with ThreadPoolExecutor(max_workers=repository_workers) as executor:
+        pending = {executor.submit(fetch_repository, repository): repository[0] for repository in repositories}
+        while len(pending) > 0:
+            finished, _ = wait(pending, timeout=PROGRESS_INTERVAL_SECONDS)
+            for future in finished:
+                finished_repository_identifiers.add(pending.pop(future))
+            metrics = get_fetch_metrics(repository_identifiers, finished_repository_identifiers, start_time)
+            save_fetch_metrics(metrics)
+            print_fetch_metrics(metrics)
+
+    if len(repositories) > 0:
+        print("Fetch metrics saved at", FETCH_METRICS_FILENAME)
 
 if __name__ == "__main__":
 
     repositories = load_json(REPOSITORY_LIST_FILENAME)
-    fetch_repositories(repositories)
\ No newline at end of file
+    fetch_repositories(repositories, len(sys.argv) > 1 and sys.argv[1] == SYNC_ARGUMENT)
+    http_utils.print_request_statistics()
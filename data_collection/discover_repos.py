@@ -1,11 +1,15 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 from googleapiclient.discovery import build
 import json
 import math
 import requests
 import sys
-import time
+import threading
 
+from data_collection.discovery_cache import DiscoveryCache
 from data_collection.test_repos import test_repos, print_test_result
+from utilities import http_utils
 from utilities.string_utils import get_part_strings
 
 BING = "bing"
@@ -14,10 +18,111 @@ SEARCH_ENGINES = [BING, GOOGLE]
 BING_SEARCH_URL = "https://api.cognitive.microsoft.com/bing/v7.0/search"
 BING_KEYWORDS = [ "intitle:\"system dashboard\"" ]
 GOOGLE_KEYWORDS = ["intitle:System Dashboard - JIRA", "intitle:\"System Dashboard - JIRA\"", "allintitle:\"system dashboard\""]
+BING_PAGE_SIZE = 50
+GOOGLE_PAGE_SIZE = 10
+GOOGLE_MAX_RESULTS = 100
+BING_REQUESTS_PER_SECOND = 3
+GOOGLE_REQUESTS_PER_SECOND = 1
+SEARCH_WORKERS = 4
 
+google_limiter = http_utils.HostLimiter(GOOGLE_REQUESTS_PER_SECOND, SEARCH_WORKERS)
+google_services = threading.local()
 
-def bing_search(query, bing_api_key):
-    """Returns a list of URLs obtained in a Bing search query using Bing Web Search API v7
+
+def search_pages(query, fetch_page, page_size, max_results=None, workers=SEARCH_WORKERS):
+    """Return the set of URLs found in all pages of search results and whether every page was fetched.
+    The first page is fetched to learn the total number of results and the remaining pages are fetched concurrently.
+
+    Arguments:
+
+    query -- search query
+
+    fetch_page -- a function returning the URLs on the page of results starting at a given offset
+    and the total number of results, or None if the page could not be fetched,
+    called as fetch_page(query, offset, page_size)
+
+    page_size -- the number of results per page
+
+    max_results -- the number of results the search engine allows to access, None for no limit (default None)
+
+    workers -- the number of pages fetched concurrently (default SEARCH_WORKERS)
+    """
+
+    first_page = fetch_page(query, 0, page_size)
+    if first_page is None:
+        print("The first page of results could not be fetched")
+        return (set(), False)
+
+    results, total_results = first_page
+    if max_results is not None:
+        total_results = min(total_results, max_results)
+    total_pages = max(1, math.ceil(total_results / page_size))
+    print("%d (%.2f%%) of %d result pages processed" % get_part_strings(1, total_pages))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(fetch_page, query, offset, page_size) for offset in range(page_size, total_results, page_size)]
+        failed_page_count = 0
+        for page, future in enumerate(as_completed(futures), start=2):
+            result = future.result()
+            if result is not None:
+                results = results.union(result[0])
+            else:
+                failed_page_count = failed_page_count + 1
+            print("%d (%.2f%%) of %d result pages processed" % get_part_strings(page, total_pages))
+
+    if failed_page_count > 0:
+        print("%d of %d result pages could not be fetched" % (failed_page_count, total_pages))
+    print("%d potential JIRA instances found" % len(results))
+    return (results, failed_page_count == 0)
+
+
+def fetch_bing_page(query, offset, page_size, bing_api_key):
+    """Return the set of URLs on a page of Bing search results and the estimated total number of results,
+    None if the page could not be fetched
+
+    Arguments:
+
+    query -- Bing search query
+
+    offset -- the number of results to skip
+
+    page_size -- the number of results per page
+
+    bing_api_key -- Bing Web Search API key
+    """
+
+    payload = {'q': query, 'count': page_size, 'offset': offset, 'responseFilter': 'Webpages'}
+    headers = {'Ocp-Apim-Subscription-Key': bing_api_key}
+
+    try:
+        response = http_utils.get_with_retry(BING_SEARCH_URL, params=payload, headers=headers)
+    except requests.exceptions.RequestException:
+        print("Request exception, jump over page")
+        return None
+
+    if response.status_code != 200:
+        print("Unsuccessful status code %d, jump over page" % response.status_code)
+        return None
+
+    try:
+        json_response = response.json()
+    except json.JSONDecodeError:
+        print("Could not decode response or it didn't contain an URL, jump over page")
+        return None
+
+    if json_response == None or json_response.get("webPages") == None or json_response.get("webPages").get("value") == None:
+        print("Couldn't get web pages from response")
+        return None
+
+    webpages = json_response.get("webPages").get("value")
+    result = set([webpage.get("url") for webpage in webpages if webpage.get("url") != None])
+
+    return (result, json_response.get("webPages").get("totalEstimatedMatches", 0))
+
+
+def bing_search(query, bing_api_key, fetch_page=None, workers=SEARCH_WORKERS):
+    """Returns a set of URLs obtained in a Bing search query using Bing Web Search API v7
+    and whether every page of results was fetched
     https://docs.microsoft.com/en-gb/rest/api/cognitiveservices/bing-web-api-v7-reference
     
     Arguments:
@@ -27,56 +132,65 @@ def bing_search(query, bing_api_key):
 
     bing_api_key -- Bing Web Search API key which can be obtained
     at https://azure.microsoft.com/en-us/services/cognitive-services/bing-web-search-api/
-    """
 
-    PAGE_SIZE = 50
-    results = set()
-    totalEstimatedMatches = 0
-    page = 0
-    
-    while page * PAGE_SIZE <= totalEstimatedMatches:
+    fetch_page -- a replacement of fetch_bing_page called as fetch_page(query, offset, page_size),
+    e.g. a local stand-in for testing, None to use Bing Web Search API (default None)
+
+    workers -- the number of pages fetched concurrently (default SEARCH_WORKERS)
+    """
 
-        payload = {'q': query, 'count': PAGE_SIZE, 'offset': page * PAGE_SIZE, 'responseFilter': 'Webpages'}
-        headers = {'Ocp-Apim-Subscription-Key': bing_api_key}
+    if fetch_page is None:
+        http_utils.set_host_limits(http_utils.get_host(BING_SEARCH_URL), BING_REQUESTS_PER_SECOND, workers)
+        fetch_page = partial(fetch_bing_page, bing_api_key=bing_api_key)
 
-        page = page + 1
+    return search_pages(query, fetch_page, BING_PAGE_SIZE, workers=workers)
 
-        try:
-            response = requests.get(BING_SEARCH_URL, params=payload, headers=headers)
-        except requests.exceptions.RequestException:
-            print("Request exception, jump over page")
-            continue
 
-        if response.status_code != 200:
-            print("Unsuccessful status code %d, jump over page" % response.status_code)
-            continue
+def fetch_google_page(query, offset, page_size, google_api_key, cse_id):
+    """Return the set of URLs on a page of Google search results and the total number of results,
+    None if the page could not be fetched. Requests are limited to GOOGLE_REQUESTS_PER_SECOND
+    and every thread uses its own API client.
 
-        try:
-            json_response = response.json()
-        except json.JSONDecodeError:
-            print("Could not decode response or it didn't contain an URL, jump over page")
-            continue
+    Arguments:
 
-        if json_response == None or json_response.get("webPages") == None or json_response.get("webPages").get("value") == None:
-            print("Couldn't get web pages from response")
-            continue
+    query -- Google search query
 
-        webpages = json_response.get("webPages").get("value")
-        result = set([webpage.get("url") for webpage in webpages if webpage.get("url") != None])
-        
-        results = results.union(result)
+    offset -- the number of results to skip
 
-        totalEstimatedMatches = json_response.get("webPages").get("totalEstimatedMatches")
-        totalPages = math.ceil(totalEstimatedMatches / PAGE_SIZE)
+    page_size -- the number of results per page
 
-        print("%d (%.2f%%) of %d result pages processed" % get_part_strings(page, totalPages))
-    
-    print("%d potential JIRA instances found" % len(results))
-    return results
+    google_api_key -- Google API key
 
+    cse_id -- Custom Search Engine ID
+    """
 
-def google_search(keyword, google_api_key, cse_id):
-    """Returns a list of URLs obtained in a Google search query using Google Custom Search Engine API
+    if not hasattr(google_services, "services"):
+        google_services.services = {}
+    service = google_services.services.get(google_api_key)
+    if service is None:
+        service = build("customsearch", "v1", developerKey=google_api_key)
+        google_services.services[google_api_key] = service
+
+    google_limiter.acquire()
+    try:
+        res = service.cse().list(q=query, cx=cse_id, num=page_size, start=offset + 1).execute()
+        total_results = int(res.get("searchInformation").get("totalResults"))
+    except Exception as e:
+        print("Exception, skip page")
+        print(e)
+        return None
+    finally:
+        google_limiter.release()
+
+    items = res.get('items') or []
+    result = set(item.get("link") for item in items if item.get("link") is not None)
+
+    return (result, total_results)
+
+
+def google_search(keyword, google_api_key, cse_id, fetch_page=None, workers=SEARCH_WORKERS):
+    """Returns a set of URLs obtained in a Google search query using Google Custom Search Engine API
+    and whether every page of results was fetched
     https://developers.google.com/custom-search/json-api/v1/reference/cse/list
     The Custom Search Engine instance should be configured to search the whole Web
     as described in the first two steps at https://stackoverflow.com/a/37084643
@@ -90,52 +204,56 @@ def google_search(keyword, google_api_key, cse_id):
     see https://developers.google.com/api-client-library/python/guide/aaa_apikeys
 
     cse_id -- Custom Search Engine ID, see https://cse.google.com/cse/
+
+    fetch_page -- a replacement of fetch_google_page called as fetch_page(query, offset, page_size),
+    e.g. a local stand-in for testing, None to use Google Custom Search Engine API (default None)
+
+    workers -- the number of pages fetched concurrently (default SEARCH_WORKERS)
     """
 
-    PAGE_SIZE = 10
+    if fetch_page is None:
+        fetch_page = partial(fetch_google_page, google_api_key=google_api_key, cse_id=cse_id)
 
-    service = build("customsearch", "v1", developerKey=google_api_key)
-    results = set()
-    total_results = 0
-    page = 0
+    return search_pages(keyword, fetch_page, GOOGLE_PAGE_SIZE, GOOGLE_MAX_RESULTS, workers)
 
-    while page * PAGE_SIZE <= total_results:
 
-        if page % 5 == 0:
-            time.sleep(5)
+def search_keywords(search_engine, keywords, search, cache=None):
+    """Search by every keyword and return the union of the URLs found.
+    Keywords searched recently are not searched again if a cache is given. Only searches
+    whose every page of results was fetched are cached.
 
-        try:
-            res = service.cse().list(q=keyword, cx=cse_id, num=PAGE_SIZE, start=page * PAGE_SIZE + 1).execute()
-            page = page + 1
-            total_results = int(res.get("searchInformation").get("totalResults"))
-        except Exception as e:
-            print("Exception, skip page")
-            print(e)
-            break
+    Arguments:
 
-        try:
-            items = res.get('items')
-        except:
-            continue
+    search_engine -- the name of the search engine, used as a part of the cache key
 
-        for item in items:
-            try:
-                url = item.get("link")
-            except:
-                continue
-            results.add(url)
+    keywords -- a list of search queries
 
-        totalPages = math.ceil(total_results / PAGE_SIZE)
-        print("%d (%.2f%%) of %d result pages processed" % get_part_strings(page, totalPages))
+    search -- a function returning a set of URLs for a query and whether every page of results was fetched
 
-    print("%d potential JIRA instances found" % len(results))
-    return results
+    cache -- a DiscoveryCache of earlier search results, None to search every keyword (default None)
+    """
+
+    search_result_urls = set()
+    for keyword in keywords:
+        results = cache.get_search_result(search_engine, keyword) if cache is not None else None
+        if results is not None:
+            print("%d URLs found by keyword %s are taken from the cache" % (len(results), keyword))
+        else:
+            print("Searching by keyword:", keyword)
+            results, is_complete = search(keyword)
+            if cache is not None and is_complete:
+                cache.set_search_result(search_engine, keyword, results)
+                cache.save()
+        search_result_urls = search_result_urls.union(results)
+
+    return search_result_urls
 
 
 if __name__ == "__main__":
 
     min_labeled_issue_count = int(input("Minimum number of labeled issues (resolved and timespent > 0) to qualify a repository: "))
     search_result_urls = set()
+    cache = DiscoveryCache()
     search_engine = input("Please enter the name of the search engine you want to use (google or bing): ").lower()
     if search_engine not in SEARCH_ENGINES:
         print("Please choose one of the following search engines:", *SEARCH_ENGINES)
@@ -145,20 +263,16 @@ if __name__ == "__main__":
         bing_api_info_address = "https://azure.microsoft.com/en-us/services/cognitive-services/bing-web-search-api/"
         print("You can get Bing Web Search API key from", bing_api_info_address)
         bing_api_key = input("Bing Web Search API key: ")
-        for keyword in BING_KEYWORDS:
-            print("Searching by keyword:", keyword)
-            results = bing_search(keyword, bing_api_key)
-            search_result_urls = search_result_urls.union(results)
+        search_result_urls = search_keywords(BING, BING_KEYWORDS, partial(bing_search, bing_api_key=bing_api_key), cache)
 
     if search_engine == GOOGLE:
         print("You can obtain Google API key and Google Custom Search Engine ID as described on https://stackoverflow.com/a/37084643 (step 1 and 2).")
         print("The custom search engine should be configured to search the whole web.")
         google_api_key = input("Google API key: ")
         cse_id = input("Google Custom Search Engine ID: ")
-        for keyword in GOOGLE_KEYWORDS:
-            print("Searching by keyword:", keyword)
-            results = google_search(keyword, google_api_key, cse_id)
-            search_result_urls = search_result_urls.union(results)
+        search_result_urls = search_keywords(
+            GOOGLE, GOOGLE_KEYWORDS, partial(google_search, google_api_key=google_api_key, cse_id=cse_id), cache)
             
-    result = test_repos(search_result_urls, min_labeled_issue_count)
+    result = test_repos(search_result_urls, min_labeled_issue_count, cache=cache)
+    http_utils.print_request_statistics()
     print_test_result(result, min_labeled_issue_count)
\ No newline at end of file
@@ -0,0 +1,88 @@
+import os
+import threading
+import time
+
+from utilities.constants import DISCOVERY_CACHE_FILENAME, SECONDS_IN_HOUR
+from utilities.file_utils import load_json, save_json
+
+SEARCH_EXPIRY_DAYS = 7
+PROBE_EXPIRY_DAYS = 30
+SECONDS_IN_DAY = 24 * SECONDS_IN_HOUR
+
+
+class DiscoveryCache():
+    """Persistent cache of search query results and JIRA repository probe outcomes.
+    Entries older than their expiry are ignored and replaced when the query or URL is examined again.
+
+    filename -- the JSON file in which the cache is kept
+
+    search_expiry_days -- the number of days search results are reused
+
+    probe_expiry_days -- the number of days probe outcomes are reused
+    """
+
+    def __init__(self, filename=DISCOVERY_CACHE_FILENAME, search_expiry_days=SEARCH_EXPIRY_DAYS, probe_expiry_days=PROBE_EXPIRY_DAYS):
+        self.filename = filename
+        self.search_expiry_days = search_expiry_days
+        self.probe_expiry_days = probe_expiry_days
+        self.lock = threading.Lock()
+        self.searches = {}
+        self.probes = {}
+        if os.path.isfile(filename):
+            cache = load_json(filename)
+            self.searches = cache.get("searches", {})
+            self.probes = cache.get("probes", {})
+
+    def is_expired(self, entry, expiry_days):
+
+        return time.time() - entry["time"] > expiry_days * SECONDS_IN_DAY
+
+    def get_search_result(self, search_engine, query):
+        """Return the set of URLs found by an earlier search, None if the query was not searched recently"""
+
+        with self.lock:
+            entry = self.searches.get("%s:%s" % (search_engine, query))
+            if entry is None or self.is_expired(entry, self.search_expiry_days):
+                return None
+            return set(entry["urls"])
+
+    def set_search_result(self, search_engine, query, urls):
+
+        with self.lock:
+            self.searches["%s:%s" % (search_engine, query)] = {"time": time.time(), "urls": sorted(urls)}
+
+    def get_probe_result(self, url, min_labeled_issue_count):
+        """Return the status and repository details of an earlier probe of a normalized JIRA base URL,
+        None if the URL was not probed recently with the same minimal number of labeled issues"""
+
+        with self.lock:
+            entry = self.probes.get(url)
+            if entry is None or self.is_expired(entry, self.probe_expiry_days):
+                return None
+            if entry["min_labeled_issue_count"] != min_labeled_issue_count:
+                return None
+            return (entry["status"], entry["repo"])
+
+    def set_probe_result(self, url, min_labeled_issue_count, result):
+
+        with self.lock:
+            self.probes[url] = {
+                "time": time.time(),
+                "min_labeled_issue_count": min_labeled_issue_count,
+                "status": result[0],
+                "repo": result[1]
+            }
+
+    def save(self):
+        """Save the cache without expired entries, replacing the file at once"""
+
+        with self.lock:
+            cache = {
+                "searches": {key: entry for key, entry in self.searches.items() if not self.is_expired(entry, self.search_expiry_days)},
+                "probes": {key: entry for key, entry in self.probes.items() if not self.is_expired(entry, self.probe_expiry_days)}
+            }
+
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        temporary_filename = self.filename + ".tmp"
+        save_json(temporary_filename, cache)
+        os.replace(temporary_filename, self.filename)
@@ -1,16 +1,32 @@
-import csv
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 import os
 import re
 import requests
+import shutil
 import sys
+import threading
 import time
 
-from data_collection.test_repos import get_issue_count, get_jira_base_url
-from utilities.constants import CSV_FILE_EXTENSION, DATA_FOLDER, FIELD_KEYS, ID_FIELD_KEY, LABELED_DATA_JQL
-from utilities.constants import LABELED_FILENAME, PROJECT_FIELD_KEY, RAW_POSTFIX, UNLABELED_FILENAME, UNLABELED_DATA_JQL
-from utilities.file_utils import create_subfolder, get_repository_search_url, get_repository_filename
+from data_collection.test_repos import get_jira_base_url
+from utilities.constants import ALL_FILENAME, DATA_FOLDER, DELTA_DATA_JQL, DELTA_POSTFIX, FIELD_KEYS, ID_FIELD_KEY, JIRA_DATETIME_FORMAT
+from utilities.constants import JQL_DATE_FORMAT, JSON_FILE_EXTENSION, JSONL_FILE_EXTENSION, LABELED_FILENAME, PROJECT_FIELD_KEY
+from utilities.constants import RAW_POSTFIX, RESOLUTION_FIELD_KEY, SLICE_REQUEST_TIMEOUT_SECONDS, SYNC_POSTFIX, TIMESPENT_FIELD_KEY
+from utilities.constants import UNLABELED_FILENAME, UPDATED_FIELD_KEY
+from utilities.file_utils import convert_legacy_raw_files, create_subfolder, get_repository_search_url, get_repository_filename
+from utilities.file_utils import load_json, load_jsonl, open_jsonl, save_json, write_jsonl_record
+from utilities import http_utils
 
-MAX_RECORDS_PER_REQUEST = 50
+MAX_RECORDS_PER_REQUEST = 1000
+SLICES_PENDING_PER_WORKER = 4
+PARTITION_SIZE = 20000
+FAILED_SLICE_ROUNDS = 3
+SYNC_OVERLAP_DAYS = 1
+LABELINGS = LABELED_FILENAME, UNLABELED_FILENAME
+
+fetch_progress = {}
+progress_lock = threading.Lock()
 
 
 def fetch_slice(repository_search_url, auth, jql, start_at, max_results):
@@ -38,29 +54,25 @@ def fetch_slice(repository_search_url, auth, jql, start_at, max_results):
         "jql" : jql
     }
 
-    requestSucc = False
-    timesTried = 0
-    while not requestSucc and timesTried < 7:
-        try:
-            response = requests.get(repository_search_url, params=params, auth=auth)
-        except requests.exceptions.RequestException as e:
-            print("An exception occured while trying to fetch a slice.")
-            print(e)
-            timesTried = timesTried + 1
-            delay = timesTried * 10 + 2 ** timesTried
-            print("Trying again in %d seconds" % delay)
-            time.sleep(delay)
-            continue
-        requestSucc = True
+    try:
+        response = http_utils.get_with_retry(repository_search_url, params=params, auth=auth, timeout=SLICE_REQUEST_TIMEOUT_SECONDS)
+    except requests.exceptions.RequestException as e:
+        print("An exception occured while trying to fetch the slice starting at %d:" % start_at, e)
+        return (None, 0)
 
     if response.status_code != 200:
         print("%s returned unexpected status code %d when trying to fetch slice with the following JQL query: %s"
             % (repository_search_url, response.status_code, jql))
 
-        error_messages = response.json().get("errorMessages")
+        try:
+            error_messages = response.json().get("errorMessages")
+        except ValueError:
+            error_messages = None
         if error_messages is not None and len(error_messages) > 0:
             print('\n'.join(error_messages))
 
+        return (None, 0)
+
     try:
         json_response = response.json()
         issues = json_response.get("issues")
@@ -81,17 +93,16 @@ def fetch_slice(repository_search_url, auth, jql, start_at, max_results):
     return (content, total)
 
 
-def save_slice(filename, data_slice):
-    """Append a list of JIRA issues to a CSV file
+def save_slice(file, data_slice):
+    """Append a list of JIRA issues to an open JSON Lines file keeping the types of their field values
 
     Arguments:
 
-    filename - the name of the CSV file
+    file - the JSON Lines file opened for appending
 
     data_slice - a list of JIRA issues
     """
 
-    data = []
     for datapoint in data_slice:
         element = {}
 
@@ -102,24 +113,188 @@ def save_slice(filename, data_slice):
 
             if key == PROJECT_FIELD_KEY:
                 element[key] = field_value.get('key')
+            elif key == RESOLUTION_FIELD_KEY:
+                element[key] = field_value.get('name')
+            else:
+                element[key] = field_value
+
+        write_jsonl_record(file, element)
+
+
+def print_fetch_progress(records_processed, total_issues, target_filename, queue_depth=0):
+    """Print the number and percentage of issues fetched and saved so far and record them together with
+    the time the file was started and the number of slices waiting to be saved for the progress metrics
+    of concurrently fetched repositories"""
+
+    with progress_lock:
+        progress = fetch_progress.setdefault(target_filename, {"started": time.time()})
+        progress["fetched"] = records_processed
+        progress["total"] = total_issues
+        progress["queue_depth"] = queue_depth
+        progress["updated"] = time.time()
+
+    if records_processed > 0:
+        processed_percentage = records_processed / total_issues * 100
+        print("%d (%.2f%%) of %d issues fetched and saved at %s"
+            % (records_processed, processed_percentage, total_issues, target_filename))
+
+
+def get_fetch_progress():
+    """Return a copy of the number of issues fetched, the total number of issues, the number of slices
+    waiting to be saved and the start and last update times grouped by target file"""
+
+    with progress_lock:
+        return {target_filename: dict(progress) for target_filename, progress in fetch_progress.items()}
+
+
+def get_page_size(page_size, issue_count, start_at, total_issues):
+    """Return the number of issues the server returns per page, which is smaller than the requested
+    page size if fewer issues than requested were returned on a page other than the last one
+
+    Arguments:
+
+    page_size -- the number of issues requested
+
+    issue_count -- the number of issues returned
+
+    start_at -- the start index of the page
+
+    total_issues -- the total number of issues matching the query
+    """
+
+    if 0 < issue_count < page_size and start_at + issue_count < total_issues:
+        return issue_count
+
+    return page_size
+
+
+def fetch_failed_slices(file, failed_slices, repository_search_url, auth, jql):
+    """Fetch slices which could not be fetched during a crawl again after the crawl,
+    up to FAILED_SLICE_ROUNDS times, and append them to an open JSON Lines file.
+    Return the number of issues that could not be fetched.
+
+    Arguments:
+
+    file -- the JSON Lines file opened for appending
+
+    failed_slices -- a list of start indexes and numbers of issues of the failed slices
+
+    repository_search_url -- search interface endpoint address of JIRA REST API
+
+    auth -- authentication parameters containing username and API key or password,
+    None if authentication is not necessary
+
+    jql -- JIRA query if issues need to be filtered
+    """
+
+    for _ in range(FAILED_SLICE_ROUNDS):
+        if len(failed_slices) == 0:
+            break
+
+        print("Fetching %d failed slices from %s again" % (len(failed_slices), repository_search_url))
+        still_failed_slices = []
+        for start_at, max_results in failed_slices:
+            data_slice, _ = fetch_slice(repository_search_url, auth, jql, start_at, max_results)
+            if data_slice is None:
+                still_failed_slices.append((start_at, max_results))
+                continue
+            save_slice(file, data_slice)
+            if 0 < len(data_slice) < max_results:
+                still_failed_slices.append((start_at + len(data_slice), max_results - len(data_slice)))
+        failed_slices = still_failed_slices
+
+    for start_at, max_results in failed_slices:
+        print("Up to %d issues starting at %d could not be fetched from %s" % (max_results, start_at, repository_search_url))
+
+    return sum(max_results for _, max_results in failed_slices)
+
+
+def fetch_first_slice(repository_search_url, auth, jql, max_results):
+    """Fetch the first slice of a crawl, which returns the total number of issues by which the other slices
+    are planned. If it fails, it is fetched again up to FAILED_SLICE_ROUNDS times like the slices which fail
+    during a crawl. Return the issues and the total number of issues, None and 0 if it could not be fetched."""
+
+    for i in range(FAILED_SLICE_ROUNDS + 1):
+        if i > 0:
+            print("Fetching the first slice from %s again" % repository_search_url)
+        data_slice, total_issues = fetch_slice(repository_search_url, auth, jql, 0, max_results)
+        if data_slice is not None:
+            return (data_slice, total_issues)
+
+    print("The first slice could not be fetched from %s" % repository_search_url)
+    return (None, 0)
+
+
+def fetch_and_save_issues(target_filename, repository_search_url, auth, jql="", workers=1):
+    """Fetch issues using JIRA REST API and append them to a JSON Lines file. The first request asks
+    for MAX_RECORDS_PER_REQUEST issues and the number of issues returned becomes the page size,
+    which is reduced again if the server starts returning fewer issues per page.
+    Slices which fail are fetched again after the crawl. Return the total number of issues, None if the first
+    slice could not be fetched, the effective page size and the number of issues that could not be fetched,
+    None if the first slice could not be fetched.
+
+    Arguments:
+
+    target_filename -- the name of the JSON Lines file in which the issues are to ba saved
+
+    repository_search_url -- search interface endpoint address of JIRA REST API
+
+    auth -- authentication parameters containing username and API key or password,
+    None if authentication is not necessary
+
+    jql -- JIRA query if issues need to be filtered
+
+    workers -- the number of slices fetched concurrently (default 1)
+    """
+
+    if workers > 1:
+        return fetch_and_save_issues_concurrently(target_filename, repository_search_url, auth, jql, workers)
+
+    start_at = 0
+    total_issues = None
+    page_size = MAX_RECORDS_PER_REQUEST
+    failed_slices = []
+
+    with open_jsonl(target_filename, "at") as file:
+        while total_issues is None or start_at < total_issues:
+
+            if total_issues is None:
+                data_slice, slice_total_issues = fetch_first_slice(repository_search_url, auth, jql, page_size)
             else:
-                element[key] = str(field_value)
+                data_slice, slice_total_issues = fetch_slice(repository_search_url, auth, jql, start_at, page_size)
+            if data_slice is None:
+                if total_issues is None:
+                    break
+                failed_slices.append((start_at, page_size))
+                start_at = start_at + page_size
+                continue
+
+            total_issues = slice_total_issues
+            page_size = get_page_size(page_size, len(data_slice), start_at, total_issues)
+            save_slice(file, data_slice)
+
+            start_at = start_at + (len(data_slice) if len(data_slice) > 0 else page_size)
+            print_fetch_progress(min(start_at, total_issues), total_issues, target_filename)
+
+        unfetched_issue_count = fetch_failed_slices(file, failed_slices, repository_search_url, auth, jql)
 
-        data.append(element)
+    if total_issues is None:
+        return (None, page_size, None)
 
-    with open(filename, 'a', newline='') as file:
-        csv_writer = csv.writer(file)
-        for datapoint in data:
-            row = [str(datapoint.get(field, "").encode("utf-8"))[2:-1:] for field in FIELD_KEYS]
-            csv_writer.writerow(row)
+    return (total_issues, page_size, unfetched_issue_count)
 
 
-def fetch_and_save_issues(target_filename, repository_search_url, auth, jql=""):
-    """Fetch issues using JIRA REST API in slices of 50 requests and save in CSV format
+def fetch_and_save_issues_concurrently(target_filename, repository_search_url, auth, jql, workers):
+    """Fetch issues with a pool of worker threads and append them to a JSON Lines file.
+    The page size and the total number of issues returned with the first slice are used to plan
+    the start indexes of the remaining slices, which are saved in the order of their start index.
+    If a slice is truncated, the page size is reduced and its missing issues are fetched before
+    the next slice is saved. Slices which fail are fetched again after the crawl.
+    Return the same values as fetch_and_save_issues.
 
     Arguments:
 
-    target_filename -- the name of the JSON file in which the issues are to ba saved
+    target_filename -- the name of the JSON Lines file in which the issues are to be saved
 
     repository_search_url -- search interface endpoint address of JIRA REST API
 
@@ -127,31 +302,221 @@ def fetch_and_save_issues(target_filename, repository_search_url, auth, jql=""):
     None if authentication is not necessary
 
     jql -- JIRA query if issues need to be filtered
+
+    workers -- the number of slices fetched concurrently
     """
 
-    slice_num = 0
-    total_issues = 0
+    data_slice, total_issues = fetch_first_slice(repository_search_url, auth, jql, MAX_RECORDS_PER_REQUEST)
+    if data_slice is None:
+        return (None, MAX_RECORDS_PER_REQUEST, None)
+    if total_issues == 0:
+        return (0, MAX_RECORDS_PER_REQUEST, 0)
+
+    page_size = get_page_size(MAX_RECORDS_PER_REQUEST, len(data_slice), 0, total_issues)
+    next_start_at = len(data_slice)
+    max_pending_slices = workers * SLICES_PENDING_PER_WORKER
+    pending_slices = deque()
+    failed_slices = []
+
+    with open_jsonl(target_filename, "at") as file, ThreadPoolExecutor(max_workers=workers) as executor:
+
+        save_slice(file, data_slice)
+        print_fetch_progress(min(next_start_at, total_issues), total_issues, target_filename)
+
+        def submit_slice(start_at, max_results, first=False):
+            future = executor.submit(fetch_slice, repository_search_url, auth, jql, start_at, max_results)
+            if first:
+                pending_slices.appendleft((start_at, max_results, future))
+            else:
+                pending_slices.append((start_at, max_results, future))
+
+        def submit_next_slice():
+            nonlocal next_start_at
+            if next_start_at >= total_issues:
+                return
+            submit_slice(next_start_at, page_size)
+            next_start_at = next_start_at + page_size
+
+        for _ in range(max_pending_slices):
+            submit_next_slice()
+
+        while len(pending_slices) > 0:
+            start_at, max_results, future = pending_slices.popleft()
+            data_slice, _ = future.result()
+
+            if data_slice is None:
+                submit_next_slice()
+                failed_slices.append((start_at, max_results))
+                continue
+
+            expected_issue_count = min(max_results, total_issues - start_at)
+            if 0 < len(data_slice) < expected_issue_count:
+                page_size = min(page_size, get_page_size(max_results, len(data_slice), start_at, total_issues))
+                submit_slice(start_at + len(data_slice), expected_issue_count - len(data_slice), first=True)
+            else:
+                submit_next_slice()
+
+            save_slice(file, data_slice)
+            print_fetch_progress(min(start_at + len(data_slice), total_issues), total_issues, target_filename, len(pending_slices))
+
+        unfetched_issue_count = fetch_failed_slices(file, failed_slices, repository_search_url, auth, jql)
+
+    return (total_issues, page_size, unfetched_issue_count)
+
+
+def get_id_bounds(repository_search_url, auth, jql):
+    """Return the smallest and the largest issue id matching a JIRA query and the number of matching issues,
+    or None if they could not be fetched"""
+
+    bounds = []
+    for order in "asc", "desc":
+        data_slice, total_issues = fetch_slice(repository_search_url, auth, get_partition_jql(jql, order=order), 0, 1)
+        if data_slice is None or len(data_slice) == 0 or not str(data_slice[0].get(ID_FIELD_KEY)).isdigit():
+            return None
+        bounds.append(int(data_slice[0][ID_FIELD_KEY]))
+
+    return (bounds[0], bounds[1], total_issues)
+
 
-    while slice_num * MAX_RECORDS_PER_REQUEST <= total_issues:
+def get_partition_jql(jql, from_id=None, to_id=None, order="asc"):
+    """Restrict a JIRA query to issue ids from from_id inclusive to to_id exclusive and order it by issue id"""
 
-        startAt = slice_num * MAX_RECORDS_PER_REQUEST
-        data_slice, total_issues = fetch_slice(repository_search_url, auth, jql, startAt, MAX_RECORDS_PER_REQUEST)
-        if total_issues > 0:
-            save_slice(target_filename, data_slice)   
+    conditions = ["(%s)" % jql] if len(jql) > 0 else []
+    if from_id is not None:
+        conditions.append("id >= %d" % from_id)
+    if to_id is not None:
+        conditions.append("id < %d" % to_id)
 
-        records_processed = min(startAt + MAX_RECORDS_PER_REQUEST, total_issues)
-        if records_processed > 0:
-            processed_percentage = records_processed / total_issues * 100
-            print("%d (%.2f%%) of %d issues fetched and saved at %s"
-                % (records_processed, processed_percentage, total_issues, target_filename))     
+    return ("%s order by id %s" % (" and ".join(conditions), order)).strip()
 
-        slice_num = slice_num + 1
+
+def get_partition_issue_count(repository_search_url, auth, jql):
+    """Return the number of issues matching a JIRA query without fetching any of them, None if it could not be fetched"""
+
+    data_slice, total_issues = fetch_slice(repository_search_url, auth, jql, 0, 0)
+    if data_slice is None or not isinstance(total_issues, int):
+        return None
 
     return total_issues
 
 
-def fetch_data(repository_identifier, repository_url, auth = None):
-    """Fetch labeled and unlabeled issues from JIRA repository and save in CSV format
+def fetch_and_save_partitioned_issues(target_filename, repository_search_url, auth, jql="", workers=1, partition_size=PARTITION_SIZE):
+    """Split the issues matching a JIRA query in disjoint issue id ranges of about partition_size issues,
+    fetch each partition from start index zero to avoid slow and inconsistent deep pagination and append
+    the partitions to a JSON Lines file in the order of issue ids, leaving out issues returned twice.
+    The id range is first split evenly and every partition matching more than partition_size issues,
+    because issue ids are not spread evenly, is split in halves again until it matches fewer issues.
+    Queries matching up to partition_size issues are fetched without partitioning.
+    Return the total number of issues saved, the effective page size and the number of issues that could not
+    be fetched, which for a partition whose first slice failed is its issue count or, if that is unknown,
+    the size of its id range. Return the same values as fetch_and_save_issues if the query is not partitioned.
+
+    Arguments:
+
+    target_filename -- the name of the JSON Lines file in which the issues are to be saved
+
+    repository_search_url -- search interface endpoint address of JIRA REST API
+
+    auth -- authentication parameters containing username and API key or password,
+    None if authentication is not necessary
+
+    jql -- JIRA query if issues need to be filtered
+
+    workers -- the number of partitions fetched concurrently (default 1)
+
+    partition_size -- the approximate number of issues in a partition (default PARTITION_SIZE)
+    """
+
+    id_bounds = get_id_bounds(repository_search_url, auth, jql)
+    if id_bounds is None or id_bounds[2] <= partition_size:
+        return fetch_and_save_issues(target_filename, repository_search_url, auth, jql, workers)
+
+    min_id, max_id, total_issues = id_bounds
+    partition_count = -(-total_issues // partition_size)
+    id_range = max_id + 1 - min_id
+    partition_bounds = [min_id + id_range * i // partition_count for i in range(partition_count + 1)]
+    print("Fetching %d issues with ids from %d to %d in %d partitions" % (total_issues, min_id, max_id, partition_count))
+
+    def fetch_partition(from_id, to_id):
+        partition_jql = get_partition_jql(jql, from_id, to_id)
+        issue_count = get_partition_issue_count(repository_search_url, auth, partition_jql)
+        if issue_count is not None and issue_count > partition_size and to_id - from_id > 1:
+            middle_id = (from_id + to_id) // 2
+            print("Splitting the partition of %d issues with ids from %d to %d" % (issue_count, from_id, to_id - 1))
+            return fetch_partition(from_id, middle_id) + fetch_partition(middle_id, to_id)
+
+        partition_filename = "%s.part%d" % (target_filename, from_id)
+        partition_filenames.append(partition_filename)
+        if os.path.isfile(partition_filename):
+            os.remove(partition_filename)
+        partition_issue_count, page_size, unfetched_issue_count = fetch_and_save_issues(partition_filename, repository_search_url, auth, partition_jql)
+        if partition_issue_count is None:
+            unfetched_issue_count = issue_count if issue_count is not None else to_id - from_id
+        return [(partition_filename, page_size, unfetched_issue_count)]
+
+    partition_filenames = []
+    saved_ids = set()
+    duplicate_count = 0
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            partitions = [partition for partitions in executor.map(fetch_partition, partition_bounds[:-1], partition_bounds[1:])
+                for partition in partitions]
+
+        with open_jsonl(target_filename, "at") as file:
+            for partition_filename, _, _ in partitions:
+                if not os.path.isfile(partition_filename):
+                    continue
+                for record in load_jsonl(partition_filename):
+                    if record.get(ID_FIELD_KEY) in saved_ids:
+                        duplicate_count = duplicate_count + 1
+                        continue
+                    saved_ids.add(record.get(ID_FIELD_KEY))
+                    write_jsonl_record(file, record)
+    finally:
+        for partition_filename in partition_filenames:
+            if os.path.isfile(partition_filename):
+                os.remove(partition_filename)
+
+    if duplicate_count > 0:
+        print("%d issues returned more than once were saved only once" % duplicate_count)
+    unfetched_issue_count = sum(unfetched_issue_count for _, _, unfetched_issue_count in partitions)
+    if unfetched_issue_count > 0:
+        print("Up to %d issues could not be fetched from %s" % (unfetched_issue_count, repository_search_url))
+    elif len(saved_ids) < total_issues:
+        print("%d of %d issues were saved at %s, the rest were not returned" % (len(saved_ids), total_issues, target_filename))
+
+    return (len(saved_ids), min(page_size for _, page_size, _ in partitions), unfetched_issue_count)
+
+
+def is_labeled(record):
+    """Check if a raw record matches LABELED_DATA_JQL, i.e. the issue is resolved
+    and its time spent is greater than zero"""
+
+    timespent = record.get(TIMESPENT_FIELD_KEY)
+    return record.get(RESOLUTION_FIELD_KEY) is not None and isinstance(timespent, int) and timespent > 0
+
+
+def split_labeled_records(filename, repository_identifier):
+    """Move the records of a raw JSON Lines file to the labeled and unlabeled raw files of a repository
+    and return the number of labeled and unlabeled records"""
+
+    issue_counts = {LABELED_FILENAME: 0, UNLABELED_FILENAME: 0}
+    labeled_filename = get_repository_filename(repository_identifier, LABELED_FILENAME, RAW_POSTFIX, JSONL_FILE_EXTENSION)
+    unlabeled_filename = get_repository_filename(repository_identifier, UNLABELED_FILENAME, RAW_POSTFIX, JSONL_FILE_EXTENSION)
+
+    with open_jsonl(labeled_filename, "at") as labeled_file, open_jsonl(unlabeled_filename, "at") as unlabeled_file:
+        for record in load_jsonl(filename):
+            labeling = LABELED_FILENAME if is_labeled(record) else UNLABELED_FILENAME
+            write_jsonl_record(labeled_file if labeling == LABELED_FILENAME else unlabeled_file, record)
+            issue_counts[labeling] = issue_counts[labeling] + 1
+
+    os.remove(filename)
+    return issue_counts
+
+
+def fetch_data(repository_identifier, repository_url, auth = None, workers = 1):
+    """Fetch all issues from JIRA repository in a single crawl, split them in labeled and unlabeled issues
+    and save in compressed JSON Lines format
 
     Arguments:
 
@@ -160,40 +525,201 @@ def fetch_data(repository_identifier, repository_url, auth = None):
     repository_url -- the URL of the repository from which data is to be fetched e.g. jira.exoplatform.org
 
     auth -- authentication parameters containing username and API key or password (default None)
+
+    workers -- the number of slices fetched concurrently from the repository (default 1)
     """
 
     folder = create_subfolder(DATA_FOLDER, repository_identifier)
     repository_base_url = get_jira_base_url(repository_url)
     repository_search_url = get_repository_search_url(repository_base_url)
-    print_issue_counts(repository_search_url, auth)
 
-    issue_counts = {}
-    for labeling in [(LABELED_FILENAME, LABELED_DATA_JQL), (UNLABELED_FILENAME, UNLABELED_DATA_JQL)]:
-        filename = get_repository_filename(repository_identifier, labeling[0], RAW_POSTFIX, CSV_FILE_EXTENSION)
-        issue_counts[labeling[0]] = fetch_and_save_issues(filename, repository_search_url, auth, labeling[1])
+    filename = get_repository_filename(repository_identifier, ALL_FILENAME, RAW_POSTFIX, JSONL_FILE_EXTENSION)
+    total_issues, page_size, unfetched_issue_count = fetch_and_save_partitioned_issues(filename, repository_search_url, auth, "", workers)
+    if total_issues is None or unfetched_issue_count > 0:
+        if total_issues is None:
+            print("Fetching %s failed because the first slice of issues could not be fetched" % repository_base_url)
+        else:
+            print("Fetching %s failed because up to %d issues could not be fetched" % (repository_base_url, unfetched_issue_count))
+        print("The fetched issues were discarded so that %s is fetched again instead of synced" % repository_identifier)
+        shutil.rmtree(folder)
+        return
+
+    if total_issues == 0 or not os.path.isfile(filename):
+        print("No issues were fetched from %s" % repository_base_url)
+        return
+
+    issue_counts = split_labeled_records(filename, repository_identifier)
+    total_labeled_issues = issue_counts[LABELED_FILENAME]
+    labeling_coverage = total_labeled_issues / total_issues * 100 if total_issues > 0 else 0
+    issue_statement = "This repository contains %d issues in total of which %d (%.2f%%) are labeled."
+    print(issue_statement % (total_issues, total_labeled_issues, labeling_coverage))
 
-    if issue_counts[LABELED_FILENAME] + issue_counts[UNLABELED_FILENAME] > 0:
-        print("%d labeled and %d unlabeled issues from %s were fetched and saved at %s"
-            % (issue_counts[LABELED_FILENAME], issue_counts[UNLABELED_FILENAME], repository_base_url, folder))
+    print("%d labeled and %d unlabeled issues from %s were fetched with page size %d and saved at %s"
+        % (
+            issue_counts[LABELED_FILENAME],
+            issue_counts[UNLABELED_FILENAME],
+            repository_base_url,
+            page_size,
+            folder))
+    save_high_water_mark(repository_identifier, get_high_water_mark(repository_identifier))
 
 
-def print_issue_counts(repository_search_url, auth):
-    """Fetch and print the number of labeled and unlabeled issues in a JIRA repository
+def upsert_records(filename, records, replaced_ids):
+    """Rewrite a raw JSON Lines file without the records of replaced issue ids and append new records to it
 
     Arguments:
 
-    repository_search_url -- search interface endpoint address of JIRA REST API
+    filename -- the name of the JSON Lines file
 
-    auth -- authentication parameters containing username and API key or password,
-    None if authentication is not necessary
+    records -- records to be appended
+
+    replaced_ids -- a set of issue ids whose existing records are removed
     """
 
-    print("Fetching the number of total issues")
-    total_issues = get_issue_count(repository_search_url, auth)
-    total_labeled_issues = get_issue_count(repository_search_url, auth, LABELED_DATA_JQL)
-    labeling_coverage = total_labeled_issues / total_issues * 100 if total_issues > 0 else 0
-    issue_statement = "This repository contains %d issues in total of which %d (%.2f%%) are labeled."
-    print(issue_statement % (total_issues, total_labeled_issues, labeling_coverage))
+    temporary_filename = filename + ".tmp"
+    with open_jsonl(temporary_filename, "wt") as file:
+        if os.path.isfile(filename):
+            for record in load_jsonl(filename):
+                if record.get(ID_FIELD_KEY) not in replaced_ids:
+                    write_jsonl_record(file, record)
+        for record in records:
+            write_jsonl_record(file, record)
+    os.replace(temporary_filename, filename)
+
+
+def parse_jira_datetime(value):
+    """Parse a JIRA timestamp such as '2018-03-05T10:11:12.000+0100', return None if it is not one"""
+
+    try:
+        return datetime.strptime(value, JIRA_DATETIME_FORMAT)
+    except (TypeError, ValueError):
+        return None
+
+
+def update_high_water_mark(high_water_mark, records, fallback_updated=None):
+    """Raise a high-water mark to the latest 'updated' timestamp and the largest issue id of raw records
+
+    Arguments:
+
+    high_water_mark -- a dictionary containing the latest 'updated' timestamp and the largest issue id
+
+    records -- an iterable of raw records
+
+    fallback_updated -- the timestamp used for records fetched before 'updated' field was stored (default None)
+    """
+
+    last_updated = parse_jira_datetime(high_water_mark.get(UPDATED_FIELD_KEY))
+    max_id = high_water_mark.get(ID_FIELD_KEY, 0)
+
+    for record in records:
+        issue_id = str(record.get(ID_FIELD_KEY, ""))
+        if issue_id.isdigit():
+            max_id = max(max_id, int(issue_id))
+        updated = parse_jira_datetime(record[UPDATED_FIELD_KEY]) if UPDATED_FIELD_KEY in record else fallback_updated
+        if updated is not None and (last_updated is None or updated > last_updated):
+            last_updated = updated
+
+    return {
+        UPDATED_FIELD_KEY: last_updated.strftime(JIRA_DATETIME_FORMAT) if last_updated is not None else None,
+        ID_FIELD_KEY: max_id
+    }
+
+
+def get_high_water_mark(repository_identifier):
+    """Find the latest 'updated' timestamp and the largest issue id in the raw data of a repository.
+    Raw files fetched before 'updated' field was stored fall back to the time they were last modified."""
+
+    high_water_mark = {UPDATED_FIELD_KEY: None, ID_FIELD_KEY: 0}
+    for labeling in LABELINGS:
+        filename = get_repository_filename(repository_identifier, labeling, RAW_POSTFIX, JSONL_FILE_EXTENSION)
+        if os.path.isfile(filename):
+            modified = datetime.fromtimestamp(os.path.getmtime(filename)).astimezone()
+            high_water_mark = update_high_water_mark(high_water_mark, load_jsonl(filename), modified)
+
+    return high_water_mark
+
+
+def save_high_water_mark(repository_identifier, high_water_mark):
+    """Save the latest 'updated' timestamp and the largest issue id fetched from a repository"""
+
+    save_json(get_repository_filename(repository_identifier, ALL_FILENAME, SYNC_POSTFIX, JSON_FILE_EXTENSION), high_water_mark)
+
+
+def load_high_water_mark(repository_identifier):
+    """Load the high-water mark of a repository, deriving it from the raw data if it was never saved"""
+
+    filename = get_repository_filename(repository_identifier, ALL_FILENAME, SYNC_POSTFIX, JSON_FILE_EXTENSION)
+    if os.path.isfile(filename):
+        return load_json(filename)
+
+    return get_high_water_mark(repository_identifier)
+
+
+def sync_data(repository_identifier, repository_url, auth = None, workers = 1):
+    """Fetch issues updated since the last fetch or sync of a repository, upsert them in its raw data files
+    and collect them in delta files so that only these issues are cleaned next time.
+    Issues updated on the day before the high-water mark are fetched again to cover time zone differences.
+    The high-water mark is only advanced if all updated issues could be fetched.
+
+    Arguments:
+
+    repository_identifier -- the name of a subfolder in raw_data folder where the data is saved
+
+    repository_url -- the URL of the repository from which data is to be fetched e.g. jira.exoplatform.org
+
+    auth -- authentication parameters containing username and API key or password (default None)
+
+    workers -- the number of slices fetched concurrently from the repository (default 1)
+    """
+
+    convert_legacy_raw_files(repository_identifier)
+    high_water_mark = load_high_water_mark(repository_identifier)
+    last_updated = parse_jira_datetime(high_water_mark.get(UPDATED_FIELD_KEY))
+    if last_updated is None:
+        print("%s does not contain any fetched issues to sync, fetch the repository instead" % repository_identifier)
+        return
+
+    repository_base_url = get_jira_base_url(repository_url)
+    repository_search_url = get_repository_search_url(repository_base_url)
+    updated_since = (last_updated - timedelta(days=SYNC_OVERLAP_DAYS)).strftime(JQL_DATE_FORMAT)
+    print("Fetching issues from %s updated since %s" % (repository_base_url, updated_since))
+
+    sync_filename = get_repository_filename(repository_identifier, ALL_FILENAME, SYNC_POSTFIX, JSONL_FILE_EXTENSION)
+    if os.path.isfile(sync_filename):
+        os.remove(sync_filename)
+    total_issues, _, unfetched_issue_count = fetch_and_save_issues(sync_filename, repository_search_url, auth, DELTA_DATA_JQL % updated_since, workers)
+    is_complete = total_issues is not None and unfetched_issue_count == 0
+    synced_records = {record.get(ID_FIELD_KEY): record for record in load_jsonl(sync_filename)} if os.path.isfile(sync_filename) else {}
+    synced_records = list(synced_records.values())
+    if os.path.isfile(sync_filename):
+        os.remove(sync_filename)
+
+    changed_records = {
+        LABELED_FILENAME: [record for record in synced_records if is_labeled(record)],
+        UNLABELED_FILENAME: [record for record in synced_records if not is_labeled(record)]
+    }
+    changed_ids = {record.get(ID_FIELD_KEY) for records in changed_records.values() for record in records}
+    if len(changed_ids) == 0:
+        if is_complete:
+            print("No issues were updated in %s since %s" % (repository_base_url, updated_since))
+        else:
+            print("Issues updated in %s since %s could not be fetched, sync the repository again" % (repository_base_url, updated_since))
+        return
+
+    for labeling in LABELINGS:
+        for postfix in RAW_POSTFIX, DELTA_POSTFIX:
+            filename = get_repository_filename(repository_identifier, labeling, postfix, JSONL_FILE_EXTENSION)
+            upsert_records(filename, changed_records[labeling], changed_ids)
+
+    new_issue_count = sum(1 for issue_id in changed_ids if str(issue_id).isdigit() and int(issue_id) > high_water_mark.get(ID_FIELD_KEY, 0))
+    print("%d labeled and %d unlabeled issues, %d of which are new, from %s were synced"
+        % (len(changed_records[LABELED_FILENAME]), len(changed_records[UNLABELED_FILENAME]), new_issue_count, repository_base_url))
+    if is_complete:
+        save_high_water_mark(repository_identifier, update_high_water_mark(high_water_mark, synced_records))
+    else:
+        save_high_water_mark(repository_identifier, high_water_mark)
+        print("Some issues updated in %s since %s could not be fetched, the high-water mark was not advanced so that they are fetched by the next sync"
+            % (repository_base_url, updated_since))
 
 
 def get_auth():
@@ -213,4 +739,6 @@ if __name__ == "__main__":
     repository_url = input("Please enter the URL of the repository (e.g. jira.exoplatform.org): ")
     dataset_identifier = input("Please enter an identifier for the repository (only letters and numbers): ")
     auth = get_auth()
-    fetch_data(dataset_identifier, repository_url, auth)
\ No newline at end of file
+    workers = input("Please enter the number of slices to fetch concurrently or leave blank to fetch one at a time: ")
+    fetch_data(dataset_identifier, repository_url, auth, int(workers) if workers.isdigit() else 1)
+    http_utils.print_request_statistics()
\ No newline at end of file
@@ -0,0 +1,189 @@
+import os
+import time
+
+from data_collection.fetch_data import get_fetch_progress
+from utilities.constants import DATA_FOLDER, FETCH_METRICS_FILENAME, SECONDS_IN_MINUTE
+from utilities.file_utils import save_json
+from utilities import http_utils
+
+LATENCY_PERCENTILES = 50, 90, 99
+
+
+def get_eta(remaining_issues, issues_per_second):
+    """Return the estimated number of seconds left, None if nothing was fetched yet"""
+
+    return round(max(0, remaining_issues) / issues_per_second, 1) if issues_per_second > 0 else None
+
+
+def get_repository_metrics(repository_identifier, fetch_progress, is_finished, now):
+    """Return the fetched and total issue counts, throughput, slices waiting to be saved and estimated time left
+    of a repository, None if fetching the repository did not start yet
+
+    Arguments:
+
+    repository_identifier -- the identifier of the repository and the name of its raw data subfolder
+
+    fetch_progress -- the progress of every fetched file as returned by get_fetch_progress
+
+    is_finished -- True if fetching the repository is over
+
+    now -- the current time in seconds since the epoch
+    """
+
+    folder = "%s/%s/" % (DATA_FOLDER, repository_identifier)
+    repository_progress = [progress for filename, progress in fetch_progress.items() if filename.startswith(folder)]
+    if len(repository_progress) == 0:
+        return None
+
+    fetched_issues = sum(progress["fetched"] for progress in repository_progress)
+    total_issues = sum(progress["total"] for progress in repository_progress)
+    started = min(progress["started"] for progress in repository_progress)
+    elapsed = (max(progress["updated"] for progress in repository_progress) if is_finished else now) - started
+    issues_per_second = fetched_issues / elapsed if elapsed > 0 else 0
+
+    return {
+        "finished": is_finished,
+        "fetched_issues": fetched_issues,
+        "total_issues": total_issues,
+        "seconds": round(elapsed, 1),
+        "issues_per_second": round(issues_per_second, 1),
+        "queue_depth": sum(progress["queue_depth"] for progress in repository_progress),
+        "eta_seconds": 0 if is_finished else get_eta(total_issues - fetched_issues, issues_per_second)
+    }
+
+
+def get_host_metrics(host_statistics, now):
+    """Return request counts, throughput and latency percentiles of a host from its request statistics"""
+
+    elapsed = (host_statistics["last_response"] or now) - host_statistics["first_request"]
+    latency_histogram = host_statistics["latency_histogram"]
+
+    return dict({
+        "requests": host_statistics["requests"],
+        "failures": host_statistics["failures"],
+        "retries": host_statistics["retries"],
+        "bytes": host_statistics["bytes"],
+        "bytes_per_second": round(host_statistics["bytes"] / elapsed, 1) if elapsed > 0 else 0,
+        "requests_per_second": round(host_statistics["requests"] / elapsed, 2) if elapsed > 0 else 0,
+        "rate_limit_wait_seconds": round(host_statistics["total_wait"], 1),
+        "mean_latency": round(host_statistics["total_latency"] / host_statistics["requests"], 3),
+        "max_latency": round(host_statistics["max_latency"], 3),
+        "latency_histogram": dict(zip(
+            ["<=%g" % bound for bound in http_utils.LATENCY_BUCKETS_SECONDS] + [">%g" % http_utils.LATENCY_BUCKETS_SECONDS[-1]],
+            latency_histogram))
+    }, **{
+        "p%d_latency" % percentile: http_utils.get_latency_percentile(latency_histogram, percentile)
+        for percentile in LATENCY_PERCENTILES
+    })
+
+
+def get_fetch_metrics(repository_identifiers, finished_repository_identifiers, start_time):
+    """Collect the progress of every repository, the request statistics of every host and the overall
+    throughput and estimated time left of a bulk fetch. Repositories which were not started yet
+    are assumed to be as large as the average started one.
+
+    Arguments:
+
+    repository_identifiers -- the identifiers of all fetched repositories
+
+    finished_repository_identifiers -- the identifiers of the repositories which are fetched already
+
+    start_time -- the time the bulk fetch started in seconds since the epoch
+    """
+
+    now = time.time()
+    fetch_progress = get_fetch_progress()
+    repositories = {}
+    for repository_identifier in repository_identifiers:
+        repository_metrics = get_repository_metrics(
+            repository_identifier, fetch_progress, repository_identifier in finished_repository_identifiers, now)
+        if repository_metrics is not None:
+            repositories[repository_identifier] = repository_metrics
+
+    hosts = {
+        host: get_host_metrics(host_statistics, now)
+        for host, host_statistics in http_utils.get_request_statistics().items()
+    }
+
+    fetched_issues = sum(metrics["fetched_issues"] for metrics in repositories.values())
+    total_issues = sum(metrics["total_issues"] for metrics in repositories.values())
+    if len(repositories) > 0:
+        total_issues += total_issues / len(repositories) * (len(repository_identifiers) - len(repositories))
+    elapsed = now - start_time
+    issues_per_second = fetched_issues / elapsed if elapsed > 0 else 0
+
+    return {
+        "time": now,
+        "seconds": round(elapsed, 1),
+        "repositories": len(repository_identifiers),
+        "started_repositories": len(repositories),
+        "finished_repositories": len(finished_repository_identifiers),
+        "fetched_issues": fetched_issues,
+        "estimated_total_issues": round(total_issues),
+        "issues_per_second": round(issues_per_second, 1),
+        "bytes_per_second": round(sum(metrics["bytes"] for metrics in hosts.values()) / elapsed, 1) if elapsed > 0 else 0,
+        "requests": sum(metrics["requests"] for metrics in hosts.values()),
+        "retries": sum(metrics["retries"] for metrics in hosts.values()),
+        "queue_depth": sum(metrics["queue_depth"] for metrics in repositories.values()),
+        "eta_seconds": get_eta(total_issues - fetched_issues, issues_per_second),
+        "repository_metrics": repositories,
+        "host_metrics": hosts
+    }
+
+
+def save_fetch_metrics(metrics, filename=FETCH_METRICS_FILENAME):
+    """Replace the metrics file at once so that it can be read at any time while it is updated"""
+
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    temporary_filename = filename + ".tmp"
+    save_json(temporary_filename, metrics)
+    os.replace(temporary_filename, filename)
+
+
+def format_eta(eta_seconds):
+
+    if eta_seconds is None:
+        return "ETA unknown"
+
+    return "ETA %.1f min" % (eta_seconds / SECONDS_IN_MINUTE)
+
+
+def print_fetch_metrics(metrics):
+    """Print a compact summary of the overall progress, a line for every unfinished repository and a line for every host"""
+
+    print("-----------------------------")
+    print("%d of %d repositories finished, %d started, %d of ~%d issues fetched, %.1f issues/s, %.1f KB/s, %d requests, %d retried, %s"
+        % (
+            metrics["finished_repositories"],
+            metrics["repositories"],
+            metrics["started_repositories"],
+            metrics["fetched_issues"],
+            metrics["estimated_total_issues"],
+            metrics["issues_per_second"],
+            metrics["bytes_per_second"] / 2 ** 10,
+            metrics["requests"],
+            metrics["retries"],
+            format_eta(metrics["eta_seconds"])))
+
+    for repository_identifier, repository_metrics in sorted(metrics["repository_metrics"].items()):
+        if repository_metrics["finished"]:
+            continue
+        print("  %s - %d of %d issues, %.1f issues/s, %d slices queued, %s"
+            % (
+                repository_identifier,
+                repository_metrics["fetched_issues"],
+                repository_metrics["total_issues"],
+                repository_metrics["issues_per_second"],
+                repository_metrics["queue_depth"],
+                format_eta(repository_metrics["eta_seconds"])))
+
+    for host, host_metrics in sorted(metrics["host_metrics"].items()):
+        print("  %s - %.2f requests/s, %d failed, %d retried, latency p50 %s, p90 %s, p99 %s"
+            % (
+                host,
+                host_metrics["requests_per_second"],
+                host_metrics["failures"],
+                host_metrics["retries"],
+                http_utils.format_latency_bound(host_metrics["p50_latency"]),
+                http_utils.format_latency_bound(host_metrics["p90_latency"]),
+                http_utils.format_latency_bound(host_metrics["p99_latency"])))
@@ -0,0 +1,251 @@
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+import gzip
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import re
+import sys
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+from utilities.constants import DESCRIPTION_FIELD_KEY, ID_FIELD_KEY, JIRA_DATETIME_FORMAT, JIRA_REST, JIRA_SEARCH
+from utilities.constants import LABELED_DATA_JQL, PROJECT_FIELD_KEY, RESOLUTION_FIELD_KEY, SUMMARY_FIELD_KEY
+from utilities.constants import TIMESPENT_FIELD_KEY, UNLABELED_DATA_JQL, UPDATED_FIELD_KEY
+
+DEFAULT_PORT = 8080
+DEFAULT_MAX_RESULTS = 50
+PROJECT_KEYS = "CORE", "UI", "API", "DOCS"
+WORDS = ("the", "issue", "fails", "when", "user", "clicks", "save", "button", "page", "error", "server", "returns",
+    "null", "pointer", "exception", "after", "upgrade", "add", "support", "for", "new", "report", "export", "login",
+    "timeout", "database", "query", "slow", "update", "documentation", "fix", "typo", "in", "settings", "dialog")
+FIRST_UPDATED = datetime(2015, 1, 1, tzinfo=timezone.utc)
+MOCK_UPDATED_FORMAT = "%Y-%m-%dT%H:%M:%S.000%z"
+JQL_ID_CONDITION = re.compile(r"\bid\s*(>=|<)\s*(\d+)")
+JQL_UPDATED_CONDITION = re.compile(r"\bupdated\s*>=\s*\"(\d{4}/\d{2}/\d{2})\"")
+JQL_ORDER = re.compile(r"order\s+by\s+id\s+(asc|desc)", re.IGNORECASE)
+
+
+class MockJiraConfig():
+    """Behaviour of a mock JIRA search endpoint
+
+    issue_count -- the number of synthetic issues served
+
+    labeled_ratio -- the share of resolved issues with time spent greater than zero
+
+    max_page_size -- the largest number of issues returned per page regardless of maxResults
+
+    latency_seconds -- the delay of every response
+
+    offset_latency_seconds -- the additional delay per 1000 issues of start index, simulating slow deep pagination
+
+    error_rate -- the share of requests answered with status code 500
+
+    requests_per_second -- the request rate above which requests are answered with status code 429, 0 for no limit
+
+    seed -- the seed of the synthetic issues and injected errors
+    """
+
+    def __init__(self):
+        self.issue_count = 10000
+        self.labeled_ratio = 0.1
+        self.max_page_size = 100
+        self.latency_seconds = 0.05
+        self.offset_latency_seconds = 0.0
+        self.error_rate = 0.0
+        self.requests_per_second = 0
+        self.seed = 7
+
+
+def generate_issues(config):
+    """Generate synthetic JIRA issues in the search response format, ordered by issue id"""
+
+    generator = random.Random(config.seed)
+    issues = []
+    issue_id = 10000
+    for i in range(config.issue_count):
+        issue_id = issue_id + generator.randint(1, 3)
+        is_labeled = generator.random() < config.labeled_ratio
+        updated = FIRST_UPDATED + timedelta(minutes=generator.randint(0, 60 * 24 * 365 * 3))
+        project_key = generator.choice(PROJECT_KEYS)
+        fields = {
+            PROJECT_FIELD_KEY: {"key": project_key},
+            SUMMARY_FIELD_KEY: " ".join(generator.choice(WORDS) for _ in range(generator.randint(3, 12))),
+            DESCRIPTION_FIELD_KEY: " ".join(generator.choice(WORDS) for _ in range(generator.randint(0, 200))) or None,
+            TIMESPENT_FIELD_KEY: generator.randint(1, 40) * 900 if is_labeled else None,
+            RESOLUTION_FIELD_KEY: {"name": "Fixed"} if is_labeled or generator.random() < 0.5 else None,
+            UPDATED_FIELD_KEY: updated.strftime(MOCK_UPDATED_FORMAT)
+        }
+        issues.append({ID_FIELD_KEY: str(issue_id), "key": "%s-%d" % (project_key, i + 1), "fields": fields})
+
+    return issues
+
+
+def is_labeled(issue):
+    """Check if a synthetic issue matches LABELED_DATA_JQL"""
+
+    fields = issue["fields"]
+    return fields[RESOLUTION_FIELD_KEY] is not None and (fields[TIMESPENT_FIELD_KEY] or 0) > 0
+
+
+def search(issues, issue_ids, jql):
+    """Return the issues matching the subset of JQL used by the data collection scripts:
+    the labeled and unlabeled queries, 'id >= N', 'id < N', 'updated >= "yyyy/MM/dd"' and 'order by id'"""
+
+    from_index, to_index = 0, len(issues)
+    for operator, value in JQL_ID_CONDITION.findall(jql):
+        if operator == ">=":
+            from_index = max(from_index, bisect_left(issue_ids, int(value)))
+        else:
+            to_index = min(to_index, bisect_left(issue_ids, int(value)))
+    result = issues[from_index:to_index]
+
+    if LABELED_DATA_JQL in jql:
+        result = [issue for issue in result if is_labeled(issue)]
+    elif UNLABELED_DATA_JQL in jql:
+        result = [issue for issue in result if not is_labeled(issue)]
+
+    updated_condition = JQL_UPDATED_CONDITION.search(jql)
+    if updated_condition is not None:
+        updated_since = datetime.strptime(updated_condition.group(1), "%Y/%m/%d").replace(tzinfo=timezone.utc)
+        result = [issue for issue in result
+            if datetime.strptime(issue["fields"][UPDATED_FIELD_KEY], JIRA_DATETIME_FORMAT) >= updated_since]
+
+    order = JQL_ORDER.search(jql)
+    if order is not None and order.group(1).lower() == "desc":
+        result = result[::-1]
+
+    return result
+
+
+class MockJiraServer(ThreadingHTTPServer):
+    """Threaded HTTP server answering JIRA REST API search requests with synthetic issues
+    and counting the requests, injected errors, throttled requests and bytes sent"""
+
+    daemon_threads = True
+
+    def __init__(self, port, config):
+        super().__init__(("127.0.0.1", port), MockJiraRequestHandler)
+        self.config = config
+        self.issues = generate_issues(config)
+        self.issue_ids = [int(issue[ID_FIELD_KEY]) for issue in self.issues]
+        self.random = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.request_times = []
+        self.statistics = {"requests": 0, "errors": 0, "throttled": 0, "bytes_sent": 0}
+
+    def is_throttled(self):
+        """Check if more than requests_per_second requests were received during the last second"""
+
+        if not self.config.requests_per_second:
+            return False
+
+        with self.lock:
+            now = time.monotonic()
+            self.request_times = [t for t in self.request_times if t > now - 1]
+            self.request_times.append(now)
+            return len(self.request_times) > self.config.requests_per_second
+
+    def is_error_injected(self):
+
+        with self.lock:
+            return self.random.random() < self.config.error_rate
+
+    def record(self, statistic, byte_count):
+
+        with self.lock:
+            self.statistics["requests"] += 1
+            self.statistics["bytes_sent"] += byte_count
+            if statistic is not None:
+                self.statistics[statistic] += 1
+
+    def get_statistics(self):
+
+        with self.lock:
+            return dict(self.statistics)
+
+
+class MockJiraRequestHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+
+        url = urlparse(self.path)
+        if url.path != JIRA_REST + JIRA_SEARCH:
+            return self.send_json(404, {"errorMessages": ["Not found"]})
+
+        if self.server.is_throttled():
+            return self.send_json(429, {"errorMessages": ["Rate limit exceeded"]}, {"Retry-After": "1"}, "throttled")
+
+        if self.server.is_error_injected():
+            return self.send_json(500, {"errorMessages": ["Injected error"]}, statistic="errors")
+
+        params = parse_qs(url.query)
+        start_at = int(params.get("startAt", ["0"])[0])
+        max_results = min(int(params.get("maxResults", [str(DEFAULT_MAX_RESULTS)])[0]), self.server.config.max_page_size)
+        jql = params.get("jql", [""])[0]
+        fields = params.get("fields", [""])[0].split(",")
+
+        config = self.server.config
+        time.sleep(config.latency_seconds + config.offset_latency_seconds * start_at / 1000)
+
+        result = search(self.server.issues, self.server.issue_ids, jql)
+        page = [
+            {
+                ID_FIELD_KEY: issue[ID_FIELD_KEY],
+                "key": issue["key"],
+                "fields": {key: value for key, value in issue["fields"].items() if key in fields}
+            }
+            for issue in result[start_at:start_at + max_results]]
+
+        self.send_json(200, {"startAt": start_at, "maxResults": max_results, "total": len(result), "issues": page})
+
+    def send_json(self, status_code, content, headers=None, statistic=None):
+
+        body = json.dumps(content).encode("utf-8")
+        is_gzip_accepted = "gzip" in self.headers.get("Accept-Encoding", "")
+        if is_gzip_accepted:
+            body = gzip.compress(body)
+
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if is_gzip_accepted:
+            self.send_header("Content-Encoding", "gzip")
+        for header, value in (headers or {}).items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.record(statistic, len(body))
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_jira(config=None, port=0):
+    """Start a mock JIRA server in a background thread and return it,
+    its base URL is 'localhost:PORT' where PORT is server.server_port
+
+    Arguments:
+
+    config -- the behaviour of the server, default MockJiraConfig() if None
+
+    port -- the port to listen on, 0 for any free port (default 0)
+    """
+
+    server = MockJiraServer(port, config if config is not None else MockJiraConfig())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    return server
+
+
+if __name__ == "__main__":
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT
+    server = start_mock_jira(port=port)
+    print("Mock JIRA repository with %d issues is available at localhost:%d, press ENTER to stop" % (len(server.issues), port))
+    input()
+    server.shutdown()
@@ -1,14 +1,26 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import json
 import re
 import requests
 import sys
 
+from data_collection.discovery_cache import DiscoveryCache
 from utilities.constants import get_repository_search_url
-from utilities.constants import LABELED_DATA_JQL, POTENTIAL_REPOS_FILENAME, REQUEST_TIMEOUT_SECONDS, TIMESPENT_FIELD_KEY 
+from utilities.constants import LABELED_DATA_JQL, POTENTIAL_REPOS_FILENAME, TIMESPENT_FIELD_KEY
+from utilities import http_utils
+
+PROBE_WORKERS = 200
+PROBE_MAX_ATTEMPTS = 2
+PROBE_CACHE_SAVE_INTERVAL = 100
+QUALIFIED = "qualified"
+TOO_SMALL = "too_small"
+LABELS_UNREADABLE = "labels_unreadable"
+NOT_QUALIFIED = "not_qualified"
+FAILED = "failed"
 
 
 def get_issue_count(repository_search_url, auth=None, jql=""):
-    """Get the number of JIRA issues in JIRA repository.
+    """Get the number of JIRA issues in JIRA repository, None if the number could not be fetched.
     
     Arguments:
 
@@ -28,10 +40,10 @@ def get_issue_count(repository_search_url, auth=None, jql=""):
     }
 
     try:
-        response = requests.get(repository_search_url, params=params, auth=auth, timeout=REQUEST_TIMEOUT_SECONDS)
+        response = http_utils.get_with_retry(repository_search_url, params=params, auth=auth, max_attempts=PROBE_MAX_ATTEMPTS)
     except requests.exceptions.RequestException:
         print("An exception occurred while trying to get issue count")
-        return 0
+        return None
 
     if response.status_code != 200:
         print("%s returned unexpected status code %d when trying to get number of issues with the following JQL query: %s"
@@ -41,22 +53,27 @@ def get_issue_count(repository_search_url, auth=None, jql=""):
             error_messages = response.json().get("errorMessages")
         except json.decoder.JSONDecodeError:
             print("Could not decode error message")
-            return 0
+            return None
 
         if error_messages is not None and len(error_messages) > 0:
             print('\n'.join(error_messages))
 
-        return 0
+        return None
 
     try: 
-        return response.json().get("total")
+        total = response.json().get("total")
     except json.decoder.JSONDecodeError:
+        total = None
+
+    if not isinstance(total, int):
         print("Response did not contain issue count")
-        return 0
+        return None
+
+    return total
 
 
 def is_timespent_returned(repository_search_url):
-    """Check if 'timespent' field is publicly accessible in a JIRA repository
+    """Check if 'timespent' field is publicly accessible in a JIRA repository, None if the check could not be made
     
     Arguments:
 
@@ -72,17 +89,17 @@ def is_timespent_returned(repository_search_url):
     }
 
     try:
-        response = requests.get(repository_search_url, params=params)
+        response = http_utils.get_with_retry(repository_search_url, params=params, max_attempts=PROBE_MAX_ATTEMPTS)
     except requests.exceptions.RequestException:
-        return False
+        return None
 
     if response.status_code != 200:
-        return False
+        return None
 
     try:
         json_response = response.json()
     except json.JSONDecodeError:
-        return False
+        return None
 
     issues = json_response.get("issues", None)
     if issues is None or len(issues) < 1:
@@ -104,10 +121,106 @@ def get_jira_base_url(url):
     return re.sub(r"((.*?)\:\/\/)|((\/)(.*?).jspa)|(\/secure)", "", url).strip("/")
 
 
-def test_repos(potential_jira_repo_url_list, min_labeled_issue_count):
+def normalize_jira_base_url(url):
+    """Extract JIRA repository base URL and lowercase its host name so that the same repository
+    found by different URLs is only examined once"""
+
+    base_url = get_jira_base_url(url.strip())
+    host, separator, path = base_url.partition("/")
+    return host.lower() + separator + path
+
+
+def probe_repo(url, min_labeled_issue_count):
+    """Examine a single JIRA repository base URL and return its status
+    and the repository details if the repository is qualified.
+    The status is FAILED if a request to the repository failed.
+
+    Arguments:
+
+    url -- JIRA repository base URL, e.g. 'issues.apache.org/jira'
+
+    min_labeled_issue_count -- the minimal number of labeled issues for a repository to be qualified
+    """
+
+    repository_search_url = get_repository_search_url(url)
+
+    total_labeled_issues = get_issue_count(repository_search_url, None, LABELED_DATA_JQL)
+    if total_labeled_issues is None:
+        return (FAILED, None)
+    if total_labeled_issues < min_labeled_issue_count:
+        return (TOO_SMALL if total_labeled_issues > 0 else NOT_QUALIFIED, None)
+
+    is_readable = is_timespent_returned(repository_search_url)
+    if is_readable is None:
+        return (FAILED, None)
+    if not is_readable:
+        return (LABELS_UNREADABLE, None)
+
+    total_issues = get_issue_count(repository_search_url)
+    if total_issues is None:
+        return (FAILED, None)
+    labeling_coverage = total_labeled_issues / total_issues * 100 if total_issues > 0 else 0
+
+    repo = {
+        "url": url,
+        "labeled_issues": total_labeled_issues,
+        "total_issues": total_issues,
+        "labeling_coverage": round(labeling_coverage, 2)
+    }
+    return (QUALIFIED, repo)
+
+
+def probe_repos(potential_jira_repo_url_list, min_labeled_issue_count, workers=PROBE_WORKERS, cache=None):
+    """Examine potential JIRA repository URLs concurrently and yield the status and repository details
+    of each distinct repository as soon as it is examined, see probe_repo. A repository whose examination
+    failed or raised an exception is yielded as FAILED and not cached. Repositories examined recently are taken
+    from the cache, which is saved every PROBE_CACHE_SAVE_INTERVAL examined repositories.
+
+    Arguments:
+
+    potential_jira_repo_url_list -- an iterable containing potential JIRA repository URLs
+
+    min_labeled_issue_count -- the minimal number of labeled issues for a repository to be qualified
+
+    workers -- the number of repositories examined concurrently (default PROBE_WORKERS)
+
+    cache -- a DiscoveryCache of earlier probe outcomes, None to examine every repository (default None)
+    """
+
+    urls = {normalize_jira_base_url(url) for url in potential_jira_repo_url_list}
+    urls.discard("")
+
+    cached_results = {}
+    if cache is not None:
+        cached_results = {url: cache.get_probe_result(url, min_labeled_issue_count) for url in urls}
+        cached_results = {url: result for url, result in cached_results.items() if result is not None}
+        if len(cached_results) > 0:
+            print("%d of %d repositories were examined recently and are taken from the cache" % (len(cached_results), len(urls)))
+    yield from cached_results.values()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(probe_repo, url, min_labeled_issue_count): url
+            for url in urls if url not in cached_results}
+        for i, future in enumerate(as_completed(futures)):
+            try:
+                result = future.result()
+            except Exception as e:
+                print("Examining %s failed: %s" % (futures[future], e))
+                result = (FAILED, None)
+            if cache is not None:
+                if result[0] != FAILED:
+                    cache.set_probe_result(futures[future], min_labeled_issue_count, result)
+                if (i + 1) % PROBE_CACHE_SAVE_INTERVAL == 0 or i + 1 == len(futures):
+                    cache.save()
+            yield result
+
+
+def test_repos(potential_jira_repo_url_list, min_labeled_issue_count, workers=PROBE_WORKERS, cache=None):
     """Test a list of URLs and return JIRA repository URLs with publicly available 'timespent' field
     and at least min_labeled_issue_count labeled issues.  A labeled issue is a resolved issue
-    with 'timespent' reported, which is greater than zero.
+    with 'timespent' reported, which is greater than zero. Qualified repositories are printed
+    as soon as they are confirmed.
 
     Arguments:
 
@@ -116,46 +229,37 @@ def test_repos(potential_jira_repo_url_list, min_labeled_issue_count):
 
 
     min_labeled_issue_count -- the minimal number of labeled issues for a repository to be qualified
+
+    workers -- the number of repositories examined concurrently (default PROBE_WORKERS)
+
+    cache -- a DiscoveryCache of earlier probe outcomes, None to examine every repository (default None)
     """
     
     examined_website_count = len(potential_jira_repo_url_list)
     open_repos = []
     too_small_count = 0
     unreadable_labels_count = 0
+    failed_count = 0
 
-    for url in potential_jira_repo_url_list:
+    for status, repo in probe_repos(potential_jira_repo_url_list, min_labeled_issue_count, workers, cache):
 
-        url = get_jira_base_url(url.strip())
-        is_already_added = sum(1 for repo in open_repos if repo["url"] == url) > 0
-        if is_already_added == True:
+        if status == TOO_SMALL:
+            too_small_count = too_small_count + 1
             continue
-        print("-----------------------------")
-        print("Trying out %s" % url)
 
-        repository_search_url = get_repository_search_url(url)
-        
-        total_labeled_issues = get_issue_count(repository_search_url, None, LABELED_DATA_JQL)
-        if total_labeled_issues < min_labeled_issue_count:
-            if total_labeled_issues > 0:
-                too_small_count = too_small_count + 1
+        if status == LABELS_UNREADABLE:
+            unreadable_labels_count = unreadable_labels_count + 1
             continue
 
-        if not is_timespent_returned(repository_search_url):
-            unreadable_labels_count = unreadable_labels_count + 1
+        if status == FAILED:
+            failed_count = failed_count + 1
             continue
 
-        total_issues = get_issue_count(repository_search_url)
-        labeling_coverage = total_labeled_issues / total_issues * 100 if total_issues > 0 else 0
+        if status != QUALIFIED:
+            continue
 
         issue_statement = "%s contains %d issues in total of which %d (%.2f%%) are labeled."
-        print(issue_statement % (url, total_issues, total_labeled_issues, labeling_coverage))
-
-        repo = {
-            "url": url,
-            "labeled_issues": total_labeled_issues,
-            "total_issues": total_issues,
-            "labeling_coverage": round(labeling_coverage, 2)
-        }
+        print(issue_statement % (repo["url"], repo["total_issues"], repo["labeled_issues"], repo["labeling_coverage"]))
         open_repos.append(repo)
 
     open_repos = sorted(open_repos, key=lambda result: result["labeled_issues"], reverse=True)
@@ -163,6 +267,7 @@ def test_repos(potential_jira_repo_url_list, min_labeled_issue_count):
         "examined_websites": examined_website_count,
         "too_small": too_small_count,
         "labels_unreadable": unreadable_labels_count,
+        "failed": failed_count,
         "open_repos": open_repos
     }
 
@@ -185,6 +290,8 @@ def print_test_result(result, min_labeled_issue_count):
     if result["too_small"] > 0:
         print("%d were disqualified before they contained less than %d labeled issues."
             % (result["too_small"], min_labeled_issue_count))
+    if result["failed"] > 0:
+        print("%d could not be examined and will be examined again on the next run." % result["failed"])
     if len(result["open_repos"]) == 0:
         print("No repositories satisfying the criteria were found.")
         sys.exit()
@@ -206,5 +313,6 @@ if __name__ == "__main__":
     
     min_labeled_issue_count = int(input("Minimum number of labeled issues (resolved and timespent > 0) to qualify a repository: "))
     
-    result = test_repos(potential_repo_url_list, min_labeled_issue_count)
+    result = test_repos(potential_repo_url_list, min_labeled_issue_count, cache=DiscoveryCache())
+    http_utils.print_request_statistics()
     print_test_result(result, min_labeled_issue_count)
\ No newline at end of file
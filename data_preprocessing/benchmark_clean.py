@@ -0,0 +1,319 @@
+import hashlib
+import json
+import random
+import re
+from string import punctuation
+import sys
+import timeit
+
+import numpy as np
+
+from data_preprocessing.clean_text import MAX_CHARS_PROCESSED, MAX_FRAGMENT_LENGTH, MIN_ALPHA_DENSITY, TEXT_PROCESSING_METHODS
+from data_preprocessing.clean_text import clean, escape_punctuation_and_low_alpha_density_words, escape_text, remove_repeating_fragments
+from utilities.constants import CLEAN_GOLDEN_SET_FILENAME
+from utilities.file_utils import load_json, save_json
+
+BENCHMARK_SEED = 7
+BENCHMARK_REPEATS = 5
+LOG_WORDS = ("info", "warn", "error", "debug", "connection", "retry", "timeout", "user", "request", "done", "at", "ms")
+PROSE_WORDS = ("the", "button", "doesn\\'t", "work", "when", "(see", "attached)", "e.g.", "settings,", "v1.2", "\"quoted\"", "page.")
+SYMBOL_WORDS = ("foo_bar()", "x=1;", "a/b/c", "0x1f", "$home", "<div>", "--verbose", "key:value", "100%", "#123", "i++", "::")
+NON_ASCII_WORDS = ("café", "naïve", "“quoted”", "über", "–", "…", "→", "größe", "日本語", "✓")
+CODE_LINES = ("public void save(User user) {", "if (user == null) return;", "repository.save(user);", "}",
+    "<property name=\"timeout\" value=\"30\"/>", "SELECT * FROM issue WHERE id = 42;", "x = foo_bar(a, b) + 1")
+EXCEPTIONS = ("java.lang.NullPointerException", "java.io.IOException: Connection reset", "org.hibernate.LazyInitializationException")
+FRAMES = ("org.apache.catalina.core.StandardWrapperValve.invoke(StandardWrapperValve.java:233)",
+    "com.example.service.UserService.save(UserService.java:87)", "sun.reflect.NativeMethodAccessorImpl.invoke0(Native Method)",
+    "java.lang.Thread.run(Thread.java:745)", "org.springframework.web.servlet.FrameworkServlet.service(FrameworkServlet.java:846)")
+LINK_TEMPLATES = ("[see the docs|https://docs.example.org/%s]", "https://issues.example.org/browse/%s", "[~%s]", "[#%s]",
+    "[attachment|file:///tmp/%s.log]", "[^%s.png]")
+CORPUS_SIZES = 100, 1000, 10000
+CORPUS_REPEATS = 3
+GOLDEN_SET_SEED = 11
+GOLDEN_SET_SIZE = 100
+
+
+def remove_repeating_fragments_by_joining(text):
+    """Reference implementation of remove_repeating_fragments, which joins both compared fragments
+    in a string for every word and fragment length"""
+
+    words = text.split()
+    duplicates = np.full((len(words)), False)
+    for i in range(1, len(words)):
+        max_step = min(MAX_FRAGMENT_LENGTH, (i + 1) // 2)
+        for step in range(1, max_step + 1):
+            first_fragment = ' '.join(words[i-step+1:i+1])
+            second_fragment = ' '.join(words[i-2*step+1:i-step+1])
+            if first_fragment == second_fragment:
+                duplicates[i-step+1:i+1] = True
+
+    result = []
+    for i, word in enumerate(words):
+        if not duplicates[i]:
+            result.append(word)
+
+    return " ".join(result)
+
+
+def calculate_alpha_density_by_matching(text):
+    """Reference implementation of calculate_alpha_density, which matches letters and spaces with regular expressions"""
+
+    total = len(text)
+    alphas = len(re.findall("[a-zA-Z]", text))
+    spaces = len(re.findall(r"\s", text))
+    symnums = total - (spaces + alphas)
+
+    apos = text.count(r"\\'") * 3
+    alphas = alphas + apos
+    symnums = symnums - apos
+
+    return alphas / (symnums + alphas) if (symnums + alphas) > 0 else 0
+
+
+def escape_punctuation_and_low_alpha_density_words_in_two_passes(text):
+    """Reference implementation of escape_punctuation_and_low_alpha_density_words, which strips punctuation
+    from all words, joins them and splits the text again to escape words with low alpha density"""
+
+    text = " ".join([word.strip(punctuation.replace(".", "")).lstrip(".") for word in text.split()])
+
+    clean_words = []
+    for word in text.split():
+
+        alpha_density = calculate_alpha_density_by_matching(word)
+        if alpha_density < MIN_ALPHA_DENSITY:
+            allowed_symbol_count = word.count("'") + word.count(".")
+            if word.count("'") > 1 or word.count(".") > 1 or alpha_density != (len(word) - allowed_symbol_count) / len(word):
+                continue
+
+        clean_words.append(word)
+
+    return " ".join(clean_words)
+
+
+def truncate(words):
+    """Join words and cut the text to the length which is cleaned"""
+
+    return " ".join(words)[:MAX_CHARS_PROCESSED]
+
+
+def get_adversarial_texts(seed=BENCHMARK_SEED):
+    """Return named texts of MAX_CHARS_PROCESSED characters which are expensive for repeated fragment removal:
+    distinct words, a single repeated word, fragments repeated with every length up to MAX_FRAGMENT_LENGTH
+    and beyond, and log lines with a few varying words"""
+
+    generator = random.Random(seed)
+    word_count = MAX_CHARS_PROCESSED // 2
+    texts = {
+        "distinct_words": truncate("w%d" % i for i in range(word_count)),
+        "single_word": truncate(["a"] * word_count),
+        "log_lines": truncate(
+            word for _ in range(word_count // 8)
+            for word in [generator.choice(LOG_WORDS) for _ in range(6)] + [str(generator.randint(0, 9)), "ms"]),
+        "random_small_vocabulary": truncate(generator.choice("abc") for _ in range(word_count))
+    }
+    for fragment_length in 2, MAX_FRAGMENT_LENGTH, MAX_FRAGMENT_LENGTH + 1:
+        fragment = ["f%d" % i for i in range(fragment_length)]
+        texts["period_%d" % fragment_length] = truncate(fragment * (word_count // fragment_length))
+
+    return texts
+
+
+def get_word_texts(seed=BENCHMARK_SEED):
+    """Return named texts of MAX_CHARS_PROCESSED characters with different shares of words
+    which consist of latin letters only"""
+
+    generator = random.Random(seed)
+    word_count = MAX_CHARS_PROCESSED // 4
+    return {
+        "letters_only": truncate(generator.choice(LOG_WORDS) for _ in range(word_count)),
+        "prose": truncate(generator.choice(PROSE_WORDS + LOG_WORDS) for _ in range(word_count)),
+        "symbols": truncate(generator.choice(SYMBOL_WORDS) for _ in range(word_count))
+    }
+
+
+def get_prose(generator):
+
+    sentences = []
+    for _ in range(generator.randint(1, 4)):
+        words = [generator.choice(PROSE_WORDS + LOG_WORDS) for _ in range(generator.randint(4, 14))]
+        if generator.random() < 0.3:
+            words[generator.randrange(len(words))] = generator.choice(NON_ASCII_WORDS)
+        sentences.append(" ".join(words).capitalize() + ".")
+
+    return " ".join(sentences)
+
+
+def get_code_block(generator):
+
+    tag = generator.choice(["{code}", "{code:java}", "{noformat}"])
+    lines = [generator.choice(CODE_LINES) for _ in range(generator.randint(2, 12))]
+    return "\n".join([tag] + lines + [tag.split(":")[0].rstrip("}") + "}"])
+
+
+def get_stack_trace(generator):
+
+    frames = ["\tat " + generator.choice(FRAMES) for _ in range(generator.randint(3, 20))]
+    return "\n".join([generator.choice(EXCEPTIONS)] + frames)
+
+
+def get_links(generator):
+
+    return " ".join(generator.choice(LINK_TEMPLATES) % generator.choice(LOG_WORDS) for _ in range(generator.randint(1, 4)))
+
+
+def get_markup(generator):
+
+    text = get_prose(generator)
+    return generator.choice(["h2. %s", "{color:red}%s{color}", "{quote}%s{quote}", "{panel:title=Steps}%s{panel}", "*%s*"]) % text
+
+
+def get_repeated_log_lines(generator):
+
+    line = " ".join(generator.choice(LOG_WORDS) for _ in range(generator.randint(3, 8)))
+    return "\n".join([line] * generator.randint(2, 30))
+
+
+NOISE_GENERATORS = get_prose, get_prose, get_code_block, get_stack_trace, get_links, get_markup, get_repeated_log_lines
+
+
+def get_noisy_jira_texts(count, seed=BENCHMARK_SEED):
+    """Return raw JIRA descriptions escaped as load_file escapes them, which mix prose with code and noformat blocks,
+    stack traces, links, markup, characters outside ASCII and repeated log lines
+
+    Arguments:
+
+    count -- the number of texts
+
+    seed -- the seed of the random generator, the same seed always returns the same texts (default BENCHMARK_SEED)
+    """
+
+    generator = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        parts = [generator.choice(NOISE_GENERATORS)(generator) for _ in range(generator.randint(1, 8))]
+        texts.append(escape_text("\n".join(parts)))
+
+    return texts
+
+
+def get_texts_hash(texts):
+
+    return hashlib.sha256(json.dumps(texts).encode("utf-8")).hexdigest()
+
+
+def save_golden_set(filename=CLEAN_GOLDEN_SET_FILENAME):
+    """Save the text cleaned from the golden set texts by the current cleaning rules"""
+
+    texts = get_noisy_jira_texts(GOLDEN_SET_SIZE, GOLDEN_SET_SEED)
+    save_json(filename, {
+        "seed": GOLDEN_SET_SEED,
+        "texts_sha256": get_texts_hash(texts),
+        "cleaned": [clean(text) for text in texts]
+    })
+    print("Golden set of %d cleaned texts saved at %s" % (len(texts), filename))
+
+
+def check_golden_set(filename=CLEAN_GOLDEN_SET_FILENAME):
+    """Check that the golden set texts are cleaned byte for byte as when the golden set was saved
+    and return the number of texts checked"""
+
+    golden_set = load_json(filename)
+    if golden_set is None:
+        raise AssertionError("There is no golden set to check the cleaned text against")
+
+    texts = get_noisy_jira_texts(len(golden_set["cleaned"]), golden_set["seed"])
+    if get_texts_hash(texts) != golden_set["texts_sha256"]:
+        raise AssertionError("The golden set texts are generated differently than when the golden set was saved")
+
+    changed_texts = [i for i, (text, cleaned) in enumerate(zip(texts, golden_set["cleaned"]))
+        if json.dumps(clean(text)) != json.dumps(cleaned)]
+    if len(changed_texts) > 0:
+        raise AssertionError("Cleaning changed the result of golden set texts %s" % ", ".join(str(i) for i in changed_texts))
+
+    return len(texts)
+
+
+def benchmark_stages(texts, repeats=CORPUS_REPEATS):
+    """Return the mean milliseconds spent in every stage of clean and in clean as a whole for a list of texts.
+    Every stage is timed on the output of the stages before it."""
+
+    stage_texts = [text[:MAX_CHARS_PROCESSED].lower() for text in texts]
+    stages = {}
+    for method in TEXT_PROCESSING_METHODS:
+        seconds = timeit.timeit(lambda: [method(text) for text in stage_texts], number=repeats) / repeats
+        stages[method.__name__] = round(seconds * 1000, 2)
+        stage_texts = [method(text) for text in stage_texts]
+
+    seconds = timeit.timeit(lambda: [clean(text) for text in texts], number=repeats) / repeats
+    return {
+        "texts": len(texts),
+        "characters": sum(len(text) for text in texts),
+        "stages_ms": stages,
+        "total_ms": round(seconds * 1000, 2),
+        "ms_per_text": round(seconds * 1000 / len(texts), 3)
+    }
+
+
+def benchmark_clean_stages(corpus_sizes=CORPUS_SIZES, repeats=CORPUS_REPEATS):
+    """Time the stages of clean on synthetic noisy JIRA corpora of different sizes, see get_noisy_jira_texts"""
+
+    return [benchmark_stages(get_noisy_jira_texts(corpus_size), repeats) for corpus_size in corpus_sizes]
+
+
+def compare_implementations(function, reference_function, texts, repeats):
+    """Check that a function returns the same text as its reference implementation for every text
+    and return the mean milliseconds per call of both"""
+
+    results = {}
+    for name, text in texts.items():
+        if function(text) != reference_function(text):
+            raise AssertionError("%s changed the result of %s" % (function.__name__, name))
+
+        reference_seconds = timeit.timeit(lambda: reference_function(text), number=repeats) / repeats
+        seconds = timeit.timeit(lambda: function(text), number=repeats) / repeats
+        results[name] = {
+            "words": len(text.split()),
+            "reference_ms": round(reference_seconds * 1000, 2),
+            "ms": round(seconds * 1000, 2),
+            "speedup": round(reference_seconds / seconds, 1)
+        }
+
+    return results
+
+
+def benchmark_word_pass(repeats=BENCHMARK_REPEATS):
+    """Compare the single pass punctuation and alpha density word filter with the two passes it replaces"""
+
+    return compare_implementations(
+        escape_punctuation_and_low_alpha_density_words,
+        escape_punctuation_and_low_alpha_density_words_in_two_passes,
+        get_word_texts(),
+        repeats)
+
+
+def benchmark_remove_repeating_fragments(repeats=BENCHMARK_REPEATS):
+    """Check that remove_repeating_fragments returns the same text as the reference implementation
+    for every adversarial text and return the mean milliseconds per call of both"""
+
+    return compare_implementations(
+        remove_repeating_fragments, remove_repeating_fragments_by_joining, get_adversarial_texts(), repeats)
+
+
+if __name__ == "__main__":
+
+    if len(sys.argv) > 1 and sys.argv[1] == "golden":
+        save_golden_set()
+        sys.exit()
+
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    results = {
+        "golden_set_texts": check_golden_set(),
+        "remove_repeating_fragments": benchmark_remove_repeating_fragments(repeats or BENCHMARK_REPEATS),
+        "word_pass": benchmark_word_pass(repeats or BENCHMARK_REPEATS),
+        "stages": benchmark_clean_stages(repeats=repeats or CORPUS_REPEATS)
+    }
+    print(json.dumps(results, indent=4))
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], "w") as file:
+            json.dump(results, file, indent=4)
+        print("Benchmark result saved at", sys.argv[2])
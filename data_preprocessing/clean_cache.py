@@ -0,0 +1,103 @@
+import hashlib
+import json
+import sqlite3
+
+from utilities.constants import ALPHA_FIELD, DESCRIPTION_FIELD_KEY, SUMMARY_FIELD_KEY
+
+CLEANED_FIELDS = SUMMARY_FIELD_KEY, DESCRIPTION_FIELD_KEY, ALPHA_FIELD
+TEXT_FIELDS = SUMMARY_FIELD_KEY, DESCRIPTION_FIELD_KEY
+LOOKUP_BATCH_SIZE = 500
+
+
+def get_content_key(datapoint):
+    """Return a hash of the summary and description of a raw datapoint, distinguishing missing fields from empty ones"""
+
+    content = json.dumps({field: datapoint[field] for field in TEXT_FIELDS if field in datapoint}, sort_keys=True)
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def get_cleaned_fields(datapoint):
+    """Return the fields of a cleaned datapoint which depend on its text"""
+
+    return {field: datapoint[field] for field in CLEANED_FIELDS if field in datapoint}
+
+
+def set_cleaned_fields(datapoint, cleaned_fields):
+    """Replace the text fields of a raw datapoint by cached cleaned fields, in the same way clean_datapoint does"""
+
+    for field in CLEANED_FIELDS:
+        if field in cleaned_fields:
+            datapoint[field] = cleaned_fields[field]
+        else:
+            datapoint.pop(field, None)
+
+    return datapoint
+
+
+class CleanCache():
+    """Persistent SQLite cache of cleaned summaries and descriptions keyed by a hash of the raw text.
+    The cache is emptied when it was filled by another version of the cleaning rules. Every time the cache
+    is opened starts a new generation, and the entries used in it are marked with it, see prune.
+
+    filename -- the SQLite database file
+
+    version -- the version of the cleaning rules
+    """
+
+    def __init__(self, filename, version):
+        self.filename = filename
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)")
+        row = self.connection.execute("SELECT value FROM metadata WHERE name = 'version'").fetchone()
+        if row is None or row[0] != version:
+            self.connection.execute("DROP TABLE IF EXISTS cleaned")
+            self.connection.execute("INSERT OR REPLACE INTO metadata VALUES ('version', ?)", (version,))
+            self.connection.commit()
+            if row is not None:
+                print("Cleaning rules changed, cached cleaned text in %s is discarded" % filename)
+                self.connection.execute("VACUUM")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS cleaned (key TEXT PRIMARY KEY, fields TEXT, generation INTEGER)")
+        row = self.connection.execute("SELECT value FROM metadata WHERE name = 'generation'").fetchone()
+        self.generation = int(row[0]) + 1 if row is not None else 0
+        self.connection.execute("INSERT OR REPLACE INTO metadata VALUES ('generation', ?)", (str(self.generation),))
+        self.connection.commit()
+
+    def get_many(self, keys):
+        """Return the cached cleaned fields of the given keys which are in the cache and mark them as used"""
+
+        cleaned_fields = {}
+        for i in range(0, len(keys), LOOKUP_BATCH_SIZE):
+            batch = keys[i:i + LOOKUP_BATCH_SIZE]
+            parameters = ",".join("?" * len(batch))
+            rows = self.connection.execute("SELECT key, fields FROM cleaned WHERE key IN (%s)" % parameters, batch)
+            cleaned_fields.update((key, json.loads(fields)) for key, fields in rows)
+            self.connection.execute("UPDATE cleaned SET generation = ? WHERE key IN (%s)" % parameters, [self.generation] + batch)
+
+        hit_count = sum(1 for key in keys if key in cleaned_fields)
+        self.hits += hit_count
+        self.misses += len(keys) - hit_count
+        return cleaned_fields
+
+    def set_many(self, keys_and_cleaned_fields):
+        """Add cleaned fields of datapoints given as key and cleaned fields pairs"""
+
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO cleaned VALUES (?, ?, ?)",
+            [(key, json.dumps(cleaned_fields), self.generation) for key, cleaned_fields in keys_and_cleaned_fields])
+        self.connection.commit()
+
+    def prune(self):
+        """Remove the entries which were not used since the cache was opened, return the number of removed entries.
+        Call it only after every record of the repository was looked up, otherwise entries still in use are removed."""
+
+        removed_count = self.connection.execute("DELETE FROM cleaned WHERE generation < ?", (self.generation,)).rowcount
+        self.connection.commit()
+        return removed_count
+
+    def close(self):
+
+        self.connection.commit()
+        self.connection.close()
@@ -1,27 +1,62 @@
-import csv
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+from itertools import chain, islice
 import json
 import numpy as np
 import os
-from string import punctuation
+from string import ascii_letters, punctuation
 import re
 
-from utilities.constants import ALPHA_FIELD, CLEANED_POSTFIX, CSV_FILE_EXTENSION, DESCRIPTION_FIELD_KEY, FIELD_KEYS
-from utilities.constants import JSON_FILE_EXTENSION, LABELED_FILENAME, RAW_POSTFIX, SUMMARY_FIELD_KEY, UNLABELED_FILENAME
+from data_preprocessing.clean_cache import CleanCache, get_cleaned_fields, get_content_key, set_cleaned_fields
+from utilities.constants import ALL_FILENAME, ALPHA_FIELD, CLEAN_CACHE_POSTFIX, CLEANED_POSTFIX, DELTA_POSTFIX, DESCRIPTION_FIELD_KEY
+from utilities.constants import ID_FIELD_KEY, JSON_FILE_EXTENSION, JSONL_FILE_EXTENSION, LABELED_FILENAME, RAW_POSTFIX
+from utilities.constants import SQLITE_FILE_EXTENSION, SUMMARY_FIELD_KEY, UNLABELED_FILENAME
 from utilities.constants import get_repository_filename
 from utilities.input_parser import select_repositories
-from utilities.file_utils import load_csv, save_json
+from utilities.file_utils import convert_legacy_raw_files, external_sort, load_json_array, load_jsonl, save_json_array
+from utilities.token_corpus import TokenCorpusBuilder, save_corpus
 
 MAX_CHARS_PROCESSED = 10000
 MIN_ALPHA_DENSITY = 0.93
+MAX_FRAGMENT_LENGTH = 15
+VECTORIZED_MIN_WORDS = 300
+CLEAN_CHUNK_SIZE = 1000
+CHUNKS_PENDING_PER_WORKER = 2
+CLEAN_WORKERS = os.cpu_count() or 1
+NO_TEXT_TAGS = "code", "noformat"
+ESCAPE_TAGS = "color", "quote", "anchor", "panel"
+ESCAPE_STRINGS = "\\r", "\\n", "\\t", "\\f", "\\v", "\"", "\\\\", "h1. ", "h2. ", "h3. ", "h4. ", "h5. ", "h6. "
+LINK_STARTERS = "#", "^", "http://", "https://", "malto:", "file:", "~"
+PUNCTUATION_WITHOUT_PERIOD = punctuation.replace(".", "")
+ALPHA_CHARACTER_DELETION = str.maketrans("", "", ascii_letters)
+
+# Patterns are compiled once and each one is applied only if the text contains its literal prefix,
+# in the same order as they used to be applied so that the cleaned text stays the same
+NO_TEXT_TAG_REGEXES = [
+    ("{" + tag, re.compile(r"\{%s(.*?)\}(.*?)\{%s\}" % (tag, tag), re.DOTALL)) for tag in NO_TEXT_TAGS]
+ESCAPE_TAG_REGEXES = [("{" + tag, re.compile(r"\{%s(.*?)\}" % tag)) for tag in ESCAPE_TAGS]
+MARKUP_LINK_REGEXES = [
+    (link_starter, re.compile(r"\[(.*?\|)?%s(.*?)\]" % re.escape(link_starter))) for link_starter in LINK_STARTERS]
+LINK_REGEX = re.compile(r"\bhttps?://\S+")
+STACK_TRACE_REGEX = re.compile(r"(at(\s+(\S+\s+){1,2}?)){3,}")
+HEX_CHARACTER_CODE_REGEX = re.compile(r"\\x\w\w")
+ODD_SPACES_REGEX = re.compile(r"\s+")
+
+
+def get_cleaner_version():
+    """Return a hash of this module, so that text cleaned by earlier cleaning rules is not reused"""
+
+    with open(__file__, "rb") as file:
+        return hashlib.sha1(file.read()).hexdigest()
 
 
 def escape_tags_and_content(text):
     """Escape tags and their content containing text, which is not written in natural language, such as code snippets"""
 
-    NO_TEXT_TAGS = "code", "noformat"
-    for tag in NO_TEXT_TAGS:
-        regex_matching_tag = re.compile("\{%s(.*?)\}(.*?)\{%s\}" % (tag, tag), re.DOTALL)
-        text = re.sub(regex_matching_tag, "", text)
+    for tag, regex_matching_tag in NO_TEXT_TAG_REGEXES:
+        if tag in text:
+            text = regex_matching_tag.sub("", text)
 
     return text
 
@@ -29,9 +64,9 @@ def escape_tags_and_content(text):
 def escape_tags(text):
     """Escape markup tags, but retain their content"""
 
-    ESCAPE_TAGS = "color", "quote", "anchor", "panel"
-    for tag in  ESCAPE_TAGS:
-        text = re.sub("\{%s(.*?)\}" % tag, "", text)
+    for tag, regex_matching_tag in ESCAPE_TAG_REGEXES:
+        if tag in text:
+            text = regex_matching_tag.sub("", text)
 
     return text
 
@@ -39,7 +74,6 @@ def escape_tags(text):
 def escape_strings(text):
     """Escape line breaks, tabulators, slashes and JIRA heading markup symbols"""
 
-    ESCAPE_STRINGS = "\\r", "\\n", "\\t", "\\f", "\\v", "\"", "\\\\", "h1. ", "h2. ", "h3. ", "h4. ", "h5. ", "h6. "
     for escape_string in ESCAPE_STRINGS:
         text = text.replace(escape_string, " ")
 
@@ -47,12 +81,19 @@ def escape_strings(text):
 
 
 def escape_links(text):
-    """Escape external and internal links, recognized by JIRA markup or leading 'http://' or 'https://' """
+    """Escape external and internal links, recognized by JIRA markup or leading 'http://' or 'https://'.
+    Bare links are removed after the first kind of markup links and again only after markup links
+    whose removal may have formed a new bare link, since removing bare links twice changes nothing."""
 
-    LINK_STARTERS = r"\#", r"\^", r"http\:\/\/", r"https\:\/\/", r"malto\:", r"file\:", r"\~"
-    for link_starter in LINK_STARTERS:
-        text = re.sub("\[(.*?\\|)?%s(.*?)\]" % link_starter, "", text)
-        text = re.sub(r"\bhttps?://\S+", "", text)
+    if "[" not in text:
+        return LINK_REGEX.sub("", text)
+
+    for i, (link_starter, regex_matching_link) in enumerate(MARKUP_LINK_REGEXES):
+        removed_link_count = 0
+        if link_starter in text:
+            text, removed_link_count = regex_matching_link.subn("", text)
+        if i == 0 or removed_link_count > 0:
+            text = LINK_REGEX.sub("", text)
 
     return text
 
@@ -61,68 +102,128 @@ def escape_stack_trace(text):
     """Escape stack trace fragments which contain one or two words seperated by a space
     and follwing by the keyword 'at', repeated at least three times"""
 
-    text = re.sub(r"(at(\s+(\S+\s+){1,2}?)){3,}", "", text)
+    if text.count("at") < 3:
+        return text
 
-    return text
+    return STACK_TRACE_REGEX.sub("", text)
 
 
 def escape_hex_character_codes(text):
     """Escape characters outside the latin alphabet which are converted to hex code representation"""
 
-    return re.sub(r"\\x\w\w", "", text)
+    if "\\x" not in text:
+        return text
+
+    return HEX_CHARACTER_CODE_REGEX.sub("", text)
 
 
 def escape_punctuation_boundaries(text):
     """Remove all punctuation marks from the beginning and end of words,
     except for trailing period at the end of words"""
 
-    return " ".join([word.strip(punctuation.replace(".", "")).lstrip(".") for word in text.split()])
+    return " ".join([word.strip(PUNCTUATION_WITHOUT_PERIOD).lstrip(".") for word in text.split()])
 
 
 def escape_low_alpha_density_words(text):
     """Escape words with low alpha density, except for those containing one apostrophe or one period"""
 
-    clean_words = []
-    for word in text.split():
+    return " ".join([word for word in text.split() if is_readable_word(word)])
+
+
+def escape_punctuation_and_low_alpha_density_words(text):
+    """Remove punctuation marks from word boundaries as escape_punctuation_boundaries does and escape
+    the resulting words with low alpha density as escape_low_alpha_density_words does in a single pass"""
+
+    words = (word.strip(PUNCTUATION_WITHOUT_PERIOD).lstrip(".") for word in text.split())
+    return " ".join([word for word in words if len(word) > 0 and is_readable_word(word)])
+
+
+def is_readable_word(word):
+    """Check if a word has high alpha density or contains no other symbols than one apostrophe and one period.
+    Words of latin letters only are accepted without counting, other words are counted by deleting
+    the latin letters, see calculate_alpha_density."""
 
-        alpha_density = calculate_alpha_density(word)
-        if alpha_density < MIN_ALPHA_DENSITY:
-            allowed_symbol_count = word.count("'") + word.count(".")
-            if word.count("'") > 1 or word.count(".") > 1 or alpha_density != (len(word) - allowed_symbol_count) / len(word):
-                continue
+    if word.isalpha() and word.isascii():
+        return True
 
-        clean_words.append(word)
+    alpha_density = (count_alpha_characters(word) + word.count(r"\\'") * 3) / len(word)
+    if alpha_density >= MIN_ALPHA_DENSITY:
+        return True
 
-    return " ".join(clean_words)
+    apostrophe_count = word.count("'")
+    period_count = word.count(".")
+    return apostrophe_count <= 1 and period_count <= 1 and alpha_density == (len(word) - apostrophe_count - period_count) / len(word)
+
+
+def count_alpha_characters(text):
+    """Return the number of characters from a-zA-Z in a text"""
+
+    return len(text) - len(text.translate(ALPHA_CHARACTER_DELETION))
+
+
+def get_repeat_lengths(word_ids):
+    """Return the length of the longest fragment ending at each word which repeats the fragment right before it,
+    0 if there is none. A fragment of length step ending at word i repeats if the last step words up to i
+    are each equal to the word step positions earlier, which is counted as a run of equal words."""
+
+    repeat_lengths = [0] * len(word_ids)
+    for step in range(1, min(MAX_FRAGMENT_LENGTH, len(word_ids) // 2) + 1):
+        equal_run = 0
+        for i, (word_id, earlier_word_id) in enumerate(zip(word_ids[step:], word_ids), step):
+            if word_id == earlier_word_id:
+                equal_run += 1
+                if equal_run >= step:
+                    repeat_lengths[i] = step
+            else:
+                equal_run = 0
+
+    return repeat_lengths
+
+
+def get_repeat_lengths_vectorized(word_ids):
+    """Return the same lengths as get_repeat_lengths using cumulative counts of equal words in NumPy,
+    which is faster for long texts"""
+
+    word_ids = np.array(word_ids)
+    repeat_lengths = np.zeros(len(word_ids), dtype=int)
+    for step in range(1, min(MAX_FRAGMENT_LENGTH, len(word_ids) // 2) + 1):
+        equal_counts = np.concatenate(([0], np.cumsum(word_ids[step:] == word_ids[:-step])))
+        fragment_ends = np.arange(2 * step - 1, len(word_ids))
+        is_repeat = equal_counts[fragment_ends - step + 1] - equal_counts[fragment_ends - 2 * step + 1] == step
+        repeat_lengths[fragment_ends[is_repeat]] = step
+
+    return repeat_lengths.tolist()
 
 
 def remove_repeating_fragments(text):
-    """Remove repeating string fragments up to 15 words"""
+    """Remove fragments of up to MAX_FRAGMENT_LENGTH words which repeat the fragment right before them.
+    Words are compared by integer ids in time linear in the number of words, without joining fragments in strings."""
 
-    MAX_FRAGMENT_LENGTH = 15
     words = text.split()
-    duplicates = np.full((len(words)), False)
-    for i in range(1, len(words)):
-        max_step = min(MAX_FRAGMENT_LENGTH, (i + 1) // 2)
-        for step in range(1, max_step + 1):
-            first_fragment = ' '.join(words[i-step+1:i+1])
-            second_fragment = ' '.join(words[i-2*step+1:i-step+1])
-            if first_fragment == second_fragment:
-                duplicates[i-step+1:i+1] = True
+    vocabulary = {}
+    word_ids = [vocabulary.setdefault(word, len(vocabulary)) for word in words]
+    if len(words) < VECTORIZED_MIN_WORDS:
+        repeat_lengths = get_repeat_lengths(word_ids)
+    else:
+        repeat_lengths = get_repeat_lengths_vectorized(word_ids)
 
     result = []
-    for i, word in enumerate(words):
-        if not duplicates[i]:
+    duplicate_words_left = 0
+    for word, repeat_length in zip(reversed(words), reversed(repeat_lengths)):
+        duplicate_words_left = max(duplicate_words_left, repeat_length)
+        if duplicate_words_left > 0:
+            duplicate_words_left -= 1
+        else:
             result.append(word)
 
-    return " ".join(result)
+    return " ".join(reversed(result))
 
 
 def escape_odd_spaces(text):
     """Replace several consequent spaces with one space
     and remove spaces from string start and end"""
     
-    text = re.sub(r"\s+", " ", text)
+    text = ODD_SPACES_REGEX.sub(" ", text)
     text = text.strip()
 
     return text
@@ -133,8 +234,8 @@ def calculate_alpha_density(text):
     divided by the total number of characters"""
 
     total = len(text)
-    alphas = len(re.findall("[a-zA-Z]", text))
-    spaces = len(re.findall("\s", text))
+    alphas = count_alpha_characters(text)
+    spaces = total - sum(len(word) for word in text.split())
     symnums = total - (spaces + alphas)
 
     apos = text.count(r"\\'") * 3
@@ -144,22 +245,23 @@ def calculate_alpha_density(text):
     return alphas / (symnums + alphas) if (symnums + alphas) > 0 else 0
 
 
+TEXT_PROCESSING_METHODS = [
+    escape_tags_and_content,
+    escape_tags,
+    escape_strings,
+    escape_links,
+    escape_stack_trace,
+    escape_hex_character_codes,
+    escape_punctuation_and_low_alpha_density_words,
+    remove_repeating_fragments,
+    escape_odd_spaces]
+
+
 def clean(text):
     """Clean and separate text in sentences"""
 
     text = text[:MAX_CHARS_PROCESSED].lower()
-    text_processing_methods = [
-        escape_tags_and_content,
-        escape_tags,
-        escape_strings,
-        escape_links,
-        escape_stack_trace,
-        escape_hex_character_codes,
-        escape_punctuation_boundaries,
-        escape_low_alpha_density_words,
-        remove_repeating_fragments,
-        escape_odd_spaces]
-    for method in text_processing_methods:
+    for method in TEXT_PROCESSING_METHODS:
         text = method(text)
 
     if len(text) == 0:
@@ -169,59 +271,280 @@ def clean(text):
     return [sentence.strip(".") for sentence in text.split(SENTENCE_SEPARATOR)]
 
 
+def escape_text(text):
+    """Represent line breaks, tabulators, quotes, backslashes and characters outside ASCII
+    as escape sequences, which is the text form cleaning rules are written for"""
+
+    return str(text.encode("utf-8"))[2:-1]
+
+
 def load_file(filename):
-    """Load datapoints from CSV file if it exists or contains any records"""
+    """Read datapoints one at a time from a raw JSON Lines file and escape their text fields"""
+
+    print("Parsing data from %s" % filename)
+    for datapoint in load_jsonl(filename):
+        for text_key in [SUMMARY_FIELD_KEY, DESCRIPTION_FIELD_KEY]:
+            if text_key in datapoint:
+                datapoint[text_key] = escape_text(datapoint[text_key])
+        yield datapoint
+
+
+def clean_datapoint(datapoint):
+    """Reduce noise in the summary and description of a datapoint, separate them in sentences
+    and calculate alpha density for description field sentences"""
+
+    if SUMMARY_FIELD_KEY in datapoint:
+        datapoint[SUMMARY_FIELD_KEY] = clean(datapoint[SUMMARY_FIELD_KEY])
+
+    if DESCRIPTION_FIELD_KEY in datapoint:
+        clean_description = clean(datapoint[DESCRIPTION_FIELD_KEY])
+        if clean_description != None and len(clean_description) != 0:
+            datapoint[DESCRIPTION_FIELD_KEY] = clean_description
+            alpha_density = np.average(np.array([calculate_alpha_density(sentence) for sentence in datapoint[DESCRIPTION_FIELD_KEY]]))
+            datapoint[ALPHA_FIELD] = int("%.0f" % (alpha_density * 100))
+        else:
+            datapoint.pop(DESCRIPTION_FIELD_KEY, None)
+
+    return datapoint
+
+
+def clean_chunk(datapoints):
+
+    return [clean_datapoint(datapoint) for datapoint in datapoints]
+
+
+def get_chunks(datapoints, chunk_size=CLEAN_CHUNK_SIZE):
+    """Split an iterable of datapoints in lists of chunk_size datapoints"""
+
+    datapoints = iter(datapoints)
+    chunk = list(islice(datapoints, chunk_size))
+    while len(chunk) > 0:
+        yield chunk
+        chunk = list(islice(datapoints, chunk_size))
+
+
+def get_cached_chunk(chunk, cache):
+    """Replace the text of the datapoints in a chunk which are in the cache by their cleaned text
+    and return the content keys of all datapoints and the indexes of the datapoints which need cleaning"""
+
+    if cache is None:
+        return (None, list(range(len(chunk))))
+
+    keys = [get_content_key(datapoint) for datapoint in chunk]
+    cached_fields = cache.get_many(keys)
+    uncached_indexes = []
+    for i, (datapoint, key) in enumerate(zip(chunk, keys)):
+        if key in cached_fields:
+            set_cleaned_fields(datapoint, cached_fields[key])
+        else:
+            uncached_indexes.append(i)
+
+    return (keys, uncached_indexes)
+
+
+def merge_cleaned_chunk(chunk, keys, uncached_indexes, clean_data, cache):
+    """Put the datapoints which were cleaned back in their chunk and add them to the cache"""
+
+    for i, datapoint in zip(uncached_indexes, clean_data):
+        chunk[i] = datapoint
+
+    if cache is not None and len(uncached_indexes) > 0:
+        cache.set_many([(keys[i], get_cleaned_fields(chunk[i])) for i in uncached_indexes])
+
+    return chunk
+
+
+def clean_datapoints(datapoints, workers=1, cache=None):
+    """Clean datapoints in chunks of CLEAN_CHUNK_SIZE and yield them in their original order.
+    Datapoints whose text is in the cache are not cleaned again. With more than one worker,
+    the chunks are cleaned by a pool of processes, keeping at most CHUNKS_PENDING_PER_WORKER
+    chunks per process in memory.
+
+    Arguments:
+
+    datapoints -- an iterable of datapoints with escaped text fields, see load_file
+
+    workers -- the number of processes cleaning text (default 1)
+
+    cache -- a CleanCache of cleaned text, None to clean every datapoint (default None)
+    """
+
+    chunks = get_chunks(datapoints)
+    if workers <= 1:
+        for chunk in chunks:
+            keys, uncached_indexes = get_cached_chunk(chunk, cache)
+            clean_data = clean_chunk([chunk[i] for i in uncached_indexes])
+            yield from merge_cleaned_chunk(chunk, keys, uncached_indexes, clean_data, cache)
+        return
+
+    def submit_chunk(chunk):
+        keys, uncached_indexes = get_cached_chunk(chunk, cache)
+        future = executor.submit(clean_chunk, [chunk[i] for i in uncached_indexes])
+        pending_chunks.append((chunk, keys, uncached_indexes, future))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending_chunks = deque()
+        for chunk in islice(chunks, workers * CHUNKS_PENDING_PER_WORKER):
+            submit_chunk(chunk)
+        while len(pending_chunks) > 0:
+            chunk, keys, uncached_indexes, future = pending_chunks.popleft()
+            clean_data = future.result()
+            for next_chunk in islice(chunks, 1):
+                submit_chunk(next_chunk)
+            yield from merge_cleaned_chunk(chunk, keys, uncached_indexes, clean_data, cache)
+
+
+def report_cleaning_progress(datapoints):
+    """Pass cleaned datapoints through and print their number every 1000 datapoints and at the end"""
+
+    datapoint_count = 0
+    for datapoint in datapoints:
+        yield datapoint
+        datapoint_count = datapoint_count + 1
+        if datapoint_count % 1000 == 0:
+            print("%d records cleaned" % datapoint_count)
+
+    if datapoint_count > 0:
+        print("%d records cleaned" % datapoint_count)
+
+
+def get_clean_content(filename, workers=1, cache=None):
+    """Load data from a file, reduce noise in task textual descriptions, separate text in sentences,
+    calculate alpha density for description field sentences and return datapoints sorted by alpha density
+
+    Arguments:
+
+    filename -- the name of the raw JSON Lines file
+
+    workers -- the number of processes cleaning text, see clean_datapoints (default 1)
+
+    cache -- a CleanCache of cleaned text, None to clean every datapoint (default None)
+    """
 
     if not os.path.isfile(filename):
         print("File %s does not exist" % filename)
         return
 
-    data = load_csv(filename, FIELD_KEYS)
-
-    if data is None:
+    print("Cleaning %s" % filename)
+    data = list(report_cleaning_progress(clean_datapoints(load_file(filename), workers, cache)))
+    if len(data) == 0:
         print("Skipping cleaning %s because it does not consist any data" % filename)
         return
 
-    return data
+    return sort_by_alpha_density(data)
 
 
-def get_clean_content(filename):
-    """Load data from a file, reduce noise in task textual descriptions, separate text in sentences,
-    calculate alpha density for description field sentences and return datapoints sorted by alpha density"""
+def save_sorted_by_alpha_density(cleaned_data_filename, datapoints):
+    """Sort datapoints by alpha density with a bounded number of them in memory and save them
+    together with their tokenized corpus, unless there are none. Return the number of datapoints saved."""
 
-    data = load_file(filename)
-    if data is None:
-        return
+    sorted_datapoints = external_sort(datapoints, get_alpha_density_key)
+    first_datapoint = next(sorted_datapoints, None)
+    if first_datapoint is None:
+        return 0
+
+    corpus_builder = TokenCorpusBuilder()
+    datapoint_count = save_json_array(cleaned_data_filename, corpus_builder.tokenize(chain([first_datapoint], sorted_datapoints)))
+    save_corpus(cleaned_data_filename, corpus_builder.build())
+
+    return datapoint_count
+
+
+def save_clean_content(filename, cleaned_data_filename, workers=1, cache=None):
+    """Read raw datapoints one at a time, clean them as get_clean_content does and save them sorted
+    by alpha density without keeping all of them in memory. Return the number of datapoints saved.
+
+    Arguments:
+
+    filename -- the name of the raw JSON Lines file
+
+    cleaned_data_filename -- the name of the JSON file in which cleaned data is saved
+
+    workers -- the number of processes cleaning text, see clean_datapoints (default 1)
+
+    cache -- a CleanCache of cleaned text, None to clean every datapoint (default None)
+    """
+
+    if not os.path.isfile(filename):
+        print("File %s does not exist" % filename)
+        return 0
 
     print("Cleaning %s" % filename)
-    for i, datapoint in enumerate(data):
-        
-        if SUMMARY_FIELD_KEY in datapoint:
-            datapoint[SUMMARY_FIELD_KEY] = clean(datapoint[SUMMARY_FIELD_KEY])
-        
-        if DESCRIPTION_FIELD_KEY in datapoint:
-            clean_description = clean(datapoint[DESCRIPTION_FIELD_KEY])
-            if clean_description != None and len(clean_description) != 0:
-                datapoint[DESCRIPTION_FIELD_KEY] = clean_description
-                alpha_density = np.average(np.array([calculate_alpha_density(sentence) for sentence in datapoint[DESCRIPTION_FIELD_KEY]]))
-                datapoint[ALPHA_FIELD] = int("%.0f" % (alpha_density * 100))
-            else:
-                datapoint.pop(DESCRIPTION_FIELD_KEY, None)
+    datapoints = report_cleaning_progress(clean_datapoints(load_file(filename), workers, cache))
+    datapoint_count = save_sorted_by_alpha_density(cleaned_data_filename, datapoints)
+    if datapoint_count == 0:
+        print("Skipping cleaning %s because it does not consist any data" % filename)
+
+    return datapoint_count
+
+
+def get_alpha_density_key(datapoint):
+
+    return datapoint[ALPHA_FIELD] if ALPHA_FIELD in datapoint else 101
+
+
+def sort_by_alpha_density(data):
+    """Sort datapoints by alpha density so that the text with possibly most noise comes first"""
+
+    return sorted(data, key=get_alpha_density_key)
 
-        if (i + 1) % 1000 == 0 or (i + 1) == len(data):
-            percentage = (i + 1) / len(data) * 100
-            print("%d (%.2f%%) of %d records cleaned" % (i + 1, percentage, len(data)))
 
-    return sorted(data, key = lambda datapoint: datapoint[ALPHA_FIELD] if ALPHA_FIELD in datapoint else 101)
+def has_delta(repository_identifier):
+    """Check if a repository contains synced issues which have not been cleaned yet
+    and cleaned data in which they can be merged"""
 
+    for labeling in [LABELED_FILENAME, UNLABELED_FILENAME]:
+        delta_filename = get_repository_filename(repository_identifier, labeling, DELTA_POSTFIX, JSONL_FILE_EXTENSION)
+        cleaned_data_filename = get_repository_filename(repository_identifier, labeling, CLEANED_POSTFIX, JSON_FILE_EXTENSION)
+        if os.path.isfile(delta_filename) and os.path.isfile(cleaned_data_filename):
+            return True
 
-def clean_text(repository_identifiers):
+    return False
+
+
+def remove_delta(repository_identifier):
+    """Remove the synced issues of a repository once they are cleaned"""
+
+    for labeling in [LABELED_FILENAME, UNLABELED_FILENAME]:
+        delta_filename = get_repository_filename(repository_identifier, labeling, DELTA_POSTFIX, JSONL_FILE_EXTENSION)
+        if os.path.isfile(delta_filename):
+            os.remove(delta_filename)
+
+
+def clean_delta(repository_identifier, workers=1, cache=None):
+    """Clean only the issues synced since the last cleaning and upsert them in the cleaned data.
+    Issues which moved from unlabeled to labeled or vice versa are removed from their former file."""
+
+    clean_deltas = {}
+    for labeling in [LABELED_FILENAME, UNLABELED_FILENAME]:
+        delta_filename = get_repository_filename(repository_identifier, labeling, DELTA_POSTFIX, JSONL_FILE_EXTENSION)
+        clean_deltas[labeling] = get_clean_content(delta_filename, workers, cache) if os.path.isfile(delta_filename) else None
+        if clean_deltas[labeling] is None:
+            clean_deltas[labeling] = []
+
+    changed_ids = {datapoint[ID_FIELD_KEY] for delta in clean_deltas.values() for datapoint in delta}
+
+    for labeling in [LABELED_FILENAME, UNLABELED_FILENAME]:
+        cleaned_data_filename = get_repository_filename(repository_identifier, labeling, CLEANED_POSTFIX, JSON_FILE_EXTENSION)
+        clean_data = load_json_array(cleaned_data_filename) if os.path.isfile(cleaned_data_filename) else []
+        clean_data = (datapoint for datapoint in clean_data if datapoint[ID_FIELD_KEY] not in changed_ids)
+        if save_sorted_by_alpha_density(cleaned_data_filename, chain(clean_data, clean_deltas[labeling])) == 0:
+            continue
+        print("%d synced records merged in cleaned data saved at %s" % (len(clean_deltas[labeling]), cleaned_data_filename))
+
+
+def clean_text(repository_identifiers, workers=CLEAN_WORKERS, use_cache=True):
     """Reduce noise from labeled and unlabeled task descriptions
     
     Arguments:
 
     repository_identifiers -- a list of repository identifiers which are to be cleaned,
     leave blank to clean text in all downloaded repositories
+
+    workers -- the number of processes cleaning text, 1 to clean in this process (default CLEAN_WORKERS)
+
+    use_cache -- reuse the cleaned text of records whose summary and description did not change
+    since they were cleaned with the same cleaning rules (default True)
     """
 
     repositories = select_repositories(repository_identifiers)
@@ -233,14 +556,31 @@ def clean_text(repository_identifiers):
 
     for repository_identifier in repositories:
 
-        for labeling in [LABELED_FILENAME, UNLABELED_FILENAME]:
-            data_filename = get_repository_filename(repository_identifier, labeling, RAW_POSTFIX, CSV_FILE_EXTENSION)
-            cleaned_data_filename = get_repository_filename(repository_identifier, labeling, CLEANED_POSTFIX, JSON_FILE_EXTENSION)
-            clean_data = get_clean_content(data_filename)
-            if clean_data is None or len(clean_data) == 0:
-                continue
-            save_json(cleaned_data_filename, clean_data)
-            print("Cleaned data saved at", cleaned_data_filename)
+        convert_legacy_raw_files(repository_identifier)
+        cache = None
+        if use_cache:
+            cache_filename = get_repository_filename(repository_identifier, ALL_FILENAME, CLEAN_CACHE_POSTFIX, SQLITE_FILE_EXTENSION)
+            cache = CleanCache(cache_filename, get_cleaner_version())
+
+        try:
+            if has_delta(repository_identifier):
+                clean_delta(repository_identifier, workers, cache)
+            else:
+                for labeling in [LABELED_FILENAME, UNLABELED_FILENAME]:
+                    data_filename = get_repository_filename(repository_identifier, labeling, RAW_POSTFIX, JSONL_FILE_EXTENSION)
+                    cleaned_data_filename = get_repository_filename(repository_identifier, labeling, CLEANED_POSTFIX, JSON_FILE_EXTENSION)
+                    if save_clean_content(data_filename, cleaned_data_filename, workers, cache) == 0:
+                        continue
+                    print("Cleaned data saved at", cleaned_data_filename)
+                if cache is not None:
+                    print("%d cached records no longer in the repository were removed from the cache" % cache.prune())
+            remove_delta(repository_identifier)
+
+            if cache is not None:
+                print("%d records were taken from the cache and %d were cleaned" % (cache.hits, cache.misses))
+        finally:
+            if cache is not None:
+                cache.close()
 
 
 if __name__ == "__main__":
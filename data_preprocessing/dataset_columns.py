@@ -0,0 +1,83 @@
+import numpy as np
+
+from utilities.constants import DESCRIPTION_FIELD_KEY, PROJECT_FIELD_KEY, SUMMARY_FIELD_KEY, TIMESPENT_FIELD_KEY
+from utilities.string_utils import word_count
+from utilities.token_corpus import get_datapoint_key
+
+WORD_COUNT_COLUMN = "word_count"
+
+
+def get_text_length(datapoint, corpus_rows=None):
+    """Return the number of words in the summary and description of a datapoint,
+    counted in its tokenized corpus if corpus_rows contains its row"""
+
+    corpus_row = corpus_rows.get(get_datapoint_key(datapoint)) if corpus_rows is not None else None
+    if corpus_row is None:
+        return word_count(datapoint.get(SUMMARY_FIELD_KEY, "")) + word_count(datapoint.get(DESCRIPTION_FIELD_KEY, ""))
+
+    corpus, row = corpus_row
+    return corpus.get_token_count(row)
+
+
+class DatasetColumns():
+    """The fields of a list of datapoints which are filtered on, stored as arrays so that a selection of datapoints
+    is an array of their row indexes and every filter is a vectorized mask. Every column is extracted
+    from the datapoints once, when it is first needed.
+
+    data -- the datapoints
+
+    corpus_rows -- the rows of the datapoints in their tokenized corpora, see token_corpus.add_corpus_rows,
+    None to count words by splitting text (default None)
+    """
+
+    def __init__(self, data, corpus_rows=None):
+        self.data = data
+        self.corpus_rows = corpus_rows
+        self.columns = {}
+        self.projects = None
+
+    def __len__(self):
+        return len(self.data)
+
+    def get_column(self, name, get_value, dtype):
+
+        if name not in self.columns:
+            self.columns[name] = np.fromiter((get_value(datapoint) for datapoint in self.data), dtype=dtype, count=len(self.data))
+
+        return self.columns[name]
+
+    def get_timespent(self):
+        """Return a float64 array of time spent in seconds, NaN for unlabeled datapoints"""
+
+        return self.get_column(TIMESPENT_FIELD_KEY, lambda datapoint: datapoint.get(TIMESPENT_FIELD_KEY, np.nan), np.float64)
+
+    def get_word_counts(self):
+        """Return an int64 array of the number of words in the summary and description of every datapoint"""
+
+        return self.get_column(WORD_COUNT_COLUMN, lambda datapoint: get_text_length(datapoint, self.corpus_rows), np.int64)
+
+    def get_project_codes(self):
+        """Return an int32 array of the index of the project of every datapoint in get_projects()"""
+
+        if PROJECT_FIELD_KEY not in self.columns:
+            project_indexes = {}
+            self.get_column(PROJECT_FIELD_KEY, lambda datapoint: project_indexes.setdefault(datapoint[PROJECT_FIELD_KEY], len(project_indexes)), np.int32)
+            self.projects = list(project_indexes)
+
+        return self.columns[PROJECT_FIELD_KEY]
+
+    def get_projects(self):
+        """Return a list of distinct projects in the order of their first occurrence"""
+
+        self.get_project_codes()
+        return self.projects
+
+    def get_project_counts(self, rows):
+        """Return an array of the number of selected datapoints in every project"""
+
+        return np.bincount(self.get_project_codes()[rows], minlength=len(self.get_projects()))
+
+    def get_data(self, rows):
+        """Return the selected datapoints in the order of their rows"""
+
+        return [self.data[row] for row in rows.tolist()]
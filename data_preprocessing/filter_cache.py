@@ -0,0 +1,204 @@
+import hashlib
+from importlib.util import find_spec
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from utilities.constants import get_dataset_filename
+from utilities.constants import FILTER_CACHE_FOLDER, JSON_FILE_EXTENSION, LABELED_FILENAME, MERGED_POSTFIX, NPZ_FILE_EXTENSION, PICKLE_FILE_EXTENSION
+from utilities.constants import UNLABELED_FILENAME
+from utilities.file_utils import load_pickle, save_json, save_pickle
+from utilities.token_corpus import build_corpus, get_corpus_filename, save_corpus
+
+FILTER_CACHE_BUDGET_BYTES = 5 * 2 ** 30
+FILTER_MODULES = ("data_preprocessing.filter_cache", "data_preprocessing.filter_data", "data_preprocessing.dataset_columns",
+    "utilities.data_utils", "utilities.token_corpus")
+FINGERPRINTS_FILENAME = "fingerprints" + JSON_FILE_EXTENSION
+ENTRY_FILENAME = "entry" + JSON_FILE_EXTENSION
+TEMPORARY_PREFIX = "tmp"
+TEMPORARY_EXPIRY_SECONDS = 60 * 60
+HASH_BUFFER_SIZE = 2 ** 20
+LABELINGS = LABELED_FILENAME, UNLABELED_FILENAME
+
+
+def get_file_hash(filename):
+    """Return a hash of the content of a file"""
+
+    file_hash = hashlib.blake2b(digest_size=16)
+    with open(filename, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_BUFFER_SIZE), b""):
+            file_hash.update(chunk)
+
+    return file_hash.hexdigest()
+
+
+def get_filter_version():
+    """Return a hash of the modules filtering the data, so that data filtered by earlier filtering rules is not reused"""
+
+    module_hash = hashlib.sha1()
+    for module in FILTER_MODULES:
+        with open(find_spec(module).origin, "rb") as file:
+            module_hash.update(file.read())
+
+    return module_hash.hexdigest()
+
+
+def get_folder_size(folder):
+
+    return sum(entry.stat().st_size for entry in os.scandir(folder) if entry.is_file())
+
+
+class FilterCache():
+    """Persistent cache of filtered datasets keyed by a hash of the merged dataset content and the filter configuration.
+    Every entry is a folder containing the filtered datapoints as pickle files and their tokenized corpora. When the entries
+    take more than budget_bytes, the least recently used ones are removed. Entries filtered by a different version of the
+    filtering modules are not reused, see get_filter_version.
+
+    folder -- the folder in which the entries are kept
+
+    budget_bytes -- the disk space the entries may take
+    """
+
+    def __init__(self, folder=FILTER_CACHE_FOLDER, budget_bytes=FILTER_CACHE_BUDGET_BYTES):
+        self.folder = folder
+        self.budget_bytes = budget_bytes
+        self.fingerprints_filename = os.path.join(folder, FINGERPRINTS_FILENAME)
+        self.version = get_filter_version()
+        os.makedirs(folder, exist_ok=True)
+
+    def get_fingerprint(self, dataset):
+        """Return the hashes of the labeled and the unlabeled data files of a merged dataset, None for a missing file.
+        The hash of a file is computed again only if its size or modification time changed since it was last hashed."""
+
+        fingerprints = {}
+        if os.path.isfile(self.fingerprints_filename):
+            with open(self.fingerprints_filename) as file:
+                fingerprints = json.load(file)
+        is_changed = False
+        file_hashes = []
+        for labeling in LABELINGS:
+            filename = get_dataset_filename(dataset, labeling, MERGED_POSTFIX, JSON_FILE_EXTENSION)
+            if not os.path.isfile(filename):
+                file_hashes.append(None)
+                continue
+            stat = os.stat(filename)
+            fingerprint = fingerprints.get(filename)
+            if fingerprint is None or fingerprint["size"] != stat.st_size or fingerprint["mtime_ns"] != stat.st_mtime_ns:
+                fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": get_file_hash(filename)}
+                fingerprints[filename] = fingerprint
+                is_changed = True
+            file_hashes.append(fingerprint["hash"])
+
+        if is_changed:
+            temporary_filename = self.fingerprints_filename + ".tmp"
+            save_json(temporary_filename, fingerprints)
+            os.replace(temporary_filename, self.fingerprints_filename)
+
+        return file_hashes
+
+    def get_key(self, dataset, filter_config):
+        """Return the key of the filtered data of a merged dataset, None if the dataset has no labeled data"""
+
+        file_hashes = self.get_fingerprint(dataset)
+        if file_hashes[0] is None:
+            return None
+
+        content = json.dumps({"version": self.version, "dataset": file_hashes, "filter_config": vars(filter_config)}, sort_keys=True)
+        return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+
+    def get_entry_filename(self, key, labeling, extension=PICKLE_FILE_EXTENSION):
+
+        return os.path.join(self.folder, key, labeling + extension)
+
+    def load(self, key):
+        """Return the number of labeled and unlabeled datapoints before filtering by labeling saved in the entry of a key,
+        None if the key is not in the cache. The entry is marked as used."""
+
+        entry_filename = os.path.join(self.folder, key, ENTRY_FILENAME)
+        if not os.path.isfile(entry_filename):
+            return None
+
+        os.utime(entry_filename)
+        with open(entry_filename) as file:
+            return json.load(file)
+
+    def has_data(self, key, labeling):
+
+        return os.path.isfile(self.get_entry_filename(key, labeling))
+
+    def load_data(self, key, labeling):
+        """Return the filtered datapoints of an entry, None if no labeled datapoints were left
+        or the merged dataset has no unlabeled data"""
+
+        if not self.has_data(key, labeling):
+            return None
+
+        return load_pickle(self.get_entry_filename(key, labeling))
+
+    def copy_corpus(self, key, labeling, filename):
+        """Copy the tokenized corpus of the filtered datapoints of an entry to the corpus of a JSON file
+        after the file is saved, or remove an outdated corpus of the file if the entry has none"""
+
+        corpus_filename = self.get_entry_filename(key, labeling, NPZ_FILE_EXTENSION)
+        if os.path.isfile(corpus_filename):
+            shutil.copyfile(corpus_filename, get_corpus_filename(filename))
+        else:
+            save_corpus(filename, None)
+
+    def save(self, key, datapoint_counts, labeled_data, unlabeled_data, corpus_rows):
+        """Add the filtered data of a key and remove the least recently used entries which do not fit in the budget
+
+        Arguments:
+
+        key -- the key, see get_key
+
+        datapoint_counts -- the number of labeled and unlabeled datapoints before filtering by labeling
+
+        labeled_data -- the filtered labeled datapoints, None if none were left
+
+        unlabeled_data -- the filtered unlabeled datapoints, None if the dataset had no unlabeled data
+
+        corpus_rows -- the rows of the merged datapoints in their tokenized corpora, see token_corpus.add_corpus_rows
+        """
+
+        temporary_folder = tempfile.mkdtemp(prefix=TEMPORARY_PREFIX, dir=self.folder)
+        for labeling, data in zip(LABELINGS, [labeled_data, unlabeled_data]):
+            if data is None:
+                continue
+            filename = os.path.join(temporary_folder, labeling + PICKLE_FILE_EXTENSION)
+            save_pickle(filename, data, verbose=False)
+            save_corpus(filename, build_corpus(data, corpus_rows))
+        save_json(os.path.join(temporary_folder, ENTRY_FILENAME), datapoint_counts)
+
+        try:
+            os.rename(temporary_folder, os.path.join(self.folder, key))
+        except OSError:
+            shutil.rmtree(temporary_folder, ignore_errors=True)
+
+        self.evict()
+
+    def evict(self):
+        """Remove the folders of entries which were not saved completely within TEMPORARY_EXPIRY_SECONDS
+        and the least recently used entries until all folders take at most budget_bytes"""
+
+        entries = []
+        temporary_size = 0
+        for entry in os.scandir(self.folder):
+            if not entry.is_dir():
+                continue
+            entry_filename = os.path.join(entry.path, ENTRY_FILENAME)
+            if os.path.isfile(entry_filename):
+                entries.append((os.path.getmtime(entry_filename), get_folder_size(entry.path), entry.path))
+            elif entry.name.startswith(TEMPORARY_PREFIX) and time.time() - entry.stat().st_mtime > TEMPORARY_EXPIRY_SECONDS:
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                temporary_size = temporary_size + get_folder_size(entry.path)
+
+        total_size = temporary_size + sum(size for _, size, _ in entries)
+        for _, size, folder in sorted(entries):
+            if total_size <= self.budget_bytes:
+                break
+            shutil.rmtree(folder, ignore_errors=True)
+            total_size = total_size - size
@@ -1,13 +1,17 @@
 from enum import Enum
 import json
+import numpy as np
 import sys
 
 from utilities.constants import get_dataset_filename
-from utilities.constants import DESCRIPTION_FIELD_KEY, FILTERED_POSTFIX, JSON_FILE_EXTENSION, LABELED_FILENAME, MERGED_POSTFIX
+from utilities.constants import FILTERED_POSTFIX, JSON_FILE_EXTENSION, LABELED_FILENAME, MERGED_POSTFIX
 from utilities.constants import SECONDS_IN_HOUR, SECONDS_IN_MINUTE, SUMMARY_FIELD_KEY, TIMESPENT_FIELD_KEY, UNLABELED_FILENAME
-from utilities.data_utils import get_issue_counts, get_projects, is_in_projects, get_bins_and_volumes
+from utilities.data_utils import get_bin_edges, get_bin_indexes, get_bin_volumes, get_even_selection, get_issue_counts
 from utilities.file_utils import load_json, save_json
-from utilities.string_utils import merge_sentences, get_part_strings, word_count
+from utilities.string_utils import merge_sentences, get_part_strings
+from utilities.token_corpus import add_corpus_rows, build_corpus, load_corpus, save_corpus
+from data_preprocessing.dataset_columns import DatasetColumns
+from data_preprocessing.filter_cache import FilterCache
 from data_preprocessing.filter_config import FilterConfig
 
 
@@ -17,6 +21,17 @@ def load_dataset(dataset, labeling):
     return load_json(filename)
 
 
+def load_dataset_corpus_rows(dataset, labeling, data, corpus_rows):
+    """Add the rows of the merged dataset datapoints in its tokenized corpus to corpus_rows, if the corpus is up to date"""
+
+    filename = get_dataset_filename(dataset, labeling, MERGED_POSTFIX, JSON_FILE_EXTENSION)
+    corpus = load_corpus(filename, data)
+    if corpus is not None:
+        add_corpus_rows(corpus_rows, data, corpus)
+
+    return corpus_rows
+
+
 def remove_unlabeled_datapoints(data):
 
     labeled_data = [datapoint for datapoint in data if TIMESPENT_FIELD_KEY in datapoint]
@@ -30,90 +45,91 @@ def get_unlabeled_datapoints(data):
     return [datapoint for datapoint in data if TIMESPENT_FIELD_KEY not in datapoint]
 
 
-def remove_outliers(data, minimum_timespent_seconds, maximum_timespent_seconds):
+def remove_outliers(columns, rows, minimum_timespent_seconds, maximum_timespent_seconds):
 
     print("Filtering out datapoints with time spent lower than %d seconds and higher than %d seconds" % (minimum_timespent_seconds, maximum_timespent_seconds))
-    filtered_data = [datapoint for datapoint in data
-        if datapoint[TIMESPENT_FIELD_KEY] >= minimum_timespent_seconds
-            and datapoint[TIMESPENT_FIELD_KEY] <= maximum_timespent_seconds]
+    timespent = columns.get_timespent()[rows]
+    filtered_rows = rows[(timespent >= minimum_timespent_seconds) & (timespent <= maximum_timespent_seconds)]
 
-    print("%d (%.2f%%) of %d datapoints were selected for testing and training" % get_part_strings(len(filtered_data), len(data)))
+    print("%d (%.2f%%) of %d datapoints were selected for testing and training" % get_part_strings(len(filtered_rows), len(rows)))
 
-    return filtered_data
+    return filtered_rows
 
 
-def filter_data_by_projects(data, selected_projects):
+def filter_data_by_projects(columns, rows, selected_projects):
+    """Select the rows of datapoints in projects with codes in selected_projects"""
 
     if len(selected_projects) == 0:
-        return
+        return rows[:0]
 
-    selected_data = [datapoint for datapoint in data if is_in_projects(datapoint, selected_projects)]
-    print("%d (%.2f%%) of %d datapoints selected" % get_part_strings(len(selected_data), len(data)))
+    selected_rows = rows[np.isin(columns.get_project_codes()[rows], selected_projects)]
+    print("%d (%.2f%%) of %d datapoints selected" % get_part_strings(len(selected_rows), len(rows)))
 
-    return selected_data
+    return selected_rows
 
     
-def remove_small_projects(data, minimum_project_size):
+def remove_small_projects(columns, rows, minimum_project_size):
+    """Return the codes of projects with at least minimum_project_size selected datapoints"""
 
-    issue_counts = get_issue_counts(data)
-    selected_projects = {issue_count[0] for issue_count in issue_counts if issue_count[1] >= minimum_project_size}
-    print("%d (%.2f%%) of %d projects were selected" % get_part_strings(len(selected_projects), len(get_projects(data))))
+    project_counts = columns.get_project_counts(rows)
+    selected_projects = np.flatnonzero(project_counts >= max(minimum_project_size, 1))
+    print("%d (%.2f%%) of %d projects were selected" % get_part_strings(len(selected_projects), np.count_nonzero(project_counts)))
 
     return selected_projects
 
 
-def save_filtered_data(data, dataset_name, labeling):
+def save_filtered_data(data, dataset_name, labeling, corpus_rows=None, cache=None, key=None):
+    """Save filtered datapoints and their tokenized corpus, copied from the filter cache entry of key if it has them"""
 
     filename = get_dataset_filename(dataset_name, labeling, FILTERED_POSTFIX, JSON_FILE_EXTENSION)
-    save_json(filename, data)    
+    save_json(filename, data)
+    if cache is not None and key is not None and cache.has_data(key, labeling):
+        cache.copy_corpus(key, labeling, filename)
+    else:
+        save_corpus(filename, build_corpus(data, corpus_rows))
     print("Filtered dataset %s created and saved on %s" % (dataset_name, filename))
 
 
-def even_distribution(data, bin_count):
+def even_distribution(columns, rows, bin_count):
     """Create even distribution by removing data from bins with higher datapoint count than the smallest bin"""
 
-    if data is None:
-        return []
+    timespent = columns.get_timespent()[rows]
+    timespent_range = timespent.max() - timespent.min()
 
-    min_timespent = min(data, key=lambda datapoint: datapoint[TIMESPENT_FIELD_KEY])[TIMESPENT_FIELD_KEY]
-    max_timespent = max(data, key=lambda datapoint: datapoint[TIMESPENT_FIELD_KEY])[TIMESPENT_FIELD_KEY]
-    timespent_range = max_timespent - min_timespent
-    
-    bins, bin_volumes = get_bins_and_volumes(data, bin_count, timespent_range)
-    min_bin_volume = min(bin_volumes)
-    print("Bin volumes:", *bin_volumes)
-
-    evenly_distributed_data = []
-    for i, b in enumerate(bins):
-        factor = min_bin_volume / bin_volumes[i]
-        for j, d in enumerate(b):
-            if round(j * factor) == round((j + 1) * factor):
-                continue
-            evenly_distributed_data.append(d)
+    bin_indexes = get_bin_indexes(timespent, get_bin_edges(bin_count, timespent_range))
+    bin_volumes = get_bin_volumes(bin_indexes, bin_count)
+    print("Bin volumes:", *bin_volumes.tolist())
 
-    print("%d (%.2f%%) of %d records were selected and an even distribution was created" % get_part_strings(len(evenly_distributed_data), len(data)))
+    evenly_distributed_rows = rows[get_even_selection(bin_indexes, bin_volumes)]
+    print("%d (%.2f%%) of %d records were selected and an even distribution was created" % get_part_strings(len(evenly_distributed_rows), len(rows)))
 
-    return evenly_distributed_data
+    return evenly_distributed_rows
 
 
-def escape_short_texts(data, minimum_words):
+def escape_short_texts(columns, rows, minimum_words):
     """Remove task with description length shorter than minimum_words"""
 
-    filtered_data = [datapoint for datapoint in data if word_count(datapoint.get(SUMMARY_FIELD_KEY, "")) + word_count(datapoint.get(DESCRIPTION_FIELD_KEY, "")) >= minimum_words]
-    print("%d (%.2f%%) of %d records were selected" % get_part_strings(len(filtered_data), len(data)))
-    return filtered_data
+    filtered_rows = rows[columns.get_word_counts()[rows] >= minimum_words]
+    print("%d (%.2f%%) of %d records were selected" % get_part_strings(len(filtered_rows), len(rows)))
+    return filtered_rows
 
 
-def filter_data(dataset, filter_config, notes_filename = None, save=True):
-    """Filter data of a merged dataset according to a filter configuration and save in JSON format"""
+def filter_merged_data(dataset, filter_config):
+    """Filter data of a merged dataset according to a filter configuration and return the counts of labeled and
+    unlabeled datapoints before filtering, the filtered labeled and unlabeled datapoints, None if no labeled datapoints
+    were left, and the rows of the merged datapoints in their tokenized corpora. Return None if no labeled data was loaded."""
 
     print("Loading data...")
     labeled_data = load_dataset(dataset, LABELED_FILENAME)
     if labeled_data is None:
         print("No labeled data was loaded, filtering cancelled")
-        return None, None
+        return None
     unlabeled_data = load_dataset(dataset, UNLABELED_FILENAME)
 
+    corpus_rows = load_dataset_corpus_rows(dataset, LABELED_FILENAME, labeled_data, {})
+    if unlabeled_data is not None:
+        load_dataset_corpus_rows(dataset, UNLABELED_FILENAME, unlabeled_data, corpus_rows)
+
     unlabeled_labeled_data = get_unlabeled_datapoints(labeled_data)
     if (len(unlabeled_labeled_data) > 0):
         print("Processing unlabeled datapoints, which are marked as labeled...")
@@ -124,50 +140,105 @@ def filter_data(dataset, filter_config, notes_filename = None, save=True):
             print("- %d issues from %s project" % (issue_count, project))
     labeled_data = remove_unlabeled_datapoints(labeled_data)
 
-    if notes_filename is not None:
-        with open(notes_filename, "a") as notes_file:
-            print("%d labeled and %d unlabeled issues before filtering"
-                % (len(labeled_data) if labeled_data is not None else 0, len(unlabeled_data) if unlabeled_data is not None else 0), file=notes_file)
+    datapoint_counts = {
+        LABELED_FILENAME: len(labeled_data),
+        UNLABELED_FILENAME: len(unlabeled_data) if unlabeled_data is not None else 0
+    }
+
+    columns = DatasetColumns(labeled_data + (unlabeled_data if unlabeled_data is not None else []), corpus_rows)
+    labeled_rows = np.arange(len(labeled_data))
+    unlabeled_rows = np.arange(len(labeled_data), len(columns))
 
     if filter_config.min_word_count > 0:
         print("Removing datapoints with short text descriptions...")
-        labeled_data = escape_short_texts(labeled_data, filter_config.min_word_count)
-        if labeled_data is None or len(labeled_data) == 0:
+        labeled_rows = escape_short_texts(columns, labeled_rows, filter_config.min_word_count)
+        if len(labeled_rows) == 0:
             print("No labeled datapoints left after removing datapoints with short text descriptions")
-            return None, None
-        if unlabeled_data is not None and len(unlabeled_data) > 0:
-            unlabeled_data = escape_short_texts(unlabeled_data, filter_config.min_word_count)
+            return datapoint_counts, None, None, corpus_rows
+        if len(unlabeled_rows) > 0:
+            unlabeled_rows = escape_short_texts(columns, unlabeled_rows, filter_config.min_word_count)
 
     if filter_config.min_timespent_minutes > 0 or filter_config.max_timespent_minutes < sys.maxsize:
         print("Removing outliers...")
-        labeled_data = remove_outliers(labeled_data, filter_config.min_timespent_minutes * SECONDS_IN_MINUTE, filter_config.max_timespent_minutes * SECONDS_IN_MINUTE)
-        if labeled_data is None or len(labeled_data) == 0:
+        labeled_rows = remove_outliers(columns, labeled_rows, filter_config.min_timespent_minutes * SECONDS_IN_MINUTE, filter_config.max_timespent_minutes * SECONDS_IN_MINUTE)
+        if len(labeled_rows) == 0:
             print("No labeled datapoints left after removing outliers")
-            return None, None
+            return datapoint_counts, None, None, corpus_rows
 
     if filter_config.min_project_size > 0:
         print("Removing small projects...")
-        selected_projects = remove_small_projects(labeled_data, filter_config.min_project_size)
-        labeled_data = filter_data_by_projects(labeled_data, selected_projects)
-        if labeled_data is None or len(labeled_data) == 0:
+        selected_projects = remove_small_projects(columns, labeled_rows, filter_config.min_project_size)
+        labeled_rows = filter_data_by_projects(columns, labeled_rows, selected_projects)
+        if len(labeled_rows) == 0:
             print("No labeled datapoints left after removing small projects")
-            return None, None
-        if unlabeled_data is not None and len(unlabeled_data) > 0:
-            unlabeled_data = filter_data_by_projects(unlabeled_data, selected_projects)
+            return datapoint_counts, None, None, corpus_rows
+        if len(unlabeled_rows) > 0:
+            unlabeled_rows = filter_data_by_projects(columns, unlabeled_rows, selected_projects)
 
     if filter_config.even_distribution_bin_count > 0:
         print("Flattening distribution...")
-        labeled_data = even_distribution(labeled_data, filter_config.even_distribution_bin_count)
-        if labeled_data is None or len(labeled_data) == 0:
+        labeled_rows = even_distribution(columns, labeled_rows, filter_config.even_distribution_bin_count)
+        if len(labeled_rows) == 0:
             print("No labeled datapoints left after making distribution even")
+            return datapoint_counts, None, None, corpus_rows
+
+    labeled_data = columns.get_data(labeled_rows)
+    if unlabeled_data is not None:
+        unlabeled_data = columns.get_data(unlabeled_rows)
+
+    return datapoint_counts, labeled_data, unlabeled_data, corpus_rows
+
+
+def filter_data(dataset, filter_config, notes_filename = None, save=True, use_cache=True):
+    """Filter data of a merged dataset according to a filter configuration and save in JSON format
+
+    Arguments:
+
+    dataset -- the name of the merged dataset
+
+    filter_config -- a FilterConfig
+
+    notes_filename -- a text file to which the number of issues before and after filtering is appended (default None)
+
+    save -- save the filtered data in the dataset folder (default True)
+
+    use_cache -- take the filtered data from the filter cache if the same merged data was filtered
+    with the same configuration before, and add it to the cache otherwise (default True)
+    """
+
+    cache = FilterCache() if use_cache else None
+    key = cache.get_key(dataset, filter_config) if cache is not None else None
+    datapoint_counts = cache.load(key) if key is not None else None
+    corpus_rows = None
+
+    if datapoint_counts is not None:
+        print("Filtered data of dataset %s was taken from the cache" % dataset)
+        labeled_data = cache.load_data(key, LABELED_FILENAME)
+        unlabeled_data = cache.load_data(key, UNLABELED_FILENAME)
+        if labeled_data is None:
+            print("No labeled datapoints left after filtering")
+    else:
+        filtered_data = filter_merged_data(dataset, filter_config)
+        if filtered_data is None:
             return None, None
+        datapoint_counts, labeled_data, unlabeled_data, corpus_rows = filtered_data
+        if key is not None:
+            cache.save(key, datapoint_counts, labeled_data, unlabeled_data, corpus_rows)
+
+    if notes_filename is not None:
+        with open(notes_filename, "a") as notes_file:
+            print("%d labeled and %d unlabeled issues before filtering"
+                % (datapoint_counts[LABELED_FILENAME], datapoint_counts[UNLABELED_FILENAME]), file=notes_file)
+
+    if labeled_data is None:
+        return None, None
 
     if save == True:
         print("Saving filtered data...")
-        save_filtered_data(labeled_data, dataset, LABELED_FILENAME)
+        save_filtered_data(labeled_data, dataset, LABELED_FILENAME, corpus_rows, cache, key)
         print("Saved %d labeled datapoints" % len(labeled_data))
         if unlabeled_data is not None and len(unlabeled_data) > 0:
-            save_filtered_data(unlabeled_data, dataset, UNLABELED_FILENAME)
+            save_filtered_data(unlabeled_data, dataset, UNLABELED_FILENAME, corpus_rows, cache, key)
             print("Saved %d unlabeled datapoints" % len(unlabeled_data))
 
     labeled_data_len = len(labeled_data) if labeled_data is not None else 0
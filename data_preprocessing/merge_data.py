@@ -3,71 +3,97 @@ import os
 import re
 
 from utilities.constants import get_repository_filename, get_dataset_filename
-from utilities.data_utils import get_projects, is_in_projects
-from utilities.file_utils import create_subfolder, get_next_subfolder_name, load_json, save_json
+from utilities.file_utils import create_subfolder, get_next_subfolder_name, load_json_array, save_json_array
 from utilities.constants import ALPHA_FIELD, CLEANED_POSTFIX, DATASET_FOLDER, DESCRIPTION_FIELD_KEY, ID_FIELD_KEY, JSON_FILE_EXTENSION, LABELED_FILENAME
 from utilities.constants import MERGED_POSTFIX, PROJECT_FIELD_KEY, SUMMARY_FIELD_KEY, TIMESPENT_FIELD_KEY, UNLABELED_FILENAME
 from utilities.input_parser import select_repositories, select_projects
+from utilities.token_corpus import TokenCorpusBuilder, load_corpus, save_corpus
 
 
-def load_and_parse_data(datasets, labeling):
+def parse_datapoint(dataset, dataset_datapoint):
 
-    data = []
-    for dataset in datasets:
-        filename = get_repository_filename(dataset, labeling, CLEANED_POSTFIX, JSON_FILE_EXTENSION)
-        dataset_data = load_json(filename)
+    training_datapoint = {
+        ID_FIELD_KEY: int(dataset_datapoint[ID_FIELD_KEY]),
+        PROJECT_FIELD_KEY: "%s-%s" % (dataset, dataset_datapoint[PROJECT_FIELD_KEY]),
+        SUMMARY_FIELD_KEY: dataset_datapoint[SUMMARY_FIELD_KEY]
+    }
+    if DESCRIPTION_FIELD_KEY in dataset_datapoint:
+        training_datapoint[DESCRIPTION_FIELD_KEY] = dataset_datapoint[DESCRIPTION_FIELD_KEY]
+    if TIMESPENT_FIELD_KEY in dataset_datapoint:
+        training_datapoint[TIMESPENT_FIELD_KEY] = int(dataset_datapoint[TIMESPENT_FIELD_KEY])
+    if ALPHA_FIELD in dataset_datapoint:
+        training_datapoint[ALPHA_FIELD] = dataset_datapoint[ALPHA_FIELD]
+
+    return training_datapoint
+
+
+def load_and_parse_data(dataset, labeling):
+    """Read the cleaned data of a repository one datapoint at a time and yield the datapoints
+    which have a summary as training dataset datapoints, together with their row in the cleaned data file"""
+
+    filename = get_repository_filename(dataset, labeling, CLEANED_POSTFIX, JSON_FILE_EXTENSION)
+    if not os.path.isfile(filename):
+        print("%s does not contain %s datapoints with cleaned text" % (dataset, "labeled" if labeling == LABELED_FILENAME else "unlabeled"))
+        return
 
-        if dataset_data is None:
+    print("Parsing data from %s" % filename)
+    for row, dataset_datapoint in enumerate(load_json_array(filename)):
 
-            print("%s does not contain %s datapoints with cleaned text" % (dataset, "labeled" if labeling == LABELED_FILENAME else "unlabeled"))
+        if dataset_datapoint.get(SUMMARY_FIELD_KEY) is None:
             continue
 
-        for dataset_datapoint in dataset_data:
+        yield (row, parse_datapoint(dataset, dataset_datapoint))
 
-            if dataset_datapoint.get(SUMMARY_FIELD_KEY) is None:
-                continue
 
-            training_datapoint = {
-                ID_FIELD_KEY: int(dataset_datapoint[ID_FIELD_KEY]),
-                PROJECT_FIELD_KEY: "%s-%s" % (dataset, dataset_datapoint[PROJECT_FIELD_KEY]),
-                SUMMARY_FIELD_KEY: dataset_datapoint[SUMMARY_FIELD_KEY]
-            }
-            if DESCRIPTION_FIELD_KEY in dataset_datapoint:
-                training_datapoint[DESCRIPTION_FIELD_KEY] = dataset_datapoint[DESCRIPTION_FIELD_KEY]
-            if TIMESPENT_FIELD_KEY in dataset_datapoint:
-                training_datapoint[TIMESPENT_FIELD_KEY] = int(dataset_datapoint[TIMESPENT_FIELD_KEY])
-            if ALPHA_FIELD in dataset_datapoint:
-                training_datapoint[ALPHA_FIELD] = dataset_datapoint[ALPHA_FIELD]
-
-            data.append(training_datapoint)
-
-    if len(data) == 0:
-        print("No %s data was selected" % ("labeled" if labeling == LABELED_FILENAME else "unlabeled"))
-        return
+def count_project_issues(datasets, labeling, issue_counts, labeled_issue_counts):
+    """Read the cleaned data of repositories once, count the issues and the labeled issues of every project
+    and return the repositories whose tokenized corpus contains all of their datapoints
 
-    return data
+    Arguments:
 
+    datasets -- repository identifiers
 
-def filter_by_projects(data, selected_projects):
+    labeling -- LABELED_FILENAME or UNLABELED_FILENAME
 
-    filtered_data = []
-    for datapoint in data:
-        if is_in_projects(datapoint, selected_projects):
-            filtered_data.append(datapoint)
+    issue_counts -- a dictionary to which the number of issues of every project is added
 
-    percentage = len(filtered_data) / len(data) * 100
-    print("%d (%.2f%%) of %d selected" % (len(filtered_data), percentage, len(data)))
+    labeled_issue_counts -- a dictionary to which the number of issues with time spent of every project is added
+    """
 
-    return filtered_data
+    tokenized_datasets = set()
+    for dataset in datasets:
+        filename = get_repository_filename(dataset, labeling, CLEANED_POSTFIX, JSON_FILE_EXTENSION)
+        corpus = load_corpus(filename)
+        is_tokenized = corpus is not None or not os.path.isfile(filename)
+        for row, datapoint in load_and_parse_data(dataset, labeling):
+            project = datapoint[PROJECT_FIELD_KEY]
+            issue_counts[project] = issue_counts.get(project, 0) + 1
+            if TIMESPENT_FIELD_KEY in datapoint:
+                labeled_issue_counts[project] = labeled_issue_counts.get(project, 0) + 1
+            if is_tokenized and (row >= len(corpus) or corpus.ids[row] != datapoint[ID_FIELD_KEY]):
+                is_tokenized = False
+        if is_tokenized:
+            tokenized_datasets.add(dataset)
 
+    return tokenized_datasets
 
-def exclude_projects(data):
 
-    all_projects = get_projects(data)
+def print_selected_count(issue_counts, selected_projects):
+
+    issue_count = sum(issue_counts.values())
+    selected_issue_count = sum(count for project, count in issue_counts.items() if project in selected_projects)
+    print("%d (%.2f%%) of %d selected" % (selected_issue_count, selected_issue_count / issue_count * 100, issue_count))
+
+    return selected_issue_count
+
+
+def exclude_projects(issue_counts, labeled_issue_counts):
+
+    all_projects = set(issue_counts)
     if input("Would you like to exclude any particular projects? (y/n) ") != "y":
         return all_projects
 
-    excluded_projects = select_projects(data)
+    excluded_projects = select_projects(issue_counts, labeled_issue_counts)
     if len(excluded_projects) == 0:
         print("No projects were excluded")
         return all_projects
@@ -76,17 +102,17 @@ def exclude_projects(data):
     return selected_projects
 
 
-def select_or_exclude_projects(data):
+def select_or_exclude_projects(issue_counts, labeled_issue_counts):
     """Let user select of exclude particular projects from the pool"""
 
-    if data is None:
+    if len(issue_counts) == 0:
         return
 
     print("You will be able to select the minimum number of issues in a project later")
     if input("Do you want to train and test only on selected projects? (y/n) ") != "y":
-        return exclude_projects(data)
+        return exclude_projects(issue_counts, labeled_issue_counts)
         
-    selected_projects = select_projects(data)
+    selected_projects = select_projects(issue_counts, labeled_issue_counts)
     if len(selected_projects) == 0:
         print("No projects were selected")
         return
@@ -94,10 +120,29 @@ def select_or_exclude_projects(data):
     return selected_projects
 
 
-def save_merged_data(data, dataset_name, labeling):
+def get_selected_datapoints(datasets, labeling, selected_projects, corpus_builder=None):
+    """Yield the datapoints of the selected projects from the cleaned data of repositories one at a time,
+    adding them to corpus_builder from the tokenized corpus of their repository if it is given"""
+
+    for dataset in datasets:
+        filename = get_repository_filename(dataset, labeling, CLEANED_POSTFIX, JSON_FILE_EXTENSION)
+        corpus = load_corpus(filename) if corpus_builder is not None else None
+        for row, datapoint in load_and_parse_data(dataset, labeling):
+            if datapoint[PROJECT_FIELD_KEY] not in selected_projects:
+                continue
+            if corpus is not None:
+                corpus_builder.append_row(corpus, row)
+            yield datapoint
+
+
+def save_merged_data(datasets, dataset_name, labeling, selected_projects, is_tokenized=False):
+    """Write the datapoints of the selected projects in a merged dataset without keeping them in memory,
+    and the tokenized corpus of the merged dataset if is_tokenized is True"""
 
     filename = get_dataset_filename(dataset_name, labeling, MERGED_POSTFIX, JSON_FILE_EXTENSION)
-    save_json(filename, data)  
+    corpus_builder = TokenCorpusBuilder() if is_tokenized else None
+    save_json_array(filename, get_selected_datapoints(datasets, labeling, selected_projects, corpus_builder))
+    save_corpus(filename, corpus_builder.build() if is_tokenized else None)
     print("Merged dataset %s created and saved on %s" % (dataset_name, filename))
 
 
@@ -121,40 +166,47 @@ def merge_data(repository_identifiers, enable_manual_project_selection = False):
         print("No repositories selected")
         return
 
-    labeled_data = load_and_parse_data(repositories, LABELED_FILENAME)
-    unlabeled_data = load_and_parse_data(repositories, UNLABELED_FILENAME)
-
-    if labeled_data == None:
-        labeled_data = []
+    issue_counts = {LABELED_FILENAME: {}, UNLABELED_FILENAME: {}}
+    labeled_issue_counts = {}
+    tokenized_datasets = {}
+    for labeling in [LABELED_FILENAME, UNLABELED_FILENAME]:
+        tokenized_datasets[labeling] = count_project_issues(repositories, labeling, issue_counts[labeling], labeled_issue_counts)
+        if len(issue_counts[labeling]) == 0:
+            print("No %s data was selected" % ("labeled" if labeling == LABELED_FILENAME else "unlabeled"))
 
-    if unlabeled_data == None:
-        unlabeled_data = []
+    all_issue_counts = dict(issue_counts[UNLABELED_FILENAME])
+    for project, issue_count in issue_counts[LABELED_FILENAME].items():
+        all_issue_counts[project] = all_issue_counts.get(project, 0) + issue_count
 
     if enable_manual_project_selection == True:
-        selected_projects = select_or_exclude_projects(labeled_data + unlabeled_data)
+        selected_projects = select_or_exclude_projects(all_issue_counts, labeled_issue_counts)
     else:
-        selected_projects = get_projects(labeled_data + unlabeled_data)
+        selected_projects = set(all_issue_counts)
 
     if selected_projects is None or len(selected_projects) == 0:
         print("No projects selected, merge is cancelled")
         return
     print("Merging data from the following projects:", *selected_projects)
 
-    if len(labeled_data) > 0:
-        labeled_data = filter_by_projects(labeled_data, selected_projects)
+    labeled_data_count = 0
+    if len(issue_counts[LABELED_FILENAME]) > 0:
+        labeled_data_count = print_selected_count(issue_counts[LABELED_FILENAME], selected_projects)
 
-    if labeled_data is None or len(labeled_data) == 0:
+    if labeled_data_count == 0:
         print("No labeled data was selected, merge is cancelled")
         return
 
-    if len(unlabeled_data) > 0:
-        unlabeled_data = filter_by_projects(unlabeled_data, selected_projects)
+    unlabeled_data_count = 0
+    if len(issue_counts[UNLABELED_FILENAME]) > 0:
+        unlabeled_data_count = print_selected_count(issue_counts[UNLABELED_FILENAME], selected_projects)
 
     dataset_name = get_next_subfolder_name(DATASET_FOLDER)
     create_subfolder(DATASET_FOLDER, dataset_name)
-    save_merged_data(labeled_data, dataset_name, LABELED_FILENAME)
-    if len(unlabeled_data) > 0:
-        save_merged_data(unlabeled_data, dataset_name, UNLABELED_FILENAME)
+    save_merged_data(repositories, dataset_name, LABELED_FILENAME, selected_projects,
+        tokenized_datasets[LABELED_FILENAME] == set(repositories))
+    if unlabeled_data_count > 0:
+        save_merged_data(repositories, dataset_name, UNLABELED_FILENAME, selected_projects,
+            tokenized_datasets[UNLABELED_FILENAME] == set(repositories))
 
     return dataset_name
 
@@ -1,22 +1,19 @@
 from utilities.constants import *
 from utilities.file_utils import load_json, create_folder_if_needed, save_json
 from utilities.string_utils import merge_sentences
+from utilities.token_corpus import load_corpora
 
-def count_tokens(dataset, notes_filename, data=None, save=True):
-
-    if data is None:
+def count_corpus_tokens(corpora):
 
-        labeled_data_filename = get_dataset_filename(dataset, LABELED_FILENAME, FILTERED_POSTFIX, JSON_FILE_EXTENSION)
-        labeled_data = load_json(labeled_data_filename)
+    token_counts = {}
 
-        unlabeled_data_filename = get_dataset_filename(dataset, UNLABELED_FILENAME, FILTERED_POSTFIX, JSON_FILE_EXTENSION)
-        unlabeled_data = load_json(unlabeled_data_filename)
+    for corpus in corpora:
+        for word, count in zip(corpus.vocabulary, corpus.count_tokens().tolist()):
+            token_counts[word] = token_counts.get(word, 0) + count
 
-        data = labeled_data
-        if unlabeled_data is not None:
-            data = data + unlabeled_data
+    return token_counts
 
-    print("Counting tokens...")
+def count_data_tokens(data):
 
     token_counts = {}
 
@@ -28,6 +25,30 @@ def count_tokens(dataset, notes_filename, data=None, save=True):
                 for word in summary_words:
                     token_counts[word] = token_counts.get(word, 0) + 1
 
+    return token_counts
+
+def count_tokens(dataset, notes_filename, data=None, save=True):
+
+    corpora = None
+    if data is None:
+
+        labeled_data_filename = get_dataset_filename(dataset, LABELED_FILENAME, FILTERED_POSTFIX, JSON_FILE_EXTENSION)
+        unlabeled_data_filename = get_dataset_filename(dataset, UNLABELED_FILENAME, FILTERED_POSTFIX, JSON_FILE_EXTENSION)
+        corpora = load_corpora([labeled_data_filename, unlabeled_data_filename])
+
+    if data is None and corpora is None:
+
+        labeled_data = load_json(labeled_data_filename)
+        unlabeled_data = load_json(unlabeled_data_filename)
+
+        data = labeled_data
+        if unlabeled_data is not None:
+            data = data + unlabeled_data
+
+    print("Counting tokens...")
+
+    token_counts = count_corpus_tokens(corpora) if corpora is not None else count_data_tokens(data)
+
     print("Sorting...")
     token_counts = sorted(token_counts.items(), key=lambda x: x[1], reverse=True)
 
@@ -1,28 +1,44 @@
 from gensim.models import Word2Vec
+import os
 import sys
 
 from utilities.file_utils import load_json, create_folder_if_needed
 from utilities.constants import *
+from utilities.token_corpus import load_corpora
+
+
+def get_training_sentences(data):
+
+    training_sentences = []
+    for datapoint in data:
+        sentences = datapoint[SUMMARY_FIELD_KEY]
+        if datapoint.get(DESCRIPTION_FIELD_KEY) is not None:
+            sentences = sentences + datapoint.get(DESCRIPTION_FIELD_KEY)
+        for sentence in sentences:
+            training_sentences.append([word for word in sentence.split()])
+
+    return training_sentences
 
 
 def train_gensim(dataset, algorithm, embedding_size, minimum_count, window_size, iterations, notes_filename, data=None, save=True, workers=4):
 
+    corpora = None
     if data == None:
         labeled_filename = get_dataset_filename(dataset, LABELED_FILENAME, FILTERED_POSTFIX, JSON_FILE_EXTENSION)
         unlabeled_filename = get_dataset_filename(dataset, UNLABELED_FILENAME, FILTERED_POSTFIX, JSON_FILE_EXTENSION)
+        data_filename = labeled_filename if os.path.isfile(labeled_filename) else unlabeled_filename
+        corpora = load_corpora([data_filename])
 
+    if data == None and corpora is None:
         labeled_data = load_json(labeled_filename)
         unlabeled_data = load_json(unlabeled_filename)
 
         data = labeled_data if labeled_data is not None else [] + unlabeled_data if unlabeled_data is not None else []
 
-    training_sentences = []
-    for datapoint in data:
-        sentences = datapoint[SUMMARY_FIELD_KEY]
-        if datapoint.get(DESCRIPTION_FIELD_KEY) is not None:
-            sentences = sentences + datapoint.get(DESCRIPTION_FIELD_KEY)
-        for sentence in sentences:
-            training_sentences.append([word for word in sentence.split()])
+    if corpora is not None:
+        training_sentences = [sentence for corpus in corpora for sentence in corpus.get_sentences()]
+    else:
+        training_sentences = get_training_sentences(data)
     print("Sentences prepared")
 
     model = Word2Vec(training_sentences,
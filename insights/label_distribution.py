@@ -4,6 +4,7 @@ import matplotlib.pyplot as plt
 import numpy as np
 import sys
 
+from utilities.data_utils import get_histogram
 from utilities.file_utils import create_folder_if_needed, load_json
 from utilities.constants import *
 
@@ -25,7 +26,8 @@ def show_histogram(dataset):
     max_hours = int(input("Please input the maximum number of hours to display in the histogram: "))
 
     plt.figure(figsize=(12, 7))
-    plt.hist(y, bins = max_hours * 12, range = (0, max_hours - 1 / SECONDS_IN_HOUR))
+    bin_edges, bin_volumes = get_histogram(y, max_hours * 12, (0, max_hours - 1 / SECONDS_IN_HOUR))
+    plt.hist(bin_edges[:-1], bins = bin_edges, weights = bin_volumes)
     plt.xticks(np.arange(0, max_hours + 1, 1))
     plt.xlim(0, max_hours)
     plt.xlabel("Time spent, hours")
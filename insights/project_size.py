@@ -5,7 +5,7 @@ import matplotlib.pyplot as plt
 import numpy as np
 import sys
 
-from utilities.data_utils import get_issue_counts
+from utilities.data_utils import get_histogram, get_issue_counts
 from utilities.file_utils import load_json, create_folder_if_needed
 from utilities.constants import *
 
@@ -39,7 +39,8 @@ def show_histogram(dataset):
     bins = int(input("Please input the number of bins: "))
 
     plt.figure(figsize=(12, 7))
-    plt.hist(issue_counts, bins = bins, range = (min_size, max_size))
+    bin_edges, bin_volumes = get_histogram(issue_counts, bins, (min_size, max_size))
+    plt.hist(bin_edges[:-1], bins = bin_edges, weights = bin_volumes)
     step = (max_size - min_size) / bins
     plt.xticks(np.arange(min_size, max_size + 1, step))
     plt.xlim(min_size, max_size)
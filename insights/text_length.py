@@ -4,9 +4,11 @@ import matplotlib.pyplot as plt
 import numpy as np
 import sys
 
+from utilities.data_utils import get_histogram
 from utilities.file_utils import load_json, create_folder_if_needed
 from utilities.constants import *
 from utilities.string_utils import merge_sentences
+from utilities.token_corpus import load_corpora
 
 def get_texts(data, field):
 
@@ -23,6 +25,15 @@ def get_texts(data, field):
     sys.exit()
 
 
+def get_text_lengths(corpora, field):
+
+    if field not in [None, SUMMARY_FIELD_KEY, DESCRIPTION_FIELD_KEY]:
+        print("Field not recognized")
+        sys.exit()
+
+    return np.concatenate([corpus.get_token_counts(field) for corpus in corpora])
+
+
 def get_x_label(field):
 
     if field == None:
@@ -43,17 +54,25 @@ def show_histogram(dataset, labeling = LABELED_FILENAME, field = None):
     if labeling == ALL_FILENAME:
         labeled_filename = get_dataset_filename(dataset, LABELED_FILENAME, FILTERED_POSTFIX, JSON_FILE_EXTENSION)
         unlabeled_filename = get_dataset_filename(dataset, UNLABELED_FILENAME, FILTERED_POSTFIX, JSON_FILE_EXTENSION)
-        data = load_json(labeled_filename) + load_json(unlabeled_filename)
+        corpora = load_corpora([labeled_filename, unlabeled_filename])
     else:
         filename = get_dataset_filename(dataset, labeling, FILTERED_POSTFIX, JSON_FILE_EXTENSION)
-        data = load_json(filename)
+        corpora = load_corpora([filename])
 
-    if data is None:
-        print("No data was selected")
-        sys.exit()
+    if corpora is not None:
+        text_lengths = get_text_lengths(corpora, field)
+    else:
+        if labeling == ALL_FILENAME:
+            data = load_json(labeled_filename) + load_json(unlabeled_filename)
+        else:
+            data = load_json(filename)
+
+        if data is None:
+            print("No data was selected")
+            sys.exit()
 
-    texts = get_texts(data, field)
-    text_lengths = [len(text.split()) for text in texts]
+        texts = get_texts(data, field)
+        text_lengths = [len(text.split()) for text in texts]
 
     print("Mean, words:", np.mean(text_lengths))
     print("Median, words:", np.median(text_lengths))
@@ -76,7 +95,8 @@ def show_histogram(dataset, labeling = LABELED_FILENAME, field = None):
     bins = int(input("Please input the number of bins: "))
 
     plt.figure(figsize=(12, 7))
-    plt.hist(text_lengths, bins = bins, range = (min_length, max_length))
+    bin_edges, bin_volumes = get_histogram(text_lengths, bins, (min_length, max_length))
+    plt.hist(bin_edges[:-1], bins = bin_edges, weights = bin_volumes)
     step = (max_length - min_length) / bins
     plt.xticks(np.arange(min_length, max_length + 1, step))
     plt.xlim(min_length, max_length)
@@ -1,5 +1,6 @@
 from hyperopt import fmin, tpe, hp, STATUS_FAIL, STATUS_OK, Trials
 from hyperopt.pyll.base import scope
+from functools import partial
 import gc
 import json
 import numpy as np
@@ -87,7 +88,7 @@ def remove_negative_values(nested_dictionary):
     return result
 
 
-def objective(configuration):
+def objective(configuration, labeled_data=None):
 
     print("--- NEW CONFIGURATION ---")
 
@@ -97,7 +98,7 @@ def objective(configuration):
     training_session_id = configuration['training_session_id']
     training_session_folder = "%s/%s" % (RESULTS_FOLDER, training_session_id)
     create_subfolder(training_session_folder, configuration["run_id"], rewrite=False)
-    loss, val_loss = train_on_dataset(configuration)
+    loss, val_loss = train_on_dataset(configuration, labeled_data)
 
     log_filename = "%s/%s/%s%s" % (RESULTS_FOLDER, training_session_id, RESULTS_FILENAME, TEXT_FILE_EXTENSION)
     with open(log_filename, "a") as log_file:
@@ -144,7 +145,7 @@ def optimize_model(embedding_type, lstm_count, conform_type, training_dataset_id
     filter_config.even_distribution_bin_count = space["bin_count"]
 
     log_filename = "%s/%s/%s%s" % (RESULTS_FOLDER, space["training_session_id"], RESULTS_FILENAME, TEXT_FILE_EXTENSION)
-    filter_data(training_dataset_id, filter_config, log_filename if run_id == 1 else None)
+    labeled_data, _ = filter_data(training_dataset_id, filter_config, log_filename if run_id == 1 else None)
 
     evals = 150 if embedding_type == "spacy" else 200
     for eval_num in range(run_id, evals + 1):
@@ -155,7 +156,7 @@ def optimize_model(embedding_type, lstm_count, conform_type, training_dataset_id
             # this sometimes throws OSError 35 on MAC OS X, https://github.com/urllib3/urllib3/issues/63
             try:
                 space["run_id"] = eval_num
-                best = fmin(objective,
+                best = fmin(partial(objective, labeled_data=labeled_data),
                 space=space,
                 algo=tpe.suggest,
                 max_evals=eval_num,
@@ -6,6 +6,7 @@ from utilities.data_utils import get_issue_counts
 from utilities.file_utils import load_json
 from utilities.constants import *
 from utilities.string_utils import merge_sentences
+from utilities.token_corpus import add_corpus_rows, get_datapoint_key, load_corpus
 
 def ordered_shuffle(data):
 
@@ -53,14 +54,16 @@ def split_train_test_val(data, split_percentages):
     return (x_train, y_train, x_test, y_test, x_valid, y_valid)
 
 
-def convert_to_numeric(strings, string_dictionary, vector_dictionary, lookup, max_length):
+def convert_to_numeric(strings, string_dictionary, vector_dictionary, lookup, max_length, vocabulary=None):
+    """Convert texts to sequences of word indexes in the vector dictionary. The texts are either strings
+    or token arrays of a tokenized corpus, in which case the corpus vocabulary has to be given."""
 
     numeric_sentences = []
 
     for text in strings:
         
         numeric_sentence = []
-        words = text.split()
+        words = text.split() if vocabulary is None else [vocabulary[token] for token in text.tolist()]
         j = 0
         for word in words:
             
@@ -85,14 +88,25 @@ def convert_to_numeric(strings, string_dictionary, vector_dictionary, lookup, ma
 
 def load_and_arrange(dataset, split_percentage, split_fields, max_length, lookup, labeled_data=None):
 
+    data_filename = get_dataset_filename(dataset, LABELED_FILENAME, FILTERED_POSTFIX, JSON_FILE_EXTENSION)
     if labeled_data is None:
-        data_filename = get_dataset_filename(dataset, LABELED_FILENAME, FILTERED_POSTFIX, JSON_FILE_EXTENSION)
         labeled_data = load_json(data_filename)
 
+    corpus = load_corpus(data_filename, labeled_data)
+    corpus_rows = add_corpus_rows({}, labeled_data, corpus) if corpus is not None else None
+
     shuffled_data = ordered_shuffle(labeled_data)
     del labeled_data
 
-    if split_fields == True:
+    vocabulary = None
+    if corpus is not None:
+        rows = [corpus_rows[get_datapoint_key(datapoint)][1] for datapoint in shuffled_data]
+        vocabulary = corpus.vocabulary
+        if split_fields == True:
+            x_strings_arr = [[corpus.get_tokens(row, field_key) for row in rows] for field_key in [SUMMARY_FIELD_KEY, DESCRIPTION_FIELD_KEY]]
+        else:
+            x_strings_arr = [[corpus.get_tokens(row) for row in rows]]
+    elif split_fields == True:
         x_strings_arr = []
         x_strings_arr.append([merge_sentences(datapoint.get(SUMMARY_FIELD_KEY)) for datapoint in shuffled_data])
         x_strings_arr.append([merge_sentences(datapoint.get(DESCRIPTION_FIELD_KEY, [])) for datapoint in shuffled_data])
@@ -113,7 +127,8 @@ def load_and_arrange(dataset, split_percentage, split_fields, max_length, lookup
             string_dictionary,
             vector_dictionary,
             lookup,
-            max_length[i])
+            max_length[i],
+            vocabulary)
         numeric_padded_x = pad_sequences(numeric_x_strings, maxlen=max_length[i])
         x.append(numeric_padded_x)
 
@@ -3,14 +3,21 @@ DATA_FOLDER = "raw_data"
 DATASET_FOLDER = "training_datasets"
 RESULTS_FOLDER = "results"
 DATA_COLLECTION_FOLDER = "data_collection"
+DATA_PREPROCESSING_FOLDER = "data_preprocessing"
+FILTER_CACHE_FOLDER = "filter_cache"
 
 STATISTICS_FOLDER = DATASET_FOLDER + "/insights"
 
 URL_PREFIX = "https://"
+LOCAL_URL_PREFIX = "http://"
+LOCAL_HOSTS = "localhost", "127.0.0.1"
 JIRA_REST = "/rest/api/latest"
 JIRA_SEARCH = "/search"
 
 RAW_POSTFIX = "raw"
+DELTA_POSTFIX = "delta"
+SYNC_POSTFIX = "sync"
+CLEAN_CACHE_POSTFIX = "clean_cache"
 CLEANED_POSTFIX = "clean"
 MERGED_POSTFIX = "merged"
 FILTERED_POSTFIX = "filtered"
@@ -23,9 +30,15 @@ SPACY_LOOKUP_POSTFIX = "spacy_lookup"
 GENSIM_MODEL = "gensim_model"
 
 POTENTIAL_REPOS_FILENAME = "%s/%s" % (DATA_COLLECTION_FOLDER, "potential_repos.txt")
+FETCH_METRICS_FILENAME = "%s/%s" % (DATA_FOLDER, "fetch_metrics.json")
+DISCOVERY_CACHE_FILENAME = "%s/%s" % (DATA_FOLDER, "discovery_cache.json")
+CLEAN_GOLDEN_SET_FILENAME = "%s/%s" % (DATA_PREPROCESSING_FOLDER, "clean_golden_set.json")
 
 JSON_FILE_EXTENSION = ".json"
 CSV_FILE_EXTENSION = ".csv"
+JSONL_FILE_EXTENSION = ".jsonl.gz"
+SQLITE_FILE_EXTENSION = ".sqlite"
+NPZ_FILE_EXTENSION = ".npz"
 HDF5_FILE_EXTENSION = ".hdf5"
 PICKLE_FILE_EXTENSION = ".pkl"
 PNG_FILE_XTENSION = ".png"
@@ -42,25 +55,34 @@ PROJECT_SIZE_STAT = "project_size"
 TEXT_LENGTH_STAT = "text_length"
 
 JSON_INDENT = 4
+JSON_ARRAY_BUFFER_SIZE = 2 ** 20
+SORT_RUN_SIZE = 50000
 PICKLE_PROTOCOL = 4
 SECONDS_IN_MINUTE = 60
 SECONDS_IN_HOUR = 3600
 MINUTES_IN_HOUR = 60
 SPACY_EMBEDDING_SIZE = 384
 REQUEST_TIMEOUT_SECONDS = 15
+SLICE_REQUEST_TIMEOUT_SECONDS = 60
 
 PLOT_BBOX_INCHES = "tight"
 OSX_PLATFORM_SYSTEM = "Darwin"
 
 LABELED_DATA_JQL = "timespent > 0 and resolution != Unresolved"
 UNLABELED_DATA_JQL = "timespent <= 0 or timespent is EMPTY or resolution is EMPTY"
+DELTA_DATA_JQL = "updated >= \"%s\""
+
+JIRA_DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f%z"
+JQL_DATE_FORMAT = "%Y/%m/%d"
 
 DESCRIPTION_FIELD_KEY = "description"
 SUMMARY_FIELD_KEY = "summary"
 PROJECT_FIELD_KEY = "project"
 TIMESPENT_FIELD_KEY = "timespent"
+UPDATED_FIELD_KEY = "updated"
+RESOLUTION_FIELD_KEY = "resolution"
 ID_FIELD_KEY = "id"
-FIELD_KEYS = ID_FIELD_KEY, PROJECT_FIELD_KEY, SUMMARY_FIELD_KEY, DESCRIPTION_FIELD_KEY, TIMESPENT_FIELD_KEY
+FIELD_KEYS = ID_FIELD_KEY, PROJECT_FIELD_KEY, SUMMARY_FIELD_KEY, DESCRIPTION_FIELD_KEY, TIMESPENT_FIELD_KEY, UPDATED_FIELD_KEY, RESOLUTION_FIELD_KEY
 TEXT_FIELD_KEY = "text"
 
 ALPHA_FIELD = "alpha"
@@ -78,7 +100,9 @@ def get_running_configuration_filename(configuration_name):
     return "%s/%s%s" % (CONFIGURATIONS_FOLDER, configuration_name, JSON_FILE_EXTENSION)
 
 def get_repository_search_url(repository_base_url):
-    return URL_PREFIX + repository_base_url + JIRA_REST + JIRA_SEARCH
+    host = repository_base_url.split("/")[0].split(":")[0]
+    url_prefix = LOCAL_URL_PREFIX if host in LOCAL_HOSTS else URL_PREFIX
+    return url_prefix + repository_base_url + JIRA_REST + JIRA_SEARCH
 
 def get_results_folder_name(dataset, training_session_name):
     return "%s/%s-%s" % (RESULTS_FOLDER, dataset, training_session_name)
@@ -1,3 +1,5 @@
+import numpy as np
+
 from utilities.constants import *
 
 def get_projects(data):
@@ -9,30 +11,80 @@ def get_projects(data):
 
 def get_issue_counts(data):
 
-    project_list = get_projects(data)
-    if project_list is None:
+    if data is None:
         return
 
-    project_issue_counts = []
-    for project in project_list:
-        issue_count = sum(1 for datapoint in data if datapoint[PROJECT_FIELD_KEY] == project)
-        project_issue_counts.append((project, issue_count))
+    project_issue_counts = {}
+    for datapoint in data:
+        project_issue_counts[datapoint[PROJECT_FIELD_KEY]] = project_issue_counts.get(datapoint[PROJECT_FIELD_KEY], 0) + 1
+
+    return sorted(project_issue_counts.items(), key = lambda a: a[1])
+
+def get_bin_edges(bin_count, value_range, minimum=0):
+    """Return the edges of bin_count bins of equal width covering value_range from minimum"""
+
+    return minimum + value_range / bin_count * np.arange(bin_count + 1)
+
+def get_bin_indexes(values, bin_edges, right=True):
+    """Return an array of the index of the bin of every value, found in a single pass, or -1 for values outside all bins
+
+    Arguments:
+
+    values -- an array of values
+
+    bin_edges -- an increasing array of bin edges, see get_bin_edges
+
+    right -- True if the bins include their right edge and not their left edge, False if they include
+    their left edge and not their right edge except the last bin, like numpy and matplotlib histograms (default True)
+    """
+
+    values = np.asarray(values)
+    bin_count = len(bin_edges) - 1
+    bin_indexes = np.searchsorted(bin_edges, values, side="left" if right else "right") - 1
+    if not right:
+        bin_indexes[values == bin_edges[-1]] = bin_count - 1
+    bin_indexes[(bin_indexes < 0) | (bin_indexes >= bin_count)] = -1
+
+    return bin_indexes
+
+def get_bin_volumes(bin_indexes, bin_count):
+    """Return an array of the number of values in every bin"""
+
+    return np.bincount(bin_indexes[bin_indexes >= 0], minlength=bin_count)
+
+def get_even_selection(bin_indexes, bin_volumes):
+    """Return the indexes of the values kept when every bin is down-sampled to the volume of the least populated bin,
+    ordered by bin and by index within a bin. Values are dropped at evenly spaced positions within every bin.
+
+    Arguments:
+
+    bin_indexes -- an array of the bin index of every value, see get_bin_indexes
+
+    bin_volumes -- an array of the number of values in every bin, see get_bin_volumes
+    """
+
+    order = np.argsort(bin_indexes, kind="stable")
+    order = order[bin_indexes[order] >= 0]
+    ordered_bin_indexes = bin_indexes[order]
+
+    bin_starts = np.cumsum(bin_volumes) - bin_volumes
+    positions = np.arange(len(order)) - bin_starts[ordered_bin_indexes]
+    factors = bin_volumes.min() / bin_volumes[ordered_bin_indexes]
+    is_selected = np.round(positions * factors) != np.round((positions + 1) * factors)
 
-    return sorted(project_issue_counts, key = lambda a: a[1])
+    return order[is_selected]
 
-def is_in_projects(datapoint, selected_projects):
+def get_histogram(values, bin_count, value_range):
+    """Return the bin edges and the bin volumes of a histogram of values as numpy and matplotlib histograms count them
 
-    return len({datapoint[PROJECT_FIELD_KEY]} & selected_projects) > 0
+    Arguments:
 
-def get_bins_and_volumes(data, bin_count, timespent_range):
+    values -- an array of values
 
-    bins = []
-    bin_range = timespent_range / bin_count
-    for i in range(bin_count):
+    bin_count -- the number of bins
 
-        from_timespent = bin_range * i
-        to_timespent = bin_range * (i + 1)
-        bins.append([datapoint for datapoint in data if datapoint[TIMESPENT_FIELD_KEY] > from_timespent and datapoint[TIMESPENT_FIELD_KEY] <= to_timespent])
-    bin_volumes = [len(b) for b in bins]
+    value_range -- a tuple of the lower and the upper edge of the histogram
+    """
 
-    return (bins, bin_volumes)
+    bin_edges = np.linspace(value_range[0], value_range[1], bin_count + 1)
+    return (bin_edges, get_bin_volumes(get_bin_indexes(values, bin_edges, False), bin_count))
@@ -1,14 +1,21 @@
+import codecs
 import csv
+import gzip
+import heapq
+from itertools import islice
 import os
 import json
 import pickle
 import platform
+import re
 import shutil
 import sys
+import tempfile
 
 from utilities.constants import *
 
 MAX_BYTES = 2 ** 31 - 1
+JSON_ARRAY_SEPARATOR = re.compile(r"[\s,]*")
 
 def load_json(filename):
 
@@ -25,30 +32,162 @@ def save_json(filename, data):
     with open(filename, "w") as file:
         json.dump(data, file, indent=JSON_INDENT)
 
-def load_csv(filename, keys):
-
-    if not os.path.isfile(filename):
-        print("File %s does not exist" % filename)
+def save_json_array(filename, items):
+    """Write items one at a time in the same format as save_json writes a list of them,
+    replacing the file once all items are written. Return the number of items written."""
+
+    item_count = 0
+    temporary_filename = filename + ".tmp"
+    with open(temporary_filename, "w") as file:
+        file.write("[")
+        for item in items:
+            file.write(",\n" if item_count > 0 else "\n")
+            lines = json.dumps(item, indent=JSON_INDENT).split("\n")
+            file.write("\n".join(" " * JSON_INDENT + line for line in lines))
+            item_count = item_count + 1
+        file.write("\n]" if item_count > 0 else "]")
+
+    os.replace(temporary_filename, filename)
+    return item_count
+
+def load_json_array(filename, buffer_size=JSON_ARRAY_BUFFER_SIZE):
+    """Read the items of a JSON file containing a single array one at a time"""
+
+    decoder = json.JSONDecoder()
+    with open(filename) as file:
+        buffer = file.read(buffer_size).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError("%s does not contain a JSON array" % filename)
+        position = 1
+        is_end_of_file = False
+        while True:
+            position = JSON_ARRAY_SEPARATOR.match(buffer, position).end()
+            if buffer.startswith("]", position):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+                if end == len(buffer) and not is_end_of_file:
+                    raise ValueError("%s may continue after the end of the buffer" % filename)
+            except ValueError:
+                if is_end_of_file:
+                    raise
+                chunk = file.read(buffer_size)
+                is_end_of_file = len(chunk) == 0
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            yield item
+            position = end
+
+def write_sorted_run(folder, run, run_number):
+    """Save a sorted run of an external sort as an uncompressed JSON Lines file and return its name"""
+
+    filename = os.path.join(folder, "run%d.jsonl" % run_number)
+    with open(filename, "w", encoding="utf-8") as file:
+        for item in run:
+            write_jsonl_record(file, item)
+
+    return filename
+
+def load_sorted_run(file):
+
+    for line in file:
+        yield json.loads(line)
+
+def external_sort(items, key, run_size=SORT_RUN_SIZE):
+    """Yield items sorted by key with at most two runs of run_size items in memory. If there are more
+    than run_size items, they are sorted in runs which are spilled to temporary files and merged.
+    The sort is stable, as sorted is.
+
+    Arguments:
+
+    items -- an iterable of JSON serializable items
+
+    key -- a function returning the sort key of an item
+
+    run_size -- the number of items sorted in memory at once (default SORT_RUN_SIZE)
+    """
+
+    items = iter(items)
+    run = sorted(islice(items, run_size), key=key)
+    next_run = sorted(islice(items, run_size), key=key)
+    if len(next_run) == 0:
+        yield from run
         return
 
-    data = []
+    with tempfile.TemporaryDirectory() as folder:
+        run_filenames = [write_sorted_run(folder, run, 0)]
+        while len(next_run) > 0:
+            run_filenames.append(write_sorted_run(folder, next_run, len(run_filenames)))
+            next_run = sorted(islice(items, run_size), key=key)
+        run = next_run = None
 
-    csv.field_size_limit(2147483647)
+        run_files = [open(filename, encoding="utf-8") for filename in run_filenames]
+        try:
+            yield from heapq.merge(*[load_sorted_run(file) for file in run_files], key=key)
+        finally:
+            for file in run_files:
+                file.close()
 
-    print("Parsing data from %s" % filename)
+def open_jsonl(filename, mode="rt"):
+    """Open a gzip compressed JSON Lines file, use mode 'at' to append records to it"""
+
+    return gzip.open(filename, mode, encoding="utf-8")
+
+def write_jsonl_record(file, record):
+
+    file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+    file.write("\n")
+
+def load_jsonl(filename):
+    """Read records from a gzip compressed JSON Lines file one at a time"""
+
+    with open_jsonl(filename) as file:
+        for line in file:
+            if len(line.strip()) > 0:
+                yield json.loads(line)
+
+def convert_csv_to_jsonl(csv_filename, jsonl_filename, keys, integer_keys=()):
+    """Convert a CSV file with UTF-8 byte escaped values to a gzip compressed JSON Lines file
+    with unescaped values, keeping the modification time of the CSV file
 
-    with open(filename, 'r') as file:
-        csvreader = csv.reader(file)
-        for k, row in enumerate(csvreader):
+    Arguments:
 
-            row_as_dict = {}
+    csv_filename -- the name of the CSV file
+
+    jsonl_filename -- the name of the JSON Lines file
+
+    keys -- the keys of the CSV columns
+
+    integer_keys -- the keys of the columns containing integers (default ())
+    """
+
+    print("Converting %s to %s" % (csv_filename, jsonl_filename))
+
+    csv.field_size_limit(2147483647)
+    with open(csv_filename, 'r', newline='') as csv_file, open_jsonl(jsonl_filename, "wt") as jsonl_file:
+        for row in csv.reader(csv_file):
+            record = {}
             for i, value in enumerate(row):
                 if value is None or value == "":
                     continue
-                row_as_dict[keys[i]] = value
-            data.append(row_as_dict)
-    
-    return data
+                value = codecs.escape_decode(value)[0].decode("utf-8")
+                record[keys[i]] = int(value) if keys[i] in integer_keys and value.isdigit() else value
+            if len(record) > 0:
+                write_jsonl_record(jsonl_file, record)
+
+    shutil.copystat(csv_filename, jsonl_filename)
+    os.remove(csv_filename)
+
+def convert_legacy_raw_files(repository_identifier):
+    """Convert raw and delta CSV files of a repository fetched before JSON Lines were used"""
+
+    for labeling in LABELED_FILENAME, UNLABELED_FILENAME:
+        for data_type in RAW_POSTFIX, DELTA_POSTFIX:
+            csv_filename = get_repository_filename(repository_identifier, labeling, data_type, CSV_FILE_EXTENSION)
+            jsonl_filename = get_repository_filename(repository_identifier, labeling, data_type, JSONL_FILE_EXTENSION)
+            if os.path.isfile(csv_filename) and not os.path.isfile(jsonl_filename):
+                convert_csv_to_jsonl(csv_filename, jsonl_filename, FIELD_KEYS, (TIMESPENT_FIELD_KEY,))
 
 def load_pickle(filename):
 
@@ -68,7 +207,7 @@ def load_pickle(filename):
         return pickle.load(file)
 
 
-def save_pickle(filename, data):
+def save_pickle(filename, data, verbose=True):
 
     # need to use chunks on OS X because of a bug
     # https://stackoverflow.com/questions/31468117/python-3-can-pickle-handle-byte-objects-larger-than-4gb
@@ -77,12 +216,14 @@ def save_pickle(filename, data):
         with open(filename, 'wb') as file:
             for idx in range(0, len(bytes_out), MAX_BYTES):
                 file.write(bytes_out[idx:idx+MAX_BYTES])
-        print("Data saved on %s in chunks" % filename)
+        if verbose:
+            print("Data saved on %s in chunks" % filename)
         return
 
     with open(filename, "wb") as file:
         pickle.dump(data, file, PICKLE_PROTOCOL)
-    print("Data saved on %s" % filename)
+    if verbose:
+        print("Data saved on %s" % filename)
 
 def create_folder_if_needed(folder_name):
 
@@ -0,0 +1,439 @@
+from bisect import bisect_left
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import random
+import threading
+import time
+from urllib.parse import urlparse
+import zlib
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError
+
+from utilities.constants import REQUEST_TIMEOUT_SECONDS
+
+POOL_MAX_SIZE = 32
+HOST_REQUESTS_PER_SECOND = 5
+HOST_MAX_CONCURRENT_REQUESTS = 8
+MAX_ATTEMPTS = 7
+RETRY_STATUS_CODES = 429, 500, 502, 503, 504
+BACKOFF_BASE_SECONDS = 2
+BACKOFF_MAX_SECONDS = 300
+RETRY_AFTER_MAX_SECONDS = 3600
+CIRCUIT_FAILURE_THRESHOLD = 10
+CIRCUIT_OPEN_SECONDS = 60
+CONTENT_CHUNK_SIZE = 2 ** 16
+COMPRESSED_ENCODINGS = "gzip", "deflate"
+LATENCY_BUCKETS_SECONDS = 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60
+DEFAULT_HEADERS = {
+    "Accept": "application/json",
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive"
+}
+
+sessions = {}
+host_limiters = {}
+circuit_breakers = {}
+request_statistics = {}
+lock = threading.Lock()
+
+
+class HostLimiter():
+    """Token bucket limiting the request rate to a host combined with a cap on its concurrent requests"""
+
+    def __init__(self, requests_per_second, max_concurrent_requests):
+        self.requests_per_second = requests_per_second
+        self.capacity = max(1, requests_per_second) if requests_per_second else 0
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+        self.semaphore = threading.BoundedSemaphore(max_concurrent_requests)
+
+    def acquire(self):
+        """Wait for a free request slot and a token, return the number of seconds waited"""
+
+        start_time = time.monotonic()
+        self.semaphore.acquire()
+
+        while self.requests_per_second:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.requests_per_second)
+                self.last_refill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    break
+                delay = (1 - self.tokens) / self.requests_per_second
+            time.sleep(delay)
+
+        return time.monotonic() - start_time
+
+    def release(self):
+        self.semaphore.release()
+
+
+class CircuitBreaker():
+    """Stops requests to a host for CIRCUIT_OPEN_SECONDS after CIRCUIT_FAILURE_THRESHOLD consecutive failures
+    and for the time a throttling host asks to wait. While the failures continue, a single failed request
+    after the pause opens the breaker again."""
+
+    def __init__(self, host):
+        self.host = host
+        self.consecutive_failures = 0
+        self.closed_at = 0.0
+        self.lock = threading.Lock()
+
+    def get_wait(self):
+        """Return the number of seconds until requests to the host can be sent again"""
+
+        with self.lock:
+            return max(0.0, self.closed_at - time.monotonic())
+
+    def pause(self, seconds):
+
+        with self.lock:
+            self.closed_at = max(self.closed_at, time.monotonic() + seconds)
+
+    def record_success(self):
+
+        with self.lock:
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+
+        with self.lock:
+            self.consecutive_failures += 1
+            if self.consecutive_failures < CIRCUIT_FAILURE_THRESHOLD or self.closed_at > time.monotonic():
+                return
+            self.closed_at = time.monotonic() + CIRCUIT_OPEN_SECONDS
+
+        print("%s failed %d times in a row, pausing requests for %d seconds"
+            % (self.host, self.consecutive_failures, CIRCUIT_OPEN_SECONDS))
+
+
+def get_host(url):
+    """Return the host name and port of an URL, e.g. 'jira.exoplatform.org'"""
+
+    return urlparse(url).netloc
+
+
+def get_session(host):
+    """Return the keep-alive session of a host, creating it on the first request to the host"""
+
+    with lock:
+        session = sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAX_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update(DEFAULT_HEADERS)
+            sessions[host] = session
+
+    return session
+
+
+def set_host_limits(host, requests_per_second=HOST_REQUESTS_PER_SECOND, max_concurrent_requests=HOST_MAX_CONCURRENT_REQUESTS):
+    """Limit the request rate and the number of concurrent requests to a host
+
+    Arguments:
+
+    host -- the host name and port, e.g. 'jira.exoplatform.org'
+
+    requests_per_second -- the average number of requests per second, 0 or None for no limit (default HOST_REQUESTS_PER_SECOND)
+
+    max_concurrent_requests -- the maximum number of requests in progress at once (default HOST_MAX_CONCURRENT_REQUESTS)
+    """
+
+    with lock:
+        host_limiters[host] = HostLimiter(requests_per_second, max_concurrent_requests)
+
+
+def get_host_limiter(host):
+    """Return the rate and concurrency limiter of a host, None if no limits were set for the host"""
+
+    with lock:
+        return host_limiters.get(host)
+
+
+def get_circuit_breaker(host):
+    """Return the circuit breaker of a host, creating it on the first request to the host"""
+
+    with lock:
+        breaker = circuit_breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(host)
+            circuit_breakers[host] = breaker
+
+    return breaker
+
+
+def record_request(host, latency, response_size, failed, wait=0.0):
+    """Add a request to the request count, latency, rate limit wait and transferred byte totals of a host"""
+
+    with lock:
+        statistics = request_statistics.setdefault(host, {
+            "requests": 0,
+            "failures": 0,
+            "retries": 0,
+            "bytes": 0,
+            "total_wait": 0.0,
+            "total_latency": 0.0,
+            "min_latency": None,
+            "max_latency": 0.0,
+            "latency_histogram": [0] * (len(LATENCY_BUCKETS_SECONDS) + 1),
+            "first_request": time.time() - latency,
+            "last_response": None
+        })
+        statistics["requests"] += 1
+        statistics["failures"] += 1 if failed else 0
+        statistics["bytes"] += response_size
+        statistics["total_wait"] += wait
+        statistics["total_latency"] += latency
+        statistics["max_latency"] = max(statistics["max_latency"], latency)
+        if statistics["min_latency"] is None or latency < statistics["min_latency"]:
+            statistics["min_latency"] = latency
+        statistics["latency_histogram"][bisect_left(LATENCY_BUCKETS_SECONDS, latency)] += 1
+        statistics["last_response"] = time.time()
+
+
+def get_latency_percentile(latency_histogram, percentile):
+    """Return the upper bound in seconds of the latency histogram bucket containing the given percentile,
+    None if the percentile falls in the bucket of latencies above the largest bound or there are no requests
+
+    Arguments:
+
+    latency_histogram -- request counts per bucket of LATENCY_BUCKETS_SECONDS followed by the count of slower requests
+
+    percentile -- a number from 0 to 100
+    """
+
+    request_count = sum(latency_histogram)
+    if request_count == 0:
+        return None
+
+    cumulative_count = 0
+    for bucket, count in enumerate(latency_histogram):
+        cumulative_count += count
+        if cumulative_count >= request_count * percentile / 100:
+            return LATENCY_BUCKETS_SECONDS[bucket] if bucket < len(LATENCY_BUCKETS_SECONDS) else None
+
+
+def record_retry(url):
+    """Add a request which is sent again after it failed to the retry count of the URL's host"""
+
+    host = get_host(url)
+    with lock:
+        if host in request_statistics:
+            request_statistics[host]["retries"] += 1
+
+
+def read_content(response):
+    """Read the body of a streamed response and return the number of bytes received before it was decompressed,
+    taken from the Content-Length header or else counted while the body is read"""
+
+    content_length = response.headers.get("Content-Length")
+    if content_length is not None and content_length.isdigit():
+        response.content
+        return int(content_length)
+
+    is_compressed = response.headers.get("Content-Encoding", "").lower() in COMPRESSED_ENCODINGS
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 32) if is_compressed else None
+    content_size = 0
+    chunks = []
+    try:
+        for chunk in response.raw.stream(CONTENT_CHUNK_SIZE, decode_content=False):
+            content_size += len(chunk)
+            chunks.append(decompressor.decompress(chunk) if decompressor is not None else chunk)
+        if decompressor is not None:
+            chunks.append(decompressor.flush())
+    except HTTPError as e:
+        raise requests.exceptions.ChunkedEncodingError(e)
+    except zlib.error as e:
+        raise requests.exceptions.ContentDecodingError(e)
+
+    response._content = b"".join(chunks)
+    response._content_consumed = True
+    return content_size
+
+
+def get(url, params=None, auth=None, headers=None, timeout=REQUEST_TIMEOUT_SECONDS):
+    """Send a GET request through the pooled keep-alive session of the URL's host within the host's
+    rate and concurrency limits, if any were set, and record its latency. Request exceptions are raised to the caller.
+
+    Arguments:
+
+    url -- the requested URL
+
+    params -- query string parameters (default None)
+
+    auth -- authentication parameters containing username and API key or password (default None)
+
+    headers -- headers sent in addition to the session's default headers (default None)
+
+    timeout -- seconds to wait for the server to connect and to send data (default REQUEST_TIMEOUT_SECONDS)
+    """
+
+    host = get_host(url)
+    session = get_session(host)
+    limiter = get_host_limiter(host)
+    wait = limiter.acquire() if limiter is not None else 0.0
+    start_time = time.perf_counter()
+
+    try:
+        response = session.get(url, params=params, auth=auth, headers=headers, timeout=timeout, stream=True)
+        try:
+            content_size = read_content(response)
+        finally:
+            response.close()
+    except requests.exceptions.RequestException:
+        record_request(host, time.perf_counter() - start_time, 0, True, wait)
+        raise
+    finally:
+        if limiter is not None:
+            limiter.release()
+
+    record_request(host, time.perf_counter() - start_time, content_size, response.status_code != 200, wait)
+    return response
+
+
+def get_retry_after(response):
+    """Return the number of seconds a throttling server asks to wait in its Retry-After header,
+    given either as seconds or as an HTTP date, or None if the header is missing or invalid"""
+
+    retry_after = response.headers.get("Retry-After")
+    if retry_after is None:
+        return None
+
+    if retry_after.strip().isdigit():
+        return min(int(retry_after), RETRY_AFTER_MAX_SECONDS)
+
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+
+    return min(max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds()), RETRY_AFTER_MAX_SECONDS)
+
+
+def get_backoff(attempt):
+    """Return an exponentially growing delay with random jitter, so that threads which failed together
+    do not retry together, e.g. 1-2 s after the first attempt and 2-4 s after the second"""
+
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def get_with_retry(url, params=None, auth=None, headers=None, timeout=REQUEST_TIMEOUT_SECONDS, max_attempts=MAX_ATTEMPTS):
+    """Send a GET request and send it again after request exceptions and status codes indicating
+    a temporary failure or throttling. The delay honours the Retry-After header, which pauses all requests
+    to the host, and otherwise grows exponentially with jitter. Hosts failing persistently are paused by
+    their circuit breaker. The last response is returned even if it failed, the last request exception
+    is raised to the caller.
+
+    Arguments:
+
+    url -- the requested URL
+
+    params -- query string parameters (default None)
+
+    auth -- authentication parameters containing username and API key or password (default None)
+
+    headers -- headers sent in addition to the session's default headers (default None)
+
+    timeout -- seconds to wait for the server to connect and to send data (default REQUEST_TIMEOUT_SECONDS)
+
+    max_attempts -- the maximum number of times the request is sent (default MAX_ATTEMPTS)
+    """
+
+    breaker = get_circuit_breaker(get_host(url))
+
+    for attempt in range(max_attempts):
+
+        wait = breaker.get_wait()
+        if wait > 0:
+            time.sleep(wait)
+        if attempt > 0:
+            record_retry(url)
+
+        try:
+            response = get(url, params=params, auth=auth, headers=headers, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            breaker.record_failure()
+            if attempt == max_attempts - 1:
+                raise
+            delay = get_backoff(attempt)
+            print("Request to %s failed (%s), trying again in %.1f seconds" % (url, type(e).__name__, delay))
+            time.sleep(delay)
+            continue
+
+        if response.status_code not in RETRY_STATUS_CODES:
+            breaker.record_success()
+            return response
+
+        breaker.record_failure()
+        if attempt == max_attempts - 1:
+            return response
+
+        retry_after = get_retry_after(response)
+        if retry_after is not None:
+            breaker.pause(retry_after)
+            print("%s returned status code %d, trying again in %.1f seconds" % (url, response.status_code, retry_after))
+            continue
+
+        delay = get_backoff(attempt)
+        print("%s returned status code %d, trying again in %.1f seconds" % (url, response.status_code, delay))
+        time.sleep(delay)
+
+
+def get_request_statistics():
+    """Return a copy of request counts, failures, transferred bytes and latencies grouped by host"""
+
+    with lock:
+        return {
+            host: dict(statistics, latency_histogram=list(statistics["latency_histogram"]))
+            for host, statistics in request_statistics.items()}
+
+
+def reset_request_statistics():
+    """Forget the request statistics of all hosts"""
+
+    with lock:
+        request_statistics.clear()
+
+
+def format_latency_bound(latency_bound):
+    """Format a latency percentile returned by get_latency_percentile, e.g. '<= 0.25 s'"""
+
+    if latency_bound is None:
+        return "> %g s" % LATENCY_BUCKETS_SECONDS[-1]
+
+    return "<= %g s" % latency_bound
+
+
+def print_request_statistics():
+    """Print request counts and latencies of every host requested so far"""
+
+    statistics = get_request_statistics()
+    if len(statistics) == 0:
+        return
+
+    print("-----------------------------")
+    for host, host_statistics in sorted(statistics.items()):
+        mean_latency = host_statistics["total_latency"] / host_statistics["requests"]
+        print("%s - %d requests, %d failed, %d retried, %.2f MB received, %.1f s waited for rate limit, latency mean %.3f s, min %.3f s, p50 %s, p95 %s, max %.3f s"
+            % (
+                host,
+                host_statistics["requests"],
+                host_statistics["failures"],
+                host_statistics["retries"],
+                host_statistics["bytes"] / 2 ** 20,
+                host_statistics["total_wait"],
+                mean_latency,
+                host_statistics["min_latency"],
+                format_latency_bound(get_latency_percentile(host_statistics["latency_histogram"], 50)),
+                format_latency_bound(get_latency_percentile(host_statistics["latency_histogram"], 95)),
+                host_statistics["max_latency"]))
@@ -1,7 +1,6 @@
 import os
 import re
 
-from utilities.data_utils import get_issue_counts, get_projects
 from utilities.string_utils import get_part_strings
 from utilities.constants import *
 
@@ -21,14 +20,21 @@ def select_repositories(repositories_from_input):
 
     return repositories_from_input
 
-def select_projects(data):
+def select_projects(issue_counts, labeled_issue_counts):
+    """Let user select projects from the projects with labeled issues
+
+    Arguments:
+
+    issue_counts -- a dictionary of the number of issues in every project
+
+    labeled_issue_counts -- a dictionary of the number of issues with time spent in every project
+    """
 
     print("Please select one or more of the following projects:")
-    project_issue_counts = get_issue_counts([datapoint for datapoint in data if datapoint.get(TIMESPENT_FIELD_KEY, None) is not None])
+    project_issue_counts = sorted(labeled_issue_counts.items(), key = lambda a: a[1])
 
     for c in project_issue_counts:
-        total_issue_count = sum([1 for datapoint in data if datapoint.get(PROJECT_FIELD_KEY) == c[0]])
-        part_strings = get_part_strings(c[1], total_issue_count)
+        part_strings = get_part_strings(c[1], issue_counts[c[0]])
         print("%s - %d (%.2f%%) of %d issues are labeled" % (c[0], part_strings[0], part_strings[1], part_strings[2]))
 
     selected_projects = input("Selected datasets: ")
@@ -36,7 +42,7 @@ def select_projects(data):
     selected_projects = re.sub(r"[^ A-Za-z1-9\-]", "", selected_projects)
     selected_projects = set(selected_projects.split())
     
-    return selected_projects & get_projects(data)
+    return selected_projects & set(issue_counts)
 
 def select_from_list(question, options, return_option_indexes = False):
 
@@ -0,0 +1,277 @@
+import array
+import numpy as np
+import os
+
+from utilities.constants import DESCRIPTION_FIELD_KEY, ID_FIELD_KEY, NPZ_FILE_EXTENSION, PROJECT_FIELD_KEY, SUMMARY_FIELD_KEY
+
+TEXT_FIELD_KEYS = SUMMARY_FIELD_KEY, DESCRIPTION_FIELD_KEY
+VOCABULARY_SEPARATOR = "\n"
+
+
+class TokenCorpus():
+    """Summaries and descriptions of a list of datapoints split in words once and stored as flat arrays,
+    in the same order as the datapoints are saved in their JSON file
+
+    vocabulary -- a list of distinct words in the order of their first occurrence
+
+    tokens -- an int32 array of vocabulary indexes of all words of all datapoints
+
+    sentence_offsets -- an int64 array, sentence i consists of tokens[sentence_offsets[i]:sentence_offsets[i + 1]]
+
+    field_offsets -- an int64 array, the text field f of datapoint i, see TEXT_FIELD_KEYS, consists of sentences
+    field_offsets[i * len(TEXT_FIELD_KEYS) + f] to field_offsets[i * len(TEXT_FIELD_KEYS) + f + 1]
+
+    ids -- an int64 array of datapoint ids
+    """
+
+    def __init__(self, vocabulary, tokens, sentence_offsets, field_offsets, ids):
+        self.vocabulary = vocabulary
+        self.tokens = tokens
+        self.sentence_offsets = sentence_offsets
+        self.field_offsets = field_offsets
+        self.ids = ids
+        self.token_counts = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def get_sentence_bounds(self, row, field_key=None):
+        """Return the first and the end sentence of a text field of a datapoint, or of both fields if field_key is None"""
+
+        first_field = row * len(TEXT_FIELD_KEYS)
+        if field_key is None:
+            return (self.field_offsets[first_field], self.field_offsets[first_field + len(TEXT_FIELD_KEYS)])
+
+        field = first_field + TEXT_FIELD_KEYS.index(field_key)
+        return (self.field_offsets[field], self.field_offsets[field + 1])
+
+    def get_tokens(self, row, field_key=None):
+        """Return the tokens of a text field of a datapoint, or of both fields if field_key is None"""
+
+        first_sentence, end_sentence = self.get_sentence_bounds(row, field_key)
+        return self.tokens[self.sentence_offsets[first_sentence]:self.sentence_offsets[end_sentence]]
+
+    def get_token_count(self, row):
+        """Return the number of words in the summary and the description of a datapoint"""
+
+        if self.token_counts is None:
+            self.token_counts = self.get_token_counts().tolist()
+
+        return self.token_counts[row]
+
+    def get_token_counts(self, field_key=None):
+        """Return an array of the number of words in a text field of every datapoint, or in both fields if field_key is None"""
+
+        field_count = len(TEXT_FIELD_KEYS)
+        if field_key is None:
+            first_sentences, end_sentences = self.field_offsets[:-1:field_count], self.field_offsets[field_count::field_count]
+        else:
+            field = TEXT_FIELD_KEYS.index(field_key)
+            first_sentences, end_sentences = self.field_offsets[field:-1:field_count], self.field_offsets[field + 1::field_count]
+
+        return self.sentence_offsets[end_sentences] - self.sentence_offsets[first_sentences]
+
+    def count_tokens(self):
+        """Return an array of the number of occurrences of every vocabulary word"""
+
+        return np.bincount(self.tokens, minlength=len(self.vocabulary))
+
+    def get_sentences(self):
+        """Return the words of every sentence of every datapoint"""
+
+        words = [self.vocabulary[token] for token in self.tokens.tolist()]
+        offsets = self.sentence_offsets.tolist()
+        return [words[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+    def is_aligned(self, data):
+        """Check if the corpus contains the text of the given datapoints in the same order"""
+
+        return len(data) == len(self.ids) and np.array_equal(self.ids, [int(datapoint[ID_FIELD_KEY]) for datapoint in data])
+
+
+class TokenCorpusBuilder():
+    """Build a TokenCorpus by appending datapoints one at a time, either by splitting their cleaned sentences
+    or by copying their rows from another corpus"""
+
+    def __init__(self):
+        self.word_ids = {}
+        self.tokens = array.array("i")
+        self.sentence_offsets = array.array("q", [0])
+        self.field_offsets = array.array("q", [0])
+        self.ids = array.array("q")
+        self.vocabulary_mappings = {}
+
+    def append(self, datapoint):
+        """Split the sentences of the text fields of a cleaned datapoint in words and append them"""
+
+        word_ids = self.word_ids
+        for field_key in TEXT_FIELD_KEYS:
+            for sentence in datapoint.get(field_key) or []:
+                self.tokens.extend([word_ids.setdefault(word, len(word_ids)) for word in sentence.split()])
+                self.sentence_offsets.append(len(self.tokens))
+            self.field_offsets.append(len(self.sentence_offsets) - 1)
+        self.ids.append(int(datapoint[ID_FIELD_KEY]))
+
+    def tokenize(self, datapoints):
+        """Append datapoints while passing them through"""
+
+        for datapoint in datapoints:
+            self.append(datapoint)
+            yield datapoint
+
+    def get_vocabulary_mapping(self, corpus):
+        """Return an array mapping the vocabulary indexes of another corpus to the vocabulary indexes of this one"""
+
+        if id(corpus) not in self.vocabulary_mappings:
+            word_ids = self.word_ids
+            mapping = np.array([word_ids.setdefault(word, len(word_ids)) for word in corpus.vocabulary], dtype=np.int32)
+            self.vocabulary_mappings[id(corpus)] = (corpus, mapping)
+
+        return self.vocabulary_mappings[id(corpus)][1]
+
+    def append_row(self, corpus, row):
+        """Append a datapoint from another corpus"""
+
+        mapping = self.get_vocabulary_mapping(corpus)
+        first_sentence, end_sentence = corpus.get_sentence_bounds(row)
+        first_token = corpus.sentence_offsets[first_sentence]
+        token_count, sentence_count = len(self.tokens), len(self.sentence_offsets) - 1
+
+        self.tokens.frombytes(mapping[corpus.get_tokens(row)].tobytes())
+        sentence_offsets = corpus.sentence_offsets[first_sentence + 1:end_sentence + 1] - first_token + token_count
+        self.sentence_offsets.frombytes(sentence_offsets.astype(np.int64).tobytes())
+        first_field = row * len(TEXT_FIELD_KEYS)
+        field_offsets = corpus.field_offsets[first_field + 1:first_field + len(TEXT_FIELD_KEYS) + 1] - first_sentence + sentence_count
+        self.field_offsets.frombytes(field_offsets.astype(np.int64).tobytes())
+        self.ids.append(int(corpus.ids[row]))
+
+    def build(self):
+        """Return the corpus with its vocabulary reduced to the words which occur in it,
+        ordered by their first occurrence"""
+
+        tokens = np.frombuffer(self.tokens, dtype=np.int32)
+        word_ids, first_indexes = np.unique(tokens, return_index=True)
+        word_ids = word_ids[np.argsort(first_indexes)]
+        new_word_ids = np.zeros(len(self.word_ids), dtype=np.int32)
+        new_word_ids[word_ids] = np.arange(len(word_ids), dtype=np.int32)
+        words = list(self.word_ids)
+
+        return TokenCorpus(
+            [words[word_id] for word_id in word_ids.tolist()],
+            new_word_ids[tokens],
+            np.frombuffer(self.sentence_offsets, dtype=np.int64).copy(),
+            np.frombuffer(self.field_offsets, dtype=np.int64).copy(),
+            np.frombuffer(self.ids, dtype=np.int64).copy())
+
+
+def get_corpus_filename(data_filename):
+    """Return the name of the file in which the tokenized corpus of a JSON data file is saved"""
+
+    return os.path.splitext(data_filename)[0] + NPZ_FILE_EXTENSION
+
+
+def save_corpus(data_filename, corpus):
+    """Save the tokenized corpus of a JSON data file after the data file is saved,
+    or remove an outdated corpus if corpus is None"""
+
+    filename = get_corpus_filename(data_filename)
+    if corpus is None:
+        if os.path.isfile(filename):
+            os.remove(filename)
+        return
+
+    temporary_filename = filename + ".tmp"
+    with open(temporary_filename, "wb") as file:
+        np.savez(file,
+            vocabulary=np.frombuffer(VOCABULARY_SEPARATOR.join(corpus.vocabulary).encode("utf-8"), dtype=np.uint8),
+            tokens=corpus.tokens,
+            sentence_offsets=corpus.sentence_offsets,
+            field_offsets=corpus.field_offsets,
+            ids=corpus.ids)
+
+    os.replace(temporary_filename, filename)
+
+
+def load_corpus(data_filename, data=None):
+    """Load the tokenized corpus of a JSON data file, None if there is none or it is older than the data file
+
+    Arguments:
+
+    data_filename -- the name of the JSON data file
+
+    data -- the datapoints loaded from the data file, if given the corpus is returned
+    only if it contains their text in the same order (default None)
+    """
+
+    filename = get_corpus_filename(data_filename)
+    if not os.path.isfile(filename) or not os.path.isfile(data_filename):
+        return
+    if os.path.getmtime(filename) < os.path.getmtime(data_filename):
+        return
+
+    with np.load(filename) as arrays:
+        vocabulary = arrays["vocabulary"].tobytes().decode("utf-8")
+        corpus = TokenCorpus(
+            vocabulary.split(VOCABULARY_SEPARATOR) if len(vocabulary) > 0 else [],
+            arrays["tokens"],
+            arrays["sentence_offsets"],
+            arrays["field_offsets"],
+            arrays["ids"])
+
+    if data is not None and not corpus.is_aligned(data):
+        return
+
+    return corpus
+
+
+def load_corpora(data_filenames):
+    """Load the tokenized corpora of the existing JSON data files,
+    None if none of them exists or any of them has no corpus up to date"""
+
+    data_filenames = [data_filename for data_filename in data_filenames if os.path.isfile(data_filename)]
+    corpora = [load_corpus(data_filename) for data_filename in data_filenames]
+    if len(corpora) == 0 or any(corpus is None for corpus in corpora):
+        return
+
+    return corpora
+
+
+def get_datapoint_key(datapoint):
+    """Return the project and the id of a datapoint, which identify it in a merged dataset"""
+
+    return (datapoint.get(PROJECT_FIELD_KEY), int(datapoint[ID_FIELD_KEY]))
+
+
+def add_corpus_rows(corpus_rows, data, corpus):
+    """Map the key of every datapoint to its corpus and row, see get_datapoint_key
+
+    Arguments:
+
+    corpus_rows -- a dictionary to which the rows are added
+
+    data -- datapoints in the same order as in the corpus
+
+    corpus -- the tokenized corpus of the datapoints
+    """
+
+    for row, datapoint in enumerate(data):
+        corpus_rows[get_datapoint_key(datapoint)] = (corpus, row)
+
+    return corpus_rows
+
+
+def build_corpus(data, corpus_rows):
+    """Build the tokenized corpus of datapoints from their rows in other corpora,
+    None if any of them is not in corpus_rows"""
+
+    if corpus_rows is None:
+        return
+
+    builder = TokenCorpusBuilder()
+    for datapoint in data:
+        corpus_row = corpus_rows.get(get_datapoint_key(datapoint))
+        if corpus_row is None:
+            return
+        builder.append_row(*corpus_row)
+
+    return builder.build()